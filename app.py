@@ -1,12 +1,17 @@
 import os
 import json
-import time
 import streamlit as st
 import html
 import markdown
 from PIL import Image
 from datetime import datetime
-from app_llm_cli import run_chatbot, search_vector_db_image
+from app_llm_cli import (
+    run_chatbot_stream,
+    search_vector_db_image,
+    warmup_resources,
+    image_lookup_cache,
+)
+from rag_registry import registry
 
 
 # 페이지 설정
@@ -39,6 +44,14 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+@st.cache_resource
+def _warmup():
+    """프로세스당 한 번만 공유 리소스를 미리 생성"""
+    return warmup_resources()
+
+
+_warmup()
+
 # "temp" 폴더 생성
 TEMP_DIR = "temp"
 if not os.path.exists(TEMP_DIR):
@@ -92,6 +105,17 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+def bot_message_html(content):
+    """봇 메시지(마크다운)를 채팅 말풍선 HTML로 변환"""
+    html_content = markdown.markdown(content)
+    return f"""
+                        <div class="message bot">
+                            <div class="avatar">🤖</div>
+                            <div class="message-content">{html_content}</div>
+                        </div>
+                        """
+
+
 # 메인 레이아웃
 col1, col2, col3 = st.columns([2, 4, 2])
 
@@ -152,18 +176,14 @@ with col2:
                         unsafe_allow_html=True,
                     )
                 else:  # role == 'assistant'
-                    html_content = markdown.markdown(message["content"])
                     st.markdown(
-                        f"""
-                        <div class="message bot">
-                            <div class="avatar">{avatar_icon}</div>
-                            <div class="message-content">{html_content}</div>
-                        </div>
-                        """,
+                        bot_message_html(message["content"]),
                         unsafe_allow_html=True,
                     )
         if st.session_state.is_typing:
-            st.markdown(
+            # 답변 토큰이 스트리밍되면 이 자리를 계속 갱신
+            typing_placeholder = st.empty()
+            typing_placeholder.markdown(
                 """
             <div class="message bot">
                 <div class="avatar">🤖</div>
@@ -273,9 +293,8 @@ if send_button:
         st.session_state.is_typing = True
         st.rerun()
 
-# 봇 응답 시뮬레이션
+# 봇 응답 스트리밍
 if st.session_state.is_typing:
-    time.sleep(1)
     last_user_message = ""
     for msg in reversed(current_conv["messages"]):
         if msg["role"] == "user":
@@ -286,10 +305,18 @@ if st.session_state.is_typing:
     if current_conv["image"] is not None:
         image_path = os.path.abspath(current_conv["image"])
 
+    # 토큰이 도착하는 대로 채팅 영역에 표시
+    answer = ""
+    for token in run_chatbot_stream(
+        last_user_message, image_path=image_path, history=current_conv["messages"]
+    ):
+        answer += token
+        typing_placeholder.markdown(bot_message_html(answer), unsafe_allow_html=True)
+
     current_conv["messages"].append(
         {
             "role": "assistant",
-                       "content": run_chatbot(last_user_message, image_path=image_path,  history=current_conv["messages"]),
+            "content": answer,
         }
     )
     st.session_state.is_typing = False
@@ -321,6 +348,14 @@ with st.sidebar:
     )
     st.metric("총 메시지", total_messages)
     st.metric("대화 수", len(st.session_state.conversations))
+    registry_stats = registry.stats()
+    st.metric("요청 준비 시간", f"{registry_stats['last_setup_ms']:.1f} ms")
+    image_cache_stats = image_lookup_cache.stats()
+    st.metric(
+        "이미지 캐시 적중",
+        f"{image_cache_stats['hits']} / "
+        f"{image_cache_stats['hits'] + image_cache_stats['misses']}",
+    )
 
     st.markdown("---")
     st.markdown("### ℹ️ 정보")
@@ -2,61 +2,115 @@ import os
 import json
 import logging
 import re
+import time
 from dotenv import load_dotenv
+from utils.text_cache import ExtractedTextCache
 from pdfminer.high_level import extract_text
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_tavily import TavilySearch
-from langchain_core.documents import Document
-from rag_indexer_class import IndexConfig, RAGIndexer
-from utils.index import image_to_base64
+from rag_registry import registry, warmup
+from rag_indexer_class import IndexConfig
+from rag_retrieval import (
+    retrieve,
+    retrieve_speculative,
+    format_context,
+    pack_context,
+    CONTEXT_TOKEN_BUDGET,
+    HybridRetriever,
+    model_fallback_filters,
+)
+from utils.index import extract_model_code
+from utils.image_cache import ImageLookupCache
 
 
 # pdfminer 경고 무시
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
+# PDF 추출 텍스트 캐시 (rag_manuals_input과 같은 디렉토리 공유)
+PDF_TEXT_CACHE_DIR = "./cache/pdf_text"
+text_cache = ExtractedTextCache(PDF_TEXT_CACHE_DIR)
+
 # 환경변수 로드
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4o-mini")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 
+VECTOR_DB_DIR = "./chroma"
+EMBEDDINGS_MODEL = "text-embedding-3-small"
+MANUALS_COLLECTION = "manuals"
+IMGS_COLLECTION = "imgs"
+# rag_manuals_input이 만드는 BM25 인덱스 (없으면 벡터 검색만 사용)
+MANUALS_BM25_PATH = os.path.join(VECTOR_DB_DIR, f"{MANUALS_COLLECTION}_bm25.json")
+LLM_TEMPERATURE = 0.3
+# 질문 분석과 원문 질문 검색을 겹쳐서 실행할지 여부
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+
+# 이미지 한 장당 조회할 후보 모델 수와 답변 검색에 쓸 최대 후보 수
+IMAGE_CANDIDATES = 3
+RETRIEVAL_CANDIDATES = 2
+
+# 이미지 → 후보 모델 조회 결과 캐시 (IMAGE_CACHE_PATH가 있으면 디스크에도 저장)
+image_lookup_cache = ImageLookupCache(
+    persist_path=os.getenv("IMAGE_CACHE_PATH"),
+    namespace=(
+        f"{VECTOR_DB_DIR}:{IMGS_COLLECTION}:"
+        f"{IndexConfig.image_feature_extractor}:candidates"
+    ),
+)
+
+
+def warmup_resources():
+    """프로세스 시작 시 공유 인덱서/LLM 클라이언트 미리 생성"""
+    return warmup(
+        indexers=[
+            (VECTOR_DB_DIR, MANUALS_COLLECTION, EMBEDDINGS_MODEL),
+            (VECTOR_DB_DIR, IMGS_COLLECTION, EMBEDDINGS_MODEL),
+        ],
+        llms=[(MODEL_NAME, LLM_TEMPERATURE)],
+        web_search=True,
+        lexical_indexes=[MANUALS_BM25_PATH],
+    )
 
-def search_vector_db_image(img_path):
-    """백터 디비에서 이미지의 모델을 가져온다"""
 
-    # 설정 생성
-    config = IndexConfig(
-        persistent_directory="./chroma",
-        collection_name="imgs",
-        embedding_model="text-embedding-3-small",
+def search_image_candidates(img_paths):
+    """여러 이미지의 후보 모델 목록을 한 번에 조회 (캐시에 없는 이미지만 검색)"""
+    indexer = registry.get_indexer(VECTOR_DB_DIR, IMGS_COLLECTION, EMBEDDINGS_MODEL)
+    return image_lookup_cache.get_or_compute_many(
+        img_paths, _search_image_candidates, version=indexer.index_version()
     )
 
-    # 인덱서 생성 및 실행
-    indexer = RAGIndexer(config)
 
-    # 이미지 로드해서 모델명 검색
-    img_base64 = image_to_base64(img_path)
+def _search_image_candidates(img_paths):
+    """캐시 없이 백터 디비에서 이미지들의 후보 모델 검색"""
 
-    # 유사도 검색
-    model_nm = indexer.search_and_show(img_base64)
-    return model_nm
+    # 공유 인덱서 조회
+    indexer = registry.get_indexer(VECTOR_DB_DIR, IMGS_COLLECTION, EMBEDDINGS_MODEL)
+
+    # 해시 색인 → 로컬 특징 벡터 순서로 검색 (API 호출 없음)
+    return indexer.search_models(img_paths, k=IMAGE_CANDIDATES)
+
+
+def search_vector_db_image(img_path):
+    """백터 디비에서 이미지의 모델을 가져온다 (못 찾으면 -1)"""
+    candidates = search_image_candidates([img_path])[0]
+    if candidates and candidates[0]["matched"]:
+        return candidates[0]["model_name"]
+    return -1
 
 
 def extract_text_from_pdf(pdf_path):
-    """PDF 텍스트 추출"""
+    """PDF 텍스트 추출 (캐시에 있으면 캐시 사용)"""
     try:
-        return extract_text(pdf_path)
+        return text_cache.get_or_extract(pdf_path, extract_text)
     except Exception as e:
         print(f"PDF 읽기 실패 {pdf_path}: {e}")
         return ""
 
 
-def analyze_query_and_retrieve(query: str, retriever, llm):
-    # 질문 분석 프롬프트
-    prompt = ChatPromptTemplate.from_messages(
-        [        ('system', """당신은 사용자의 질문을 분석하는 전문가입니다. 
+# 질문 분석 프롬프트
+ANALYSIS_PROMPT = ChatPromptTemplate.from_messages(
+    [        ('system', """당신은 사용자의 질문을 분석하는 전문가입니다. 
         주어진 질문에서 다음을 추출하세요:
         
         1. 주요 키워드 (3-5개)
@@ -71,12 +125,52 @@ def analyze_query_and_retrieve(query: str, retriever, llm):
             "conditions": ["조건1"],
             "details": ["세부사항1"]
         }}""",
+        ),
+        ("human", "질문: {query}"),
+    ]
+)
+
+# 답변 생성 프롬프트
+COT_PROMPT = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                """
+            Elaborate on the topic using a Tree of Thoughts and backtrack when necessary to construct a clear, cohesive Chain of Thought reasoning.
+            당신은 스마트한 가전 도우미입니다. 질문을 분석한 후에 관련 정보를 수집한 후, 체계적으로 답변하세요.:
+            ## 답변 지침
+            - 조건들을 나열하기보다는 통합하여 하나의 흐름으로 설명하십시오.
+            - 반복되거나 유사한 내용을 중복해서 설명하지 마십시오.
+            - 논리적 구조를 갖춘 명확한 문단 형태로 답변하십시오.
+            - 필요 시 예시나 유사 상황을 들어 이해를 도우십시오.
+            - 항목마다 관련된 이모지를 붙이고, 보기 좋게 소제목을 사용해서 깔끔하게 정리해주십시오.
+            - 말투는 한국어 사용자에게 자연스럽고 예쁜 느낌으로 해주십시오. 
+            - 추가로, 주의사항은 따로 '추가 안내' 섹션으로 빼주세요.
+            
+            예시 출력 :
+            
+       
+            - [체계적인 통합 설명을 한 문단 이상으로 기술]
+
+            ### 📌 추가 안내
+            - [관련된 팁이나 참고 정보가 있으면 제공]
+            """,
+            ),
+            (
+                "human",
+                """
+            질문: {query}
+            분석: {analysis}
+            컨텍스트: {context}
+            """,
             ),
-            ("human", "질문: {query}"),
         ]
     )
 
-    chain = prompt | llm | StrOutputParser()
+
+def analyze_query(query: str, llm):
+    """질문 분석 후 (분석 결과, 키워드 목록) 반환"""
+    chain = ANALYSIS_PROMPT | llm | StrOutputParser()
     analysis_result = chain.invoke({"query": query})
 
     # JSON 파싱
@@ -86,54 +180,60 @@ def analyze_query_and_retrieve(query: str, retriever, llm):
     except Exception:
         keywords = [query]
 
-    all_contexts = []
+    return analysis_result, keywords
 
-    # TavilySearch로 웹 검색 도구 설정
-    tavily_tool = TavilySearch(max_results=5)
 
-    try:
-        # Tavily에서 검색
-        search_result = tavily_tool.invoke({"query": query})
+def analyze_query_and_retrieve(
+    query: str, retriever, llm, speculative=SPECULATIVE_RETRIEVAL
+):
+    # 공유 TavilySearch 웹 검색 도구
+    tavily_tool = registry.get_web_search(max_results=5)
 
-        # 'results' 리스트 추출
-        web_results = search_result.get("results", [])
+    if speculative:
+        # 원문 질문 검색을 분석 LLM 호출과 동시에 시작
+        return retrieve_speculative(
+            query, lambda q: analyze_query(q, llm), retriever, tavily_tool
+        )
 
-        # 각 결과를 Document로 변환
-        for item in web_results:
-            content = item.get("content", "")
-            url = item.get("url", "")
+    analysis_start = time.perf_counter()
+    analysis_result, keywords = analyze_query(query, llm)
+    analysis_seconds = time.perf_counter() - analysis_start
 
-            if content:  # 내용이 있으면 추가
-                doc = Document(
-                    page_content=content,
-                    metadata={"source": url, "title": item.get("title", "")},
-                )
-                all_contexts.append(doc)
-    except Exception as e:
-        print(f"웹 검색 오류: {e}")
+    # 웹 검색과 키워드별 벡터 검색을 동시에 실행
+    rankings, timings = retrieve(query, keywords, retriever, tavily_tool)
+    timings["analysis"] = analysis_seconds
 
-    # 기존 벡터 retriever도 검색
-    for keyword in keywords:
-        try:
-            docs = retriever.invoke(keyword)
-            all_contexts.extend(docs)
-        except Exception as e:
-            print(f"벡터 검색 오류: {e}")
-            continue
+    return rankings, analysis_result, timings
 
-    return all_contexts, analysis_result
 
+def build_messages(query: str, retriever, llm, cot_prompt, history=[]):
+    """질문 분석/검색 후 LLM에 전달할 messages 구성"""
+    rankings, analysis, timings = analyze_query_and_retrieve(query, retriever, llm)
+
+    # 중복 제거 후 점수 순으로 토큰 예산만큼만 컨텍스트에 넣음
+    docs, stats = pack_context(rankings, CONTEXT_TOKEN_BUDGET)
+    print(
+        f"컨텍스트: 문서 {stats['packed_docs']}/{stats['retrieved_docs']}개, "
+        f"토큰 {stats['packed_tokens']}/{stats['retrieved_tokens']} "
+        f"(절약 {stats['saved_tokens']})"
+    )
+    print(
+        "검색 시간: "
+        + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+    )
 
-def enhanced_chain(query: str, retriever, llm, cot_prompt, history=[]):
-    context, analysis = analyze_query_and_retrieve(query, retriever, llm)
     prompt_value = cot_prompt.invoke(
-        {"query": query, "analysis": analysis, "context": context}
+        {"query": query, "analysis": analysis, "context": format_context(docs)}
     )
 
     prompt_str = prompt_value.to_string()
 
     # history + 현재 질문 prompt를 합쳐 messages 구성
-    messages = history + [{"role": "user", "content": prompt_str}]
+    return history + [{"role": "user", "content": prompt_str}]
+
+
+def enhanced_chain(query: str, retriever, llm, cot_prompt, history=[]):
+    messages = build_messages(query, retriever, llm, cot_prompt, history=history)
 
     # LLM에 messages 전달
     response = llm.invoke(messages)
@@ -141,73 +241,70 @@ def enhanced_chain(query: str, retriever, llm, cot_prompt, history=[]):
     return response
 
 
-def run_chatbot(query, image_path=None, history=[]):
-    EMBEDDINGS_MODEL = "text-embedding-3-small"
-    COLLECTION_NAME = "manuals"
-    VECTOR_DB_DIR = "./chroma"
-
-    # 설정 생성
-    config = IndexConfig(
-        persistent_directory=VECTOR_DB_DIR,
-        collection_name=COLLECTION_NAME,
-        embedding_model=EMBEDDINGS_MODEL,
-    )
+def stream_enhanced_chain(query: str, retriever, llm, cot_prompt, history=[]):
+    """enhanced_chain의 스트리밍 버전 (답변 토큰을 생성되는 대로 반환)"""
+    messages = build_messages(query, retriever, llm, cot_prompt, history=history)
+
+    for chunk in llm.stream(messages):
+        if chunk.content:
+            yield chunk.content
 
-    # 인덱서 생성 및 실행
-    indexer = RAGIndexer(config)
 
-    retriever = indexer.vectordb.as_retriever(
-        search_type="mmr", search_kwargs={"k": 8, "fetch_k": 20}
+def _prepare_chatbot(query, image_path=None):
+    """공유 리소스 조회 후 (retriever, llm, 모델코드가 붙은 질문) 반환"""
+    # 공유 리소스 조회 (워밍업 이후에는 생성 비용 없음)
+    setup_start = time.perf_counter()
+    indexer = registry.get_indexer(
+        VECTOR_DB_DIR, MANUALS_COLLECTION, EMBEDDINGS_MODEL
     )
+    llm = registry.get_llm(MODEL_NAME, LLM_TEMPERATURE)
+    lexical_index = registry.get_lexical_index(MANUALS_BM25_PATH)
+    registry.record_setup(time.perf_counter() - setup_start)
+
+    search_kwargs = {"k": 8, "fetch_k": 20}
+    fallback_filters = []
 
     if image_path:
-        model_code = search_vector_db_image(image_path)
-        if model_code == -1:
+        candidates = search_image_candidates([image_path])[0]
+        matched = [c for c in candidates if c["matched"]][:RETRIEVAL_CANDIDATES]
+        if not matched:
             query = f"{query} (모델코드: 확인불가)"
         else:
-            query = f"{query} (모델코드: {model_code})"
+            names = ", ".join(c["model_name"] for c in matched)
+            if len(matched) == 1:
+                query = f"{query} (모델코드: {names})"
+            else:
+                query = f"{query} (모델코드 후보: {names})"
+            # 후보 모델들의 매뉴얼 → 같은 브랜드 → 전체 순서로 검색 범위를 넓힌다
+            codes = [extract_model_code(c["model_name"]) for c in matched]
+            codes = [code for code in codes if code]
+            if codes:
+                fallback_filters = model_fallback_filters(indexer.store, codes)
+
+    # 벡터 검색 + BM25 검색을 RRF로 합침 (BM25 인덱스가 없으면 벡터 검색만)
+    retriever = HybridRetriever(
+        vectorstore=indexer.store,
+        search_type="mmr",
+        search_kwargs=search_kwargs,
+        fallback_filters=fallback_filters,
+        lexical_index=lexical_index,
+    )
 
-    llm = ChatOpenAI(model=MODEL_NAME, temperature=0.3)
+    return retriever, llm, query
 
-    cot_prompt = ChatPromptTemplate.from_messages(
-            [
-                (
-                    "system",
-                    """
-            Elaborate on the topic using a Tree of Thoughts and backtrack when necessary to construct a clear, cohesive Chain of Thought reasoning.
-            당신은 스마트한 가전 도우미입니다. 질문을 분석한 후에 관련 정보를 수집한 후, 체계적으로 답변하세요.:
-            ## 답변 지침
-            - 조건들을 나열하기보다는 통합하여 하나의 흐름으로 설명하십시오.
-            - 반복되거나 유사한 내용을 중복해서 설명하지 마십시오.
-            - 논리적 구조를 갖춘 명확한 문단 형태로 답변하십시오.
-            - 필요 시 예시나 유사 상황을 들어 이해를 도우십시오.
-            - 항목마다 관련된 이모지를 붙이고, 보기 좋게 소제목을 사용해서 깔끔하게 정리해주십시오.
-            - 말투는 한국어 사용자에게 자연스럽고 예쁜 느낌으로 해주십시오. 
-            - 추가로, 주의사항은 따로 '추가 안내' 섹션으로 빼주세요.
-            
-            예시 출력 :
-            
-       
-            - [체계적인 통합 설명을 한 문단 이상으로 기술]
 
-            ### 📌 추가 안내
-            - [관련된 팁이나 참고 정보가 있으면 제공]
-            """,
-                ),
-                (
-                    "human",
-                    """
-            질문: {query}
-            분석: {analysis}
-            컨텍스트: {context}
-            """,
-                ),
-            ]
-        )
+def run_chatbot(query, image_path=None, history=[]):
+    retriever, llm, query = _prepare_chatbot(query, image_path)
+    result = enhanced_chain(query, retriever, llm, COT_PROMPT, history=history)
+    return result.content
 
 
-    result = enhanced_chain(query, retriever, llm, cot_prompt, history=history)
-    return result.content
+def run_chatbot_stream(query, image_path=None, history=[]):
+    """run_chatbot의 스트리밍 버전 (답변 토큰 generator)"""
+    retriever, llm, query = _prepare_chatbot(query, image_path)
+    yield from stream_enhanced_chain(
+        query, retriever, llm, COT_PROMPT, history=history
+    )
 
 
 def main():
@@ -215,6 +312,9 @@ def main():
     print("세탁기/건조기 도우미")
     print("=" * 60)
 
+    elapsed = warmup_resources()
+    print(f"✅ 리소스 준비 완료 ({elapsed:.2f}초)")
+
     history = []
 
     while True:
@@ -262,16 +362,18 @@ def main():
             history.append({"role": "user", "content": query})
 
             print("🔍 답변 생성 중...")
-            # run_chatbot이 history를 이용해 문맥 기반 응답을 생성하도록 설계
-            result = run_chatbot(query, history=history)
-
-            # history에 모델 응답 추가
-            history.append({"role": "assistant", "content": result.content})
-
             print("=" * 60)
-            print(result.content)
+            # run_chatbot_stream이 history를 이용해 문맥 기반 응답을 생성하도록 설계
+            tokens = []
+            for token in run_chatbot_stream(query, history=history):
+                print(token, end="", flush=True)
+                tokens.append(token)
+            print()
             print("=" * 60)
 
+            # history에 모델 응답 추가
+            history.append({"role": "assistant", "content": "".join(tokens)})
+
         except KeyboardInterrupt:
             print("\n✅ 종료합니다.")
             break
@@ -1,8 +1,23 @@
+import argparse
 from rag_indexer_class import IndexConfig, RAGIndexer
 
 
 def main():
     """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="제품 이미지 인덱싱")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="이미지 처리 병렬 작업 수 (0이면 CPU 코어 수)",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["process", "thread"],
+        default="process",
+        help="병렬 처리 방식",
+    )
+    args = parser.parse_args()
 
     # 설정 생성
     config = IndexConfig(
@@ -10,6 +25,8 @@ def main():
         collection_name="imgs",
         embedding_model="text-embedding-3-small",
         figures_directory="./data/imgs",
+        index_workers=args.workers,
+        index_executor=args.executor,
     )
 
     # 인덱서 생성 및 실행
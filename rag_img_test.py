@@ -1,5 +1,4 @@
 from rag_indexer_class import IndexConfig, RAGIndexer
-from utils.index import image_to_base64
 
 
 def main():
@@ -21,10 +20,9 @@ def main():
 
     # 이미지 로드해서 모델명 검색
     img = "./data/imgs/samsung/아가사랑_3kg_WA30DG2120EE/그레이지/아가사랑_3kg_WA30DG2120EE_그레이지_0001.png"
-    img_base64 = image_to_base64(img)
 
     # 유사도 검색
-    result = indexer.search_and_show(img_base64)
+    result = indexer.search_and_show(img)
     print(result)
 
 
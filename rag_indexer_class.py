@@ -1,12 +1,31 @@
 import os
+import itertools
 import logging
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Iterator
 from dataclasses import dataclass
 from tqdm import tqdm
 from langchain_chroma.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
-from utils.index import image_to_base64, summarize_image
+from utils.index import summarize_image
+from utils.embedding_cache import CachedEmbeddings
+from utils.image_features import create_feature_extractor
+from utils.image_hash_index import ImageHashIndex, image_hashes
+from utils.image_calibration import ImageMatchCalibration, model_key, vote_candidates
+from utils.vector_store import (
+    DEFAULT_BACKEND,
+    DEFAULT_DTYPE,
+    MEMMAP_BACKENDS,
+    META_FILE,
+    MemmapVectorStore,
+    QuantizedVectorStore,
+)
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,6 +41,24 @@ class IndexConfig:
     collection_name: str = ""
     embedding_model: str = ""
     figures_directory: str = ""
+    # 빈 문자열이면 임베딩 캐시 사용 안 함
+    embedding_cache_path: str = "./cache/embeddings.sqlite"
+    # 이미지 특징 추출기: handcrafted(기본, 오프라인) | onnx | base64(기존 방식)
+    image_feature_extractor: str = "handcrafted"
+    onnx_model_path: str = ""
+    # 보정 파일이 없을 때 같은 모델로 판단하는 거리 기준
+    image_match_threshold: float = 0.3
+    # 검색 백엔드: chroma | memmap (Chroma에서 내보낸 메모리 맵 스냅샷)
+    # | int8 / pq (양자화 코드로 후보 검색 후 원본 벡터로 재정렬)
+    vector_backend: str = DEFAULT_BACKEND
+    memmap_dtype: str = DEFAULT_DTYPE
+    # 양자화 백엔드에서 k * quantization_rerank개 후보를 원본 벡터로 재정렬
+    quantization_rerank: int = 4
+    # 이미지 인덱싱 병렬 작업 수 (0이면 CPU 코어 수) 및 방식 (process | thread)
+    index_workers: int = 0
+    index_executor: str = "process"
+    # 이미지 pHash/dHash 색인 경로 (빈 문자열이면 저장 경로/컬렉션명_hashes.json)
+    hash_index_path: str = ""
     supported_extensions: List[str] = None
 
     def __post_init__(self):
@@ -30,14 +67,61 @@ class IndexConfig:
             self.supported_extensions = [".png", ".jpg", ".jpeg", ".bmp"]
 
 
+# 프로세스 풀 작업자마다 한 번만 만드는 이미지 특징 추출기
+_worker_extractors: Dict[tuple, Any] = {}
+
+
+def build_image_record(image_path: str, extractor) -> Dict[str, Any]:
+    """이미지 한 장의 특징 벡터, 해시, 메타데이터 계산"""
+    embedding = extractor.extract(image_path)
+    phash, dhash = image_hashes(image_path)
+
+    # 이미지 요약 생성
+    model_name = summarize_image(image_path)
+
+    return {
+        "id": image_path,
+        "hashes": (phash, dhash),
+        "text": model_name,
+        "embedding": embedding,
+        "metadata": {
+            "model_name": model_name,
+            "model_code": model_key(model_name),
+            "feature_extractor": extractor.name,
+        },
+    }
+
+
+def _build_image_record_in_worker(
+    image_path: str, extractor_name: str, onnx_model_path: str
+):
+    """프로세스 풀 작업 함수: (결과, 오류 메시지) 반환"""
+    key = (extractor_name, onnx_model_path)
+    if key not in _worker_extractors:
+        _worker_extractors[key] = create_feature_extractor(
+            extractor_name, onnx_model_path=onnx_model_path
+        )
+    try:
+        return build_image_record(image_path, _worker_extractors[key]), None
+    except Exception as e:
+        return None, f"Failed to process image {image_path}: {e}"
+
+
 class RAGIndexer:
     """RAG 인덱서 클래스"""
 
     def __init__(self, config: IndexConfig):
         self.config = config
         self.logger = self._setup_logger()
-        self.embeddings = OpenAIEmbeddings(model=config.embedding_model)
+        self.embeddings = self._initialize_embeddings()
         self.vectordb = self._initialize_vectordb()
+        self._image_features = None
+        self._hash_index = None
+        self._hash_index_mtime = None
+        self._calibration = None
+        self._calibration_mtime = None
+        self._store = None
+        self._store_mtime = None
 
     def _setup_logger(self) -> logging.Logger:
         """로거 설정"""
@@ -54,6 +138,17 @@ class RAGIndexer:
 
         return logger
 
+    def _initialize_embeddings(self):
+        """임베딩 초기화 (캐시 경로가 있으면 캐시 래퍼 사용)"""
+        embeddings = OpenAIEmbeddings(model=self.config.embedding_model)
+        if not self.config.embedding_cache_path:
+            return embeddings
+        return CachedEmbeddings(
+            embeddings,
+            model=self.config.embedding_model,
+            db_path=self.config.embedding_cache_path,
+        )
+
     def _initialize_vectordb(self) -> Chroma:
         """벡터 데이터베이스 초기화"""
         try:
@@ -70,18 +165,176 @@ class RAGIndexer:
             self.logger.error(f"Failed to initialize vector database: {e}")
             raise
 
+    @property
+    def image_features(self):
+        """이미지 특징 추출기 (처음 사용할 때 생성)"""
+        if self._image_features is None:
+            self._image_features = create_feature_extractor(
+                self.config.image_feature_extractor,
+                embeddings=self.embeddings,
+                onnx_model_path=self.config.onnx_model_path,
+            )
+        return self._image_features
+
+    @property
+    def hash_index(self) -> ImageHashIndex:
+        """이미지 해시 색인 (처음 사용할 때 로드)
+
+        다른 프로세스가 다시 인덱싱해서 색인 파일이 바뀌면 다음 조회 때 새로 읽는다.
+        """
+        path = self.config.hash_index_path or self._index_path("hashes.json")
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if self._hash_index is None or mtime != self._hash_index_mtime:
+            self._hash_index = ImageHashIndex(path)
+            self._hash_index_mtime = mtime
+        return self._hash_index
+
+    def index_version(self) -> str:
+        """해시 색인, 보정 파일, memmap 스냅샷의 수정 시각으로 만든 인덱스 버전
+
+        다시 인덱싱하거나 보정하면 값이 바뀌므로 검색 결과 캐시 키에 넣는다.
+        """
+        paths = [
+            self.config.hash_index_path or self._index_path("hashes.json"),
+            self._index_path("calibration.json"),
+            os.path.join(self._index_path("vectors"), META_FILE),
+        ]
+        return "-".join(
+            f"{os.path.getmtime(path):.6f}" if os.path.exists(path) else "0"
+            for path in paths
+        )
+
+    def _index_path(self, suffix: str) -> str:
+        return os.path.join(
+            self.config.persistent_directory,
+            f"{self.config.collection_name}_{suffix}",
+        )
+
+    @property
+    def store(self):
+        """검색용 벡터 저장소 (memmap 스냅샷이 있으면 스냅샷, 없으면 Chroma)
+
+        스냅샷을 다시 만들면 다음 조회 때 새로 연다.
+        """
+        backend = self.config.vector_backend
+        if backend not in MEMMAP_BACKENDS:
+            return self.vectordb
+
+        meta_path = os.path.join(self._index_path("vectors"), META_FILE)
+        if not os.path.exists(meta_path):
+            if self._store_mtime is None:
+                self.logger.warning(
+                    f"No memmap snapshot at {meta_path}, searching Chroma instead"
+                )
+                self._store_mtime = 0
+            return self.vectordb
+
+        mtime = os.path.getmtime(meta_path)
+        if self._store is None or mtime != self._store_mtime:
+            directory = self._index_path("vectors")
+            self._store = MemmapVectorStore(
+                directory, embedding_function=self.embeddings
+            )
+            if backend != "memmap":
+                if backend in self._store.meta.get("quantization", []):
+                    self._store = QuantizedVectorStore(
+                        directory,
+                        method=backend,
+                        rerank=self.config.quantization_rerank,
+                        embedding_function=self.embeddings,
+                    )
+                else:
+                    self.logger.warning(
+                        f"No {backend} codes in {directory}, using exact memmap search"
+                    )
+            self._store_mtime = mtime
+        return self._store
+
+    def export_vector_store(self) -> Dict[str, Any]:
+        """Chroma 컬렉션을 memmap 스냅샷으로 내보내기"""
+        meta = MemmapVectorStore.build(
+            self.vectordb._collection,
+            self._index_path("vectors"),
+            dtype=self.config.memmap_dtype,
+            quantize=[self.config.vector_backend],
+        )
+        self.logger.info(f"Exported memmap snapshot: {meta}")
+        return meta
+
+    @property
+    def calibration(self) -> ImageMatchCalibration:
+        """이미지 매칭 보정값 (보정 파일이 없거나 다른 추출기용이면 기본값)
+
+        다시 보정해서 보정 파일이 바뀌면 다음 조회 때 새로 읽는다.
+        """
+        path = self._index_path("calibration.json")
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if self._calibration is None or mtime != self._calibration_mtime:
+            calibration = ImageMatchCalibration.load(path)
+            if calibration is None or calibration.extractor != self.image_features.name:
+                calibration = ImageMatchCalibration.default(
+                    self.config.image_match_threshold
+                )
+            self._calibration = calibration
+            self._calibration_mtime = mtime
+        return self._calibration
+
+    def calibrate(
+        self, fetch_k: int = 20, max_samples: int = 2000
+    ) -> Optional[ImageMatchCalibration]:
+        """인덱싱한 이미지로 거리 → 정답 확률 보정값을 학습해서 저장"""
+        stored = self.vectordb._collection.get(include=["embeddings", "metadatas"])
+        calibration = ImageMatchCalibration.fit(
+            stored["embeddings"],
+            [metadata["model_name"] for metadata in stored["metadatas"]],
+            extractor=self.image_features.name,
+            fetch_k=fetch_k,
+            max_samples=max_samples,
+        )
+        if calibration is None:
+            self.logger.warning(
+                "Not enough distinct models to calibrate image matching"
+            )
+            return None
+        path = self._index_path("calibration.json")
+        calibration.save(path)
+        self._calibration = calibration
+        self._calibration_mtime = os.path.getmtime(path)
+        self.logger.info(
+            f"Calibrated image matching on {calibration.samples} samples: "
+            f"threshold={calibration.threshold:.4f}, accuracy={calibration.accuracy:.3f}"
+        )
+        return calibration
+
+    def _check_feature_extractor(self) -> None:
+        """컬렉션이 다른 특징 추출기로 만들어졌으면 초기화 (벡터 차원이 다름)"""
+        existing = self.vectordb._collection.get(limit=1, include=["metadatas"])
+        if not existing["ids"]:
+            return
+        stored = (existing["metadatas"][0] or {}).get("feature_extractor")
+        if stored != self.image_features.name:
+            self.logger.warning(
+                f"Collection was built with {stored or 'base64-prefix'}, "
+                f"re-indexing with {self.image_features.name}"
+            )
+            self.vectordb.reset_collection()
+
     def _get_image_files(self) -> List[Path]:
-        """이미지 파일 목록 가져오기"""
+        """이미지 파일 목록 가져오기 (디렉토리를 한 번만 순회)"""
         figures_dir = Path(self.config.figures_directory)
 
         if not figures_dir.exists():
             raise FileNotFoundError(f"Directory not found: {figures_dir}")
 
+        extensions = {
+            extension.lower() for extension in self.config.supported_extensions
+        }
         image_files = []
-        for extension in self.config.supported_extensions:
-            pattern = f"**/*{extension}"
-            image_files.extend(figures_dir.glob(pattern))
-            image_files.extend(figures_dir.glob(f"**/*{extension.upper()}"))
+        for root, _, files in os.walk(figures_dir):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in extensions:
+                    image_files.append(Path(root) / name)
+        image_files.sort()
 
         self.logger.info(f"Found {len(image_files)} image files")
         return image_files
@@ -89,40 +342,109 @@ class RAGIndexer:
     def _process_single_image(self, image_path: Path) -> Optional[Dict[str, Any]]:
         """단일 이미지 처리"""
         try:
-            # 이미지를 base64로 변환
-            b64_image = image_to_base64(str(image_path))
-            # base64 길이 800으로 제한
-            b64_image = b64_image[:800]
-
-            # 이미지 요약 생성
-            model_name = summarize_image(str(image_path))
-
-            return {
-                "text": b64_image,
-                "metadata": {
-                    "model_name": model_name,
-                },
-            }
+            return build_image_record(str(image_path), self.image_features)
         except Exception as e:
             self.logger.error(f"Failed to process image {image_path}: {e}")
             return None
 
-    def _batch_add_to_vectordb(
-        self, processed_images: List[Dict[str, Any]], batch_size: int = 100
-    ) -> None:
-        """배치 단위로 벡터 데이터베이스에 추가"""
-        for i in range(0, len(processed_images), batch_size):
-            batch = processed_images[i : i + batch_size]
+    def _iter_processed_images(
+        self, image_files: List[Path]
+    ) -> Iterator[Dict[str, Any]]:
+        """이미지를 병렬로 처리하고 끝난 순서대로 반환 (실패한 이미지 제외)
+
+        로컬 특징 추출은 CPU 작업이므로 프로세스 풀을 쓰고, API를 호출하는
+        base64 추출기나 index_executor="thread"면 스레드 풀을 쓴다.
+        결과가 쌓이지 않도록 동시에 제출하는 작업은 workers * 4개로 제한한다.
+        """
+        workers = self.config.index_workers or os.cpu_count() or 1
+        if workers <= 1:
+            for image_path in image_files:
+                record = self._process_single_image(image_path)
+                if record:
+                    yield record
+            return
+
+        use_processes = (
+            self.config.index_executor == "process"
+            and self.config.image_feature_extractor != "base64"
+        )
+        if use_processes:
+            executor = ProcessPoolExecutor(max_workers=workers)
+
+            def submit(image_path):
+                return executor.submit(
+                    _build_image_record_in_worker,
+                    str(image_path),
+                    self.config.image_feature_extractor,
+                    self.config.onnx_model_path,
+                )
 
-            texts = [item["text"] for item in batch]
-            metadatas = [item["metadata"] for item in batch]
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+
+            def submit(image_path):
+                return executor.submit(self._process_single_image, image_path)
+
+        remaining = iter(image_files)
+        with executor:
+            pending = set()
+            for image_path in remaining:
+                pending.add(submit(image_path))
+                if len(pending) >= workers * 4:
+                    break
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if use_processes:
+                        record, error = result
+                        if error:
+                            self.logger.error(error)
+                    else:
+                        record = result
+                    if record:
+                        yield record
+
+                    image_path = next(remaining, None)
+                    if image_path is not None:
+                        pending.add(submit(image_path))
 
+    def _batch_add_to_vectordb(
+        self, processed_images: Iterable[Dict[str, Any]], batch_size: int = 100
+    ) -> int:
+        """배치 단위로 벡터 데이터베이스에 추가하고 저장한 개수 반환
+
+        processed_images는 리스트나 스트림 모두 가능하며, batch_size개가
+        모일 때마다 바로 저장한다.
+        """
+        total = 0
+        batch_number = 0
+        batch = []
+        for item in itertools.chain(processed_images, [None]):
+            if item is not None:
+                batch.append(item)
+                if len(batch) < batch_size:
+                    continue
+            if not batch:
+                break
+
+            batch_number += 1
             try:
-                self.vectordb.add_texts(texts=texts, metadatas=metadatas)
-                self.logger.info(f"Added batch {i//batch_size + 1}: {len(batch)} items")
+                # 특징 벡터를 직접 저장 (같은 경로는 덮어씀)
+                self.vectordb._collection.upsert(
+                    ids=[item["id"] for item in batch],
+                    embeddings=[item["embedding"] for item in batch],
+                    metadatas=[item["metadata"] for item in batch],
+                    documents=[item["text"] for item in batch],
+                )
+                self.logger.info(f"Added batch {batch_number}: {len(batch)} items")
             except Exception as e:
-                self.logger.error(f"Failed to add batch {i//batch_size + 1}: {e}")
+                self.logger.error(f"Failed to add batch {batch_number}: {e}")
                 raise
+            total += len(batch)
+            batch = []
+        return total
 
     def index_images(self, batch_size: int = 100) -> None:
         """이미지 인덱싱 메인 메서드"""
@@ -134,24 +456,41 @@ class RAGIndexer:
                 self.logger.warning("No image files found")
                 return
 
-            # 이미지 처리
-            processed_images = []
+            self._check_feature_extractor()
+
+            # 이미지 처리 결과를 처리되는 대로 벡터 데이터베이스에 배치 저장
             self.logger.info("Processing images...")
+            hashes = []
+
+            def collect_hashes(records):
+                for record in records:
+                    hashes.append((*record["hashes"], record["metadata"]["model_name"]))
+                    yield record
 
-            for image_path in tqdm(image_files, desc="Processing images"):
-                processed_image = self._process_single_image(image_path)
-                if processed_image:
-                    processed_images.append(processed_image)
+            records = tqdm(
+                self._iter_processed_images(image_files),
+                total=len(image_files),
+                desc="Processing images",
+            )
+            added = self._batch_add_to_vectordb(collect_hashes(records), batch_size)
 
             # 성공적으로 처리된 이미지 수 로그
             self.logger.info(
-                f"Successfully processed {len(processed_images)}/{len(image_files)} images"
+                f"Successfully processed {added}/{len(image_files)} images"
             )
 
-            # 벡터 데이터베이스에 배치 저장
-            if processed_images:
-                self.logger.info("Adding to vector database...")
-                self._batch_add_to_vectordb(processed_images, batch_size)
+            if added:
+                # 같은 사진 빠른 조회용 해시 색인 재생성
+                hash_index = self.hash_index
+                hash_index.clear()
+                for phash, dhash, model_name in hashes:
+                    hash_index.add(phash, dhash, model_name)
+                hash_index.save()
+
+                # 새로 인덱싱한 이미지로 매칭 기준 다시 보정
+                self.calibrate()
+                if self.config.vector_backend in MEMMAP_BACKENDS:
+                    self.export_vector_store()
                 self.logger.info("Indexing completed successfully")
             else:
                 self.logger.warning("No images were successfully processed")
@@ -160,23 +499,85 @@ class RAGIndexer:
             self.logger.error(f"Indexing failed: {e}")
             raise
 
-    def search_and_show(self, user_img: str, k: int = 1) -> str:
-        """쿼리로 검색하고 결과 표시"""
-
-        # base64 길이 800으로 제한
-        user_img = user_img[:800]
-
-        # 유사도 검색
-        results = self.vectordb.similarity_search_with_score(user_img, k=k)
-
-        if not results:
-            return -1
-
-        doc, score = results[0]
-        if score <= 0.3:
-            return doc.metadata.get("model_name", -1)
-        else:
-            return -1
+    def search_models(
+        self, image_paths: List[str], k: int = 3, fetch_k: int = 20
+    ) -> List[List[Dict[str, Any]]]:
+        """여러 이미지를 한 번에 검색해서 이미지별 상위 k개 후보 모델 반환
+
+        후보는 점수 순이며 각 후보는 model_code, model_name(가장 가까운 슬라이드),
+        distance, votes, score(모델별 투표 비율), confidence(보정된 정답 확률),
+        matched(confidence >= 0.5)를 가진다. 해시 색인에서 한 모델의 같은 사진을
+        찾으면 그 모델 하나만 confidence 1.0으로 반환하고, 여러 모델의 사진과
+        겹치면 벡터 검색 투표로 판단한다.
+        """
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(image_paths)
+
+        # 인덱싱한 한 모델의 사진과 같거나 거의 같으면 벡터 검색 없이 반환
+        pending = []
+        for i, image_path in enumerate(image_paths):
+            model_name = self.hash_index.lookup(image_path)
+            if model_name is None:
+                pending.append(i)
+                continue
+            results[i] = [
+                {
+                    "model_code": model_key(model_name),
+                    "model_name": model_name,
+                    "distance": 0.0,
+                    "votes": 1,
+                    "score": 1.0,
+                    "confidence": 1.0,
+                    "matched": True,
+                }
+            ]
+
+        if pending:
+            # 나머지 이미지는 특징 벡터를 계산해서 한 번의 쿼리로 검색
+            embeddings = [self.image_features.extract(image_paths[i]) for i in pending]
+            store = self.store
+            query = (
+                store.query if store is not self.vectordb else store._collection.query
+            )
+            try:
+                found = query(
+                    query_embeddings=embeddings,
+                    n_results=fetch_k,
+                    include=["metadatas", "distances"],
+                )
+            except Exception as e:
+                self.logger.error(
+                    f"Image search failed (re-run rag_img_input.py if the collection "
+                    f"was built with another feature extractor): {e}"
+                )
+                found = {
+                    "metadatas": [[] for _ in pending],
+                    "distances": [[] for _ in pending],
+                }
+
+            calibration = self.calibration
+            for i, metadatas, distances in zip(
+                pending, found["metadatas"], found["distances"]
+            ):
+                neighbors = [
+                    (metadata["model_name"], distance)
+                    for metadata, distance in zip(metadatas, distances)
+                ]
+                candidates = vote_candidates(neighbors, calibration.temperature)[:k]
+                for candidate in candidates:
+                    candidate["confidence"] = calibration.confidence(
+                        candidate["distance"]
+                    )
+                    candidate["matched"] = candidate["confidence"] >= 0.5
+                results[i] = candidates
+
+        return results
+
+    def search_and_show(self, image_path: str, k: int = 1) -> str:
+        """이미지로 검색해서 가장 유력한 모델명 반환 (못 찾으면 -1)"""
+        candidates = self.search_models([image_path], k=max(k, 1))[0]
+        if candidates and candidates[0]["matched"]:
+            return candidates[0]["model_name"]
+        return -1
 
     def get_collection_info(self) -> Dict[str, Any]:
         """컬렉션 정보 조회"""
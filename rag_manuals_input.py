@@ -1,13 +1,37 @@
+import argparse
 import glob
 import logging
 import os
-import tiktoken
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 from pdfminer.high_level import extract_text
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
+from utils.text_cache import ExtractedTextCache
+from utils.tokens import count_tokens
+from utils.embedding_cache import CachedEmbeddings, text_sha256
+from utils.manifest import IndexManifest
+from utils.pipeline import prefetch
+from utils.embedding_writer import EmbeddingWriter
+from utils.checkpoint import BatchJournal
+from utils.dedup import ChunkDeduplicator
+from utils.index import (
+    extract_model_code,
+    detect_brand,
+    model_flag_key,
+    brand_flag_key,
+)
+from utils.bm25 import BM25Index
+from utils.vector_store import (
+    DEFAULT_BACKEND,
+    DEFAULT_DTYPE,
+    MEMMAP_BACKENDS,
+    MemmapVectorStore,
+)
 
 load_dotenv()
 
@@ -16,6 +40,10 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # pdfminer 경고 무시
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
+# PDF 추출 텍스트 캐시 (청크 설정을 바꿔 다시 분할할 때 추출 생략)
+PDF_TEXT_CACHE_DIR = "./cache/pdf_text"
+text_cache = ExtractedTextCache(PDF_TEXT_CACHE_DIR)
+
 
 def get_pdf_files(base_dir):
     """하위 디렉토리 모든 PDF 파일 목록 가져오기"""
@@ -24,15 +52,30 @@ def get_pdf_files(base_dir):
 
 
 def extract_text_from_pdf(pdf_path):
-    """PDF 텍스트 추출하기"""
+    """PDF 텍스트 추출하기 (캐시에 있으면 캐시 사용)"""
     try:
-        text = extract_text(pdf_path)
+        text = text_cache.get_or_extract(pdf_path, extract_text)
         return text
     except Exception as e:
         print(f"PDF 읽기 실패 {pdf_path}: {e}")
         return ""
 
 
+def make_chunk_id(model_name, chunk_id):
+    """모델명과 청크 번호로 결정적인 청크 ID 생성"""
+    return f"{model_name}:{chunk_id}"
+
+
+def model_info(pdf_path):
+    """PDF 경로에서 (모델명, 모델코드, 브랜드) 추출
+
+    모델명은 파일명, 브랜드는 디렉토리/파일명에서 찾는다.
+    모델코드와 브랜드는 검색 시 where 필터에 쓴다.
+    """
+    model_name = os.path.basename(pdf_path).replace(".pdf", "")
+    return model_name, extract_model_code(model_name), detect_brand(pdf_path)
+
+
 def process_pdf_text(pdf_path):
     """PDF 텍스트 처리 및 청크 분할"""
     # PDF에서 텍스트 추출
@@ -41,9 +84,8 @@ def process_pdf_text(pdf_path):
     if not text.strip():
         return []
 
-    # 파일명에서 모델명 추출
-    filename = os.path.basename(pdf_path)
-    model_name = filename.replace(".pdf", "")
+    # 파일 경로에서 모델명/모델코드/브랜드 추출
+    model_name, model_code, brand = model_info(pdf_path)
 
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=500,
@@ -55,67 +97,291 @@ def process_pdf_text(pdf_path):
     # 텍스트 청크로 분할
     chunks = text_splitter.split_text(text)
 
+    # 토큰 수를 한 번에 계산해서 메타데이터에 저장 (배치 구성/검색 시 재사용)
+    token_counts = count_tokens(chunks)
+
     # 각 청크에 메타데이터 추가
     processed_chunks = []
-    for i, chunk in enumerate(chunks):
+    for i, (chunk, token_count) in enumerate(zip(chunks, token_counts)):
         processed_chunks.append(
             {
+                # 재실행해도 같은 청크는 같은 ID로 upsert 되도록 결정적 ID 사용
+                "id": make_chunk_id(model_name, i + 1),
                 "text": chunk,
                 "metadata": {
                     "model_name": model_name,
+                    "model_code": model_code,
+                    "brand": brand,
                     "chunk_id": i + 1,
                     "total_chunks": len(chunks),
+                    "token_count": token_count,
                 },
             }
         )
+        if model_code:
+            processed_chunks[-1]["metadata"][model_flag_key(model_code)] = True
+        if brand:
+            processed_chunks[-1]["metadata"][brand_flag_key(brand)] = True
 
     return processed_chunks
 
 
+class PdfTimeoutError(BaseException):
+    """PDF 처리 시간 초과
+
+    extract_text_from_pdf의 Exception 처리에 잡히지 않도록 BaseException을 상속한다.
+    """
+
+
+def _raise_pdf_timeout(signum, frame):
+    raise PdfTimeoutError()
+
+
+def process_pdf_with_timeout(pdf_path, timeout=None):
+    """제한 시간 안에 PDF를 처리하고 (경로, 청크 목록) 반환
+
+    시간 초과 시 청크 목록 대신 None을 반환한다.
+    SIGALRM을 쓸 수 없는 환경(Windows, 메인 스레드가 아닌 경우)에서는 제한 없이 처리한다.
+    """
+    use_alarm = (
+        timeout
+        and hasattr(signal, "SIGALRM")
+        and threading.current_thread() is threading.main_thread()
+    )
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_pdf_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return pdf_path, process_pdf_text(pdf_path)
+    except PdfTimeoutError:
+        print(f"PDF 처리 시간 초과 {pdf_path} ({timeout}초)")
+        return pdf_path, None
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def iter_processed_pdfs(pdf_paths, workers=1, timeout=None):
+    """PDF를 병렬로 처리하고 끝난 순서대로 (경로, 청크 목록) 반환
+
+    결과가 쌓이지 않도록 동시에 제출하는 작업은 workers * 2개로 제한한다.
+    workers가 1이어도 프로세스 풀에서 처리한다. 이 함수는 prefetch 스레드에서
+    실행되므로 직접 처리하면 SIGALRM 제한 시간을 걸 수 없기 때문이다.
+    """
+    if timeout and not hasattr(signal, "SIGALRM"):
+        print(f"이 환경에서는 PDF 처리 제한 시간({timeout}초)을 적용할 수 없습니다.")
+
+    workers = max(workers, 1)
+    remaining = iter(pdf_paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for pdf_path in remaining:
+            pending.add(executor.submit(process_pdf_with_timeout, pdf_path, timeout))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                pdf_path = next(remaining, None)
+                if pdf_path is not None:
+                    pending.add(
+                        executor.submit(process_pdf_with_timeout, pdf_path, timeout)
+                    )
+
+
 MAX_TOKENS_PER_REQUEST = 300000
-# text-embedding-3-small에 맞는 encoding
-encoding = tiktoken.get_encoding("cl100k_base")
 
 
-def batch_by_tokens(texts, metadatas, max_tokens=MAX_TOKENS_PER_REQUEST):
-    batches = []
+def iter_deduplicated(file_results, dedup):
+    """청크를 중복 제거 인덱스에 배정하고 새로 임베딩할 청크만 표시
+
+    각 청크에 대표 벡터 ID(vector_id)와 중복 여부(duplicate)를 추가한다.
+    """
+    for pdf_path, chunks in file_results:
+        for chunk in chunks:
+            vector_id, is_new = dedup.assign(chunk["id"], chunk["text"])
+            chunk["vector_id"] = vector_id
+            chunk["duplicate"] = not is_new
+            if is_new:
+                chunk["metadata"]["model_names"] = chunk["metadata"]["model_name"]
+        yield pdf_path, chunks
+
+
+def update_shared_metadata(vectordb, dedup, models=None):
+    """멤버가 바뀐 대표 벡터의 모델 메타데이터 갱신
+
+    model_name/model_code/brand는 남아 있는 모델 중 하나(기존 모델이 남아 있으면
+    그대로)를 기준으로 다시 채워서 항상 같은 모델을 가리키게 한다.
+    모델/브랜드 필터 키는 공유하는 모든 모델 기준으로 켠다.
+    models는 모델명 → (모델명, 모델코드, 브랜드)이며, 없는 모델은 모델명에서 추출한다.
+    """
+    vector_ids = dedup.pop_dirty_committed()
+    if not vector_ids:
+        return
+    models = models or {}
+    existing = vectordb._collection.get(ids=vector_ids, include=["metadatas"])
+    metadatas = []
+    for vector_id, metadata in zip(existing["ids"], existing["metadatas"]):
+        model_names = dedup.model_names(vector_id)
+        metadata["model_names"] = ",".join(model_names)
+
+        # 대표 모델이 빠졌으면 남은 모델로 교체
+        primary = metadata.get("model_name")
+        if primary not in model_names:
+            primary = model_names[0]
+        _, model_code, brand = models.get(primary) or model_info(primary)
+        metadata.update(model_name=primary, model_code=model_code, brand=brand)
+
+        # 공유하는 모든 모델/브랜드의 필터 키를 켜고, 더 이상 공유하지 않는 키는 제거
+        codes = filter(None, map(extract_model_code, model_names))
+        brands = ((models.get(name) or model_info(name))[2] for name in model_names)
+        flags = {model_flag_key(code) for code in codes}
+        flags |= {brand_flag_key(b) for b in brands if b}
+        prefixes = (model_flag_key(""), brand_flag_key(""))
+        for key in list(metadata):
+            if key.startswith(prefixes) and key not in flags:
+                metadata[key] = None
+        for key in flags:
+            metadata[key] = True
+        metadatas.append(metadata)
+    if metadatas:
+        vectordb._collection.update(ids=existing["ids"], metadatas=metadatas)
+
+
+def iter_token_batches(file_results, max_tokens=MAX_TOKENS_PER_REQUEST, skip=None):
+    """(경로, 청크 목록) 스트림을 토큰 수 기준 배치 스트림으로 변환
+
+    각 배치는 (texts, metadatas, ids, completed_files, tokens)이며, completed_files는
+    이 배치까지 저장되면 모든 청크가 저장되는 (경로, 청크 ID 목록)이다.
+    배치 ID는 대표 벡터 ID(vector_id)가 있으면 그 값을 쓰고, 다른 청크와 벡터를
+    공유하는 중복 청크와 skip(chunk)가 참인 청크(이미 저장된 청크)는 배치에 넣지 않는다.
+    """
     current_texts = []
     current_metadatas = []
+    current_ids = []
     current_tokens = 0
-
-    for text, metadata in zip(texts, metadatas):
-        tokens = len(encoding.encode(text))
-        if tokens > max_tokens:
-            # 너무 긴 단일 텍스트 → 따로 처리
-            print(f"텍스트 하나가 {tokens} 토큰으로 너무 깁니다. 잘라서 넣으세요!")
-            continue
-
-        if current_tokens + tokens > max_tokens:
-            # 현재 배치 마감
-            batches.append((current_texts, current_metadatas))
-            current_texts = []
-            current_metadatas = []
-            current_tokens = 0
-
-        current_texts.append(text)
-        current_metadatas.append(metadata)
-        current_tokens += tokens
+    completed_files = []
+
+    for pdf_path, chunks in file_results:
+        # 메타데이터에 토큰 수가 없는 청크만 한 번에 계산
+        missing = [c for c in chunks if "token_count" not in c["metadata"]]
+        counted = count_tokens([c["text"] for c in missing])
+        for chunk, token_count in zip(missing, counted):
+            chunk["metadata"]["token_count"] = token_count
+
+        for chunk in chunks:
+            if chunk.get("duplicate") or (skip and skip(chunk)):
+                continue
+            tokens = chunk["metadata"]["token_count"]
+            if tokens > max_tokens:
+                # 너무 긴 단일 텍스트 → 따로 처리
+                print(f"텍스트 하나가 {tokens} 토큰으로 너무 깁니다. 잘라서 넣으세요!")
+                continue
+
+            if current_texts and current_tokens + tokens > max_tokens:
+                # 현재 배치 마감
+                yield (
+                    current_texts,
+                    current_metadatas,
+                    current_ids,
+                    completed_files,
+                    current_tokens,
+                )
+                current_texts = []
+                current_metadatas = []
+                current_ids = []
+                current_tokens = 0
+                completed_files = []
+
+            current_texts.append(chunk["text"])
+            current_metadatas.append(chunk["metadata"])
+            current_ids.append(chunk.get("vector_id", chunk["id"]))
+            current_tokens += tokens
+
+        completed_files.append((pdf_path, [chunk["id"] for chunk in chunks]))
 
     # 마지막 배치 추가
-    if current_texts:
-        batches.append((current_texts, current_metadatas))
-
-    return batches
+    if current_texts or completed_files:
+        yield (
+            current_texts,
+            current_metadatas,
+            current_ids,
+            completed_files,
+            current_tokens,
+        )
 
 
 def main():
     """메인 실행 함수"""
+    parser = argparse.ArgumentParser(description="매뉴얼 PDF 인덱싱")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="변경 여부와 관계없이 모든 PDF를 다시 처리",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="중단된 이전 실행에서 이미 저장된 배치를 건너뛰고 이어서 처리",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="PDF 텍스트 추출 프로세스 수",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=300,
+        help="PDF 한 개당 처리 제한 시간(초)",
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=0.9,
+        help="유사 중복으로 볼 MinHash Jaccard 유사도 (1.0이면 사실상 완전 중복만 제거)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="동시에 임베딩하는 배치 수",
+    )
+    parser.add_argument(
+        "--tpm",
+        type=int,
+        default=1_000_000,
+        help="임베딩 API 분당 토큰 한도",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        default=3_000,
+        help="임베딩 API 분당 요청 한도",
+    )
+    args = parser.parse_args()
+
     BASE_DIR = "./data/manuals/"
     EMBEDDINGS_MODEL = "text-embedding-3-small"
     COLLECTION_NAME = "manuals"
     VECTOR_DB_DIR = "./chroma"
-
-    embeddings = OpenAIEmbeddings(model=EMBEDDINGS_MODEL)
+    EMBEDDING_CACHE_PATH = "./cache/embeddings.sqlite"
+    MANIFEST_PATH = os.path.join(VECTOR_DB_DIR, f"{COLLECTION_NAME}_manifest.json")
+    JOURNAL_PATH = os.path.join(VECTOR_DB_DIR, f"{COLLECTION_NAME}_journal.jsonl")
+    DEDUP_PATH = os.path.join(VECTOR_DB_DIR, f"{COLLECTION_NAME}_dedup.json")
+    BM25_PATH = os.path.join(VECTOR_DB_DIR, f"{COLLECTION_NAME}_bm25.json")
+    MEMMAP_DIR = os.path.join(VECTOR_DB_DIR, f"{COLLECTION_NAME}_vectors")
+
+    # 같은 청크는 다시 임베딩하지 않도록 캐시 래퍼 사용
+    embeddings = CachedEmbeddings(
+        OpenAIEmbeddings(model=EMBEDDINGS_MODEL),
+        model=EMBEDDINGS_MODEL,
+        db_path=EMBEDDING_CACHE_PATH,
+    )
     vectordb = Chroma(
         collection_name=COLLECTION_NAME,
         embedding_function=embeddings,
@@ -129,31 +395,139 @@ def main():
     if not pdf_files:
         print("PDF 파일을 찾을 수 없습니다.")
 
-    print(f"총 {len(pdf_files)}개의 PDF 파일을 처리합니다.")
-
-    # 전체 텍스트 청크 저장
-    all_chunks = []
-
-    for pdf_path in tqdm(pdf_files, desc="PDF 처리 중"):
-        chunks = process_pdf_text(pdf_path)
-        all_chunks.extend(chunks)
-        print(f"처리완료: {os.path.basename(pdf_path)} - {len(chunks)}개 청크")
+    # 매니페스트와 비교해서 새로 추가/변경/삭제된 PDF 찾기
+    manifest = IndexManifest(MANIFEST_PATH)
+    changed, removed = manifest.diff(pdf_files, full=args.full)
 
-    # 벡터 데이터베이스에 저장
-    if all_chunks:
-        print(f"\n총 {len(all_chunks)}개 청크를 벡터DB에 저장 중...")
-
-        texts = [chunk["text"] for chunk in all_chunks]
-        metadatas = [chunk["metadata"] for chunk in all_chunks]
+    print(
+        f"총 {len(pdf_files)}개의 PDF 중 {len(changed)}개를 처리하고 "
+        f"{len(removed)}개를 삭제합니다."
+    )
 
-        batches = batch_by_tokens(texts, metadatas)
+    # 저장 완료된 배치 저널 (--resume이 아니면 새로 시작)
+    journal = BatchJournal(JOURNAL_PATH, resume=args.resume)
+    if args.resume:
+        print(f"이전 실행에서 저장된 청크 {len(journal)}개를 건너뜁니다.")
+
+    # 여러 매뉴얼에 공통으로 들어 있는 청크는 대표 벡터 하나만 저장
+    dedup = ChunkDeduplicator(DEDUP_PATH, threshold=args.dedup_threshold)
+
+    # 삭제되거나 변경된 PDF의 기존 청크 제거
+    stale_ids = []
+    for pdf_path in removed:
+        stale_ids.extend(manifest.chunk_ids(pdf_path))
+    for pdf_path, _ in changed:
+        stale_ids.extend(manifest.chunk_ids(pdf_path))
+
+    # 다른 매뉴얼과 공유하지 않게 된 대표 벡터만 삭제
+    # (중단된 실행에서 이미 새 내용으로 저장한 벡터는 제외)
+    delete_ids = []
+    for chunk_id in stale_ids:
+        released = dedup.release(chunk_id)
+        if released is None:
+            # 중복 제거 도입 이전에 저장된 청크
+            delete_ids.append(chunk_id)
+        elif not released[1]:
+            delete_ids.append(released[0])
+    delete_ids = [
+        vector_id for vector_id in delete_ids if vector_id not in journal.committed
+    ]
+    if delete_ids:
+        vectordb.delete(ids=delete_ids)
+        print(f"기존 청크 {len(delete_ids)}개 삭제")
+
+    # 공유 청크의 대표 모델을 바꿀 때 쓰는 모델명 → (모델명, 모델코드, 브랜드)
+    models = {info[0]: info for info in map(model_info, pdf_files)}
+    update_shared_metadata(vectordb, dedup, models)
+    for pdf_path in removed:
+        manifest.forget(pdf_path)
+
+    fingerprints = dict(changed)
+
+    def iter_completed_pdfs():
+        """추출/분할이 끝난 PDF를 끝난 순서대로 반환 (시간 초과된 PDF 제외)"""
+        results = iter_processed_pdfs(
+            list(fingerprints), workers=args.workers, timeout=args.timeout
+        )
+        for pdf_path, chunks in tqdm(results, total=len(changed), desc="PDF 처리 중"):
+            if chunks is None:
+                # 시간 초과된 PDF는 매니페스트에 기록하지 않아 다음 실행 때 다시 처리
+                continue
+            print(f"처리완료: {os.path.basename(pdf_path)} - {len(chunks)}개 청크")
+            yield pdf_path, chunks
+
+    # 추출 → 분할 → 토큰 배치는 백그라운드에서 진행하고,
+    # 배치가 준비되는 대로 임베딩/저장 (큐 크기 제한으로 메모리 사용량 일정)
+    def is_committed(chunk):
+        committed = journal.is_committed(
+            chunk["vector_id"], text_sha256(chunk["text"])
+        )
+        if committed:
+            dedup.mark_committed([chunk["vector_id"]])
+        return committed
+
+    batches = prefetch(
+        iter_token_batches(
+            iter_deduplicated(iter_completed_pdfs(), dedup), skip=is_committed
+        ),
+        maxsize=args.concurrency + 1,
+    )
 
-        for batch_texts, batch_metadatas in tqdm(batches, desc="임베딩 배치 저장 중"):
-            vectordb.add_texts(texts=batch_texts, metadatas=batch_metadatas)
+    # 여러 배치를 분당 토큰/요청 한도 안에서 동시에 임베딩하고 순서대로 저장
+    writer = EmbeddingWriter(
+        vectordb,
+        concurrency=args.concurrency,
+        tokens_per_minute=args.tpm,
+        requests_per_minute=args.rpm,
+    )
 
+    total_chunks = 0
+    for batch_texts, _, batch_ids, completed_files, _ in writer.write(batches):
+        if batch_texts:
+            # 저장 완료된 배치를 저널에 기록해서 중단되어도 이어서 처리 가능
+            journal.record(batch_ids, [text_sha256(text) for text in batch_texts])
+            dedup.mark_committed(batch_ids)
+            total_chunks += len(batch_texts)
+            print(f"배치 저장 완료: {len(batch_texts)}개 청크 (누적 {total_chunks}개)")
+
+        # 다른 매뉴얼과 공유하는 대표 벡터의 모델 목록 갱신
+        update_shared_metadata(vectordb, dedup, models)
+
+        # 모든 청크가 저장된 PDF만 매니페스트에 기록
+        for pdf_path, chunk_ids in completed_files:
+            manifest.record(pdf_path, fingerprints[pdf_path], chunk_ids)
+        manifest.save()
+        dedup.save()
+
+    if total_chunks:
         print("벡터DB 저장 완료!")
+        print(f"임베딩 캐시 통계: {embeddings.stats()}")
     else:
         print("처리할 텍스트가 없습니다.")
+    update_shared_metadata(vectordb, dedup, models)
+    manifest.save()
+    dedup.save()
+
+    # 모든 배치가 저장되었으므로 저널 삭제
+    journal.clear()
+
+    # 벡터DB와 같은 청크로 BM25 인덱스 재생성 (키워드 검색용)
+    if changed or removed or not os.path.exists(BM25_PATH):
+        bm25 = BM25Index.from_collection(vectordb._collection)
+        bm25.save(BM25_PATH)
+        print(f"BM25 인덱스 저장 완료: {len(bm25)}개 청크")
+
+    # VECTOR_BACKEND가 memmap/int8/pq면 검색용 메모리 맵 스냅샷도 다시 생성
+    if DEFAULT_BACKEND in MEMMAP_BACKENDS and (
+        changed or removed or not os.path.exists(MEMMAP_DIR)
+    ):
+        meta = MemmapVectorStore.build(
+            vectordb._collection,
+            MEMMAP_DIR,
+            dtype=DEFAULT_DTYPE,
+            quantize=[DEFAULT_BACKEND],
+        )
+        print(f"메모리 맵 스냅샷 저장 완료: {meta}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from typing import Dict, Tuple, Any, Callable, Optional
+from langchain_openai import ChatOpenAI
+from langchain_tavily import TavilySearch
+from rag_indexer_class import IndexConfig, RAGIndexer
+from utils.bm25 import BM25Index
+
+
+class ResourceRegistry:
+    """프로세스 전역에서 재사용하는 인덱서/LLM 클라이언트 레지스트리
+
+    Chroma 클라이언트, 임베딩 클라이언트, LLM 클라이언트는 생성 비용이 크고
+    SQLite 핸들을 잡고 있으므로 질문마다 새로 만들지 않고 한 번만 생성해서 공유한다.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources: Dict[Tuple, Any] = {}
+        self._setup_count = 0
+        self._setup_total = 0.0
+        self._last_setup = 0.0
+
+    def _get_or_create(self, key: Tuple, factory: Callable[[], Any]) -> Any:
+        """키에 해당하는 리소스를 가져오거나 한 번만 생성"""
+        resource = self._resources.get(key)
+        if resource is not None:
+            return resource
+
+        with self._lock:
+            # 다른 스레드가 먼저 만들었을 수 있으므로 다시 확인
+            resource = self._resources.get(key)
+            if resource is None:
+                resource = factory()
+                self._resources[key] = resource
+        return resource
+
+    def get_indexer(
+        self, persistent_directory: str, collection_name: str, embedding_model: str
+    ) -> RAGIndexer:
+        """(저장 경로, 컬렉션, 임베딩 모델) 키로 인덱서를 가져오거나 생성"""
+
+        def factory():
+            config = IndexConfig(
+                persistent_directory=persistent_directory,
+                collection_name=collection_name,
+                embedding_model=embedding_model,
+            )
+            return RAGIndexer(config)
+
+        key = ("indexer", persistent_directory, collection_name, embedding_model)
+        return self._get_or_create(key, factory)
+
+    def get_llm(self, model: str, temperature: float = 0.3) -> ChatOpenAI:
+        """(모델명, temperature) 키로 LLM 클라이언트를 가져오거나 생성"""
+        key = ("llm", model, temperature)
+        return self._get_or_create(
+            key, lambda: ChatOpenAI(model=model, temperature=temperature)
+        )
+
+    def get_web_search(self, max_results: int = 5) -> TavilySearch:
+        """Tavily 웹 검색 도구를 가져오거나 생성"""
+        key = ("web_search", max_results)
+        return self._get_or_create(key, lambda: TavilySearch(max_results=max_results))
+
+    def get_lexical_index(self, path: str) -> Optional[BM25Index]:
+        """BM25 인덱스를 가져오거나 로드 (파일이 없으면 None)
+
+        경로마다 (수정 시각, 인덱스) 하나만 보관하고, 다시 인덱싱해서 수정 시각이
+        바뀌면 새 인덱스를 로드해서 이전 인덱스를 교체한다.
+        """
+        if not os.path.exists(path):
+            return None
+        key = ("lexical", path)
+        mtime = os.path.getmtime(path)
+        cached = self._resources.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with self._lock:
+            # 다른 스레드가 먼저 로드했을 수 있으므로 다시 확인
+            cached = self._resources.get(key)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, BM25Index.load(path))
+                self._resources[key] = cached
+        return cached[1]
+
+    def record_setup(self, seconds: float) -> None:
+        """요청당 준비(리소스 조회/생성) 시간 기록"""
+        with self._lock:
+            self._setup_count += 1
+            self._setup_total += seconds
+            self._last_setup = seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """레지스트리 상태 및 요청당 준비 시간 통계"""
+        with self._lock:
+            avg = self._setup_total / self._setup_count if self._setup_count else 0.0
+            return {
+                "resources": len(self._resources),
+                "requests": self._setup_count,
+                "last_setup_ms": self._last_setup * 1000,
+                "avg_setup_ms": avg * 1000,
+            }
+
+
+# 프로세스 전역 레지스트리
+registry = ResourceRegistry()
+
+
+def warmup(indexers=(), llms=(), web_search: bool = False, lexical_indexes=()) -> float:
+    """프로세스 시작 시 인덱서/LLM 클라이언트를 미리 생성하고 소요 시간(초) 반환"""
+    start = time.perf_counter()
+    for persistent_directory, collection_name, embedding_model in indexers:
+        registry.get_indexer(persistent_directory, collection_name, embedding_model)
+    for path in lexical_indexes:
+        registry.get_lexical_index(path)
+    for model, temperature in llms:
+        registry.get_llm(model, temperature)
+    if web_search:
+        registry.get_web_search()
+    return time.perf_counter() - start
@@ -0,0 +1,591 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Callable, Optional, Sequence, Union
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+from utils.index import brand_flag_key, model_flag_key
+from utils.bm25 import is_exact_term
+from utils.tokens import count_tokens
+from utils.vector_store import multi_query_mmr_select, normalize_rows
+
+# Reciprocal Rank Fusion 상수 (순위가 낮은 문서의 영향을 완만하게 줄임)
+RRF_K = 60
+
+# 소스별 마감 시간(초): 느린 소스가 전체 답변을 붙잡지 않도록 제한
+WEB_SEARCH_TIMEOUT = 5.0
+VECTOR_SEARCH_TIMEOUT = 10.0
+
+# 프롬프트에 넣을 컨텍스트 문서의 최대 토큰 수
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+# 소스별로 요청 간 공유하는 스레드 풀 (마감 시간을 넘긴 작업이 요청 종료를 막지
+# 않도록 asyncio 기본 executor 대신 사용). _with_deadline은 기다리기만 멈추고
+# 스레드에서 실행 중인 호출은 끝날 때까지 작업자를 차지하므로, 소스마다 풀을 나눠
+# 느린 웹 검색이 쌓여도 벡터 검색/질문 분석은 기다리지 않게 한다. 한 소스의 풀이
+# 가득 차면 그 소스의 다음 요청만 대기열에서 기다리다 마감 시간을 넘길 수 있다.
+_executors = {
+    "web": ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval-web"),
+    "vector": ThreadPoolExecutor(max_workers=16, thread_name_prefix="retrieval-vector"),
+    "analysis": ThreadPoolExecutor(
+        max_workers=8, thread_name_prefix="retrieval-analysis"
+    ),
+}
+
+
+def run_blocking(func, *args, source: str = "vector"):
+    """블로킹 함수를 소스별 스레드 풀에서 실행"""
+    executor = _executors[source]
+    return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+def web_results_to_documents(search_result: Dict[str, Any]) -> List[Document]:
+    """Tavily 검색 결과를 Document 목록으로 변환"""
+    docs = []
+    for item in search_result.get("results", []):
+        content = item.get("content", "")
+        url = item.get("url", "")
+
+        if content:  # 내용이 있으면 추가
+            docs.append(
+                Document(
+                    page_content=content,
+                    metadata={"source": url, "title": item.get("title", "")},
+                )
+            )
+    return docs
+
+
+def _doc_key(doc: Document) -> str:
+    """중복 판별용 문서 키 (벡터DB ID가 있으면 ID, 없으면 본문)"""
+    return doc.id or doc.page_content
+
+
+def _search_once(vectordb, embedding, search_type: str, search_kwargs: Dict):
+    if search_type == "mmr":
+        return vectordb.max_marginal_relevance_search_by_vector(
+            embedding, **search_kwargs
+        )
+    kwargs = {k: v for k, v in search_kwargs.items() if k != "fetch_k"}
+    return vectordb.similarity_search_by_vector(embedding, **kwargs)
+
+
+def search_by_vector(
+    vectordb,
+    embedding,
+    search_type: str,
+    search_kwargs: Dict,
+    fallback_filters: Optional[List[Optional[Dict]]] = None,
+):
+    """미리 계산한 임베딩으로 벡터 검색 (retriever와 같은 검색 방식 사용)
+
+    fallback_filters가 있으면 앞의 필터부터 검색하고, 결과가 k개보다 적으면
+    다음 필터(None이면 전체)로 넓혀서 부족한 만큼 채운다.
+    """
+    if not fallback_filters:
+        return _search_once(vectordb, embedding, search_type, search_kwargs)
+
+    k = search_kwargs.get("k", 4)
+    docs, seen = [], set()
+    for where in fallback_filters:
+        kwargs = {**search_kwargs, "filter": where}
+        for doc in _search_once(vectordb, embedding, search_type, kwargs):
+            key = _doc_key(doc)
+            if key not in seen:
+                seen.add(key)
+                docs.append(doc)
+        if len(docs) >= k:
+            break
+    return docs[:k]
+
+
+def _batch_query(vectordb):
+    """Chroma collection.query 형태의 일괄 검색 함수 (Chroma 또는 MemmapVectorStore)"""
+    collection = getattr(vectordb, "_collection", None)
+    return collection.query if collection is not None else vectordb.query
+
+
+def mmr_search_many(
+    vectordb,
+    embeddings: List[List[float]],
+    search_kwargs: Dict,
+    fallback_filters: Optional[List[Optional[Dict]]] = None,
+) -> List[List[Document]]:
+    """여러 질의 임베딩의 MMR 검색을 한 번에 처리 (질의 순서대로 최대 k개씩 반환)
+
+    질의별 fetch_k개 후보를 후보 임베딩과 함께 한 번의 일괄 검색으로 가져와
+    하나의 후보 풀로 합치고, 유사도 행렬을 NumPy로 한 번 계산해서 모든 질의의 MMR
+    선택을 동시에 한다. 여러 키워드에 맞는 문서는 각 키워드 결과에 모두 들어간다.
+    fallback_filters는 search_by_vector와 같이 앞의 필터 결과부터 사용하고,
+    k개를 고르지 못한 질의만 다음 필터로 넓혀서 검색한다.
+    """
+    k = search_kwargs.get("k", 4)
+    fetch_k = search_kwargs.get("fetch_k", 20)
+    lambda_mult = search_kwargs.get("lambda_mult", 0.5)
+    filters = fallback_filters or [search_kwargs.get("filter")]
+    query = _batch_query(vectordb)
+    queries = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+    docs: List[Document] = []
+    vectors, tiers = [], []
+    positions: Dict[str, int] = {}
+    selected: List[List[int]] = [[] for _ in embeddings]
+    pending = list(range(len(embeddings)))
+    for tier, where in enumerate(filters):
+        if not pending:
+            break
+        found = query(
+            query_embeddings=[embeddings[i] for i in pending],
+            n_results=fetch_k,
+            where=where,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        for ids, texts, metadatas, hit_vectors in zip(
+            found["ids"], found["documents"], found["metadatas"], found["embeddings"]
+        ):
+            for doc_id, text, metadata, vector in zip(
+                ids, texts, metadatas, hit_vectors
+            ):
+                if doc_id in positions:
+                    continue
+                positions[doc_id] = len(docs)
+                docs.append(
+                    Document(
+                        id=doc_id, page_content=text or "", metadata=metadata or {}
+                    )
+                )
+                vectors.append(vector)
+                tiers.append(tier)
+        if not docs:
+            continue
+
+        candidates = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        selected = multi_query_mmr_select(
+            candidates @ queries.T,
+            candidates @ candidates.T,
+            k,
+            lambda_mult,
+            np.array(tiers),
+        )
+        # 선택한 문서가 k개보다 적은 질의만 다음 필터로 넓혀서 검색
+        pending = [i for i in pending if len(selected[i]) < k]
+
+    return [[docs[i] for i in rows] for rows in selected]
+
+
+def model_fallback_filters(
+    vectordb, model_codes: Union[str, List[str]]
+) -> List[Optional[Dict]]:
+    """모델코드(여러 개면 그중 하나) → 같은 브랜드 → 전체 순서의 검색 필터 목록
+
+    브랜드는 model_code가 해당 모델인 청크에서 읽는다. 모델 필터 키(model:코드)로
+    찾으면 다른 브랜드 매뉴얼과 공유하는 청크가 나올 수 있기 때문이다.
+    브랜드 단계는 브랜드 필터 키(brand:브랜드)로 걸러서 대표 모델이 다른 브랜드인
+    공유 청크도 포함한다.
+    """
+    if isinstance(model_codes, str):
+        model_codes = [model_codes]
+    flags = [{model_flag_key(code): True} for code in model_codes]
+    model_filter = flags[0] if len(flags) == 1 else {"$or": flags}
+    filters = [model_filter]
+
+    brands = []
+    for code in model_codes:
+        found = vectordb.get(where={"model_code": code}, limit=1, include=["metadatas"])
+        brand = found["metadatas"][0].get("brand") if found["metadatas"] else ""
+        if brand and brand not in brands:
+            brands.append(brand)
+    brand_flags = [{brand_flag_key(brand): True} for brand in brands]
+    if len(brand_flags) == 1:
+        filters.append(brand_flags[0])
+    elif brand_flags:
+        filters.append({"$or": brand_flags})
+
+    filters.append(None)
+    return filters
+
+
+class ModelFilteredRetriever(VectorStoreRetriever):
+    """메타데이터 필터를 단계적으로 넓혀가며 검색하는 retriever"""
+
+    fallback_filters: List[Optional[Dict]] = []
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs
+    ) -> List[Document]:
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        return search_by_vector(
+            self.vectorstore,
+            embedding,
+            self.search_type,
+            {**self.search_kwargs, **kwargs},
+            self.fallback_filters,
+        )
+
+
+def lexical_search(
+    index,
+    query: str,
+    k: int,
+    fallback_filters: Optional[List[Optional[Dict]]] = None,
+) -> List[Document]:
+    """BM25 인덱스 검색 (필터는 search_by_vector와 같은 순서로 넓혀감)"""
+    docs, seen = [], set()
+    for where in fallback_filters or [None]:
+        for doc_index, score in index.search(query, k, where):
+            if doc_index in seen:
+                continue
+            seen.add(doc_index)
+            docs.append(
+                Document(
+                    id=index.ids[doc_index],
+                    page_content=index.texts[doc_index],
+                    metadata={**index.metadatas[doc_index], "bm25_score": score},
+                )
+            )
+        if len(docs) >= k:
+            break
+    return docs[:k]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[List[Document]], k: int = RRF_K
+) -> List[Document]:
+    """여러 검색 결과 순위를 RRF 점수(sum 1 / (k + 순위))로 합침"""
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def _content_hash(text: str) -> str:
+    """공백을 정규화한 본문 해시 (ID가 다른 같은 내용의 문서 판별용)"""
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def document_tokens(docs: List[Document]) -> List[int]:
+    """문서별 토큰 수 (인덱싱할 때 저장한 token_count가 있으면 재사용)"""
+    missing = [i for i, doc in enumerate(docs) if "token_count" not in doc.metadata]
+    counted = dict(zip(missing, count_tokens([docs[i].page_content for i in missing])))
+    return [
+        counted[i] if i in counted else int(doc.metadata["token_count"])
+        for i, doc in enumerate(docs)
+    ]
+
+
+def pack_context(
+    rankings: Sequence[List[Document]],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    rrf_k: int = RRF_K,
+) -> Tuple[List[Document], Dict[str, int]]:
+    """검색 결과 순위들을 합쳐 토큰 예산 안에서 프롬프트에 넣을 문서 선택
+
+    같은 청크가 여러 키워드에서 검색되면 RRF 점수가 더해져 앞으로 오고, 한 번만
+    들어간다. ID가 달라도 본문이 같으면 중복으로 본다. 점수 순으로 예산을 채우며
+    예산을 넘는 문서는 건너뛰고 더 작은 다음 문서를 시도한다.
+    반환값은 (선택된 문서, 통계: 검색/중복 제거/선택 문서 수와 토큰 수, 절약한 토큰 수)
+    """
+    retrieved = [doc for ranking in rankings for doc in ranking]
+    unique, hashes = [], set()
+    for doc in reciprocal_rank_fusion(rankings, rrf_k):
+        content_hash = _content_hash(doc.page_content)
+        if content_hash not in hashes:
+            hashes.add(content_hash)
+            unique.append(doc)
+
+    tokens = document_tokens(unique)
+    tokens_by_hash = {
+        _content_hash(doc.page_content): count for doc, count in zip(unique, tokens)
+    }
+    packed, packed_tokens = [], 0
+    for doc, count in zip(unique, tokens):
+        if packed_tokens + count > token_budget:
+            continue
+        packed.append(doc)
+        packed_tokens += count
+
+    retrieved_tokens = sum(
+        tokens_by_hash[_content_hash(doc.page_content)] for doc in retrieved
+    )
+    stats = {
+        "retrieved_docs": len(retrieved),
+        "unique_docs": len(unique),
+        "packed_docs": len(packed),
+        "retrieved_tokens": retrieved_tokens,
+        "unique_tokens": sum(tokens),
+        "packed_tokens": packed_tokens,
+        "saved_tokens": retrieved_tokens - packed_tokens,
+    }
+    return packed, stats
+
+
+def format_context(docs: List[Document]) -> str:
+    """선택된 문서를 번호와 출처를 붙인 프롬프트용 텍스트로 변환"""
+    parts = []
+    for number, doc in enumerate(docs, start=1):
+        # 여러 매뉴얼이 공유하는 청크는 공유하는 모든 모델명 표시
+        source = (
+            doc.metadata.get("model_names")
+            or doc.metadata.get("model_name")
+            or doc.metadata.get("source", "")
+        )
+        header = f"[{number}] {source}".rstrip()
+        parts.append(f"{header}\n{doc.page_content}")
+    return "\n\n".join(parts)
+
+
+class HybridRetriever(ModelFilteredRetriever):
+    """벡터 검색과 BM25 검색 결과를 RRF로 합치는 retriever
+
+    에러코드나 모델코드처럼 영문/숫자로만 된 질의는 BM25 결과가 있으면
+    임베딩 API를 호출하지 않고 BM25 결과만 사용한다.
+    """
+
+    lexical_index: Any = None
+    rrf_k: int = RRF_K
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, **kwargs
+    ) -> List[Document]:
+        if self.lexical_index is None:
+            return super()._get_relevant_documents(
+                query, run_manager=run_manager, **kwargs
+            )
+        search_kwargs = {**self.search_kwargs, **kwargs}
+        k = search_kwargs.get("k", 4)
+        lexical_docs = lexical_search(
+            self.lexical_index, query, k, self.fallback_filters
+        )
+        if lexical_docs and is_exact_term(query):
+            return lexical_docs
+
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        vector_docs = search_by_vector(
+            self.vectorstore,
+            embedding,
+            self.search_type,
+            search_kwargs,
+            self.fallback_filters,
+        )
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], self.rrf_k)[:k]
+
+
+async def _web_search(query: str, tavily_tool) -> List[Document]:
+    search_result = await run_blocking(
+        tavily_tool.invoke, {"query": query}, source="web"
+    )
+    return web_results_to_documents(search_result)
+
+
+async def _vector_search(
+    keywords: List[str], retriever, timings: Dict[str, float]
+) -> List[List[Document]]:
+    """키워드별 검색 결과 순위 목록 (키워드 순서)"""
+    if not keywords:
+        return []
+    vectordb = retriever.vectorstore
+    fallback_filters = getattr(retriever, "fallback_filters", None)
+    lexical_index = getattr(retriever, "lexical_index", None)
+
+    # BM25 검색은 임베딩 없이 바로 끝나므로 먼저 실행
+    lexical_results = {}
+    if lexical_index is not None:
+        start = time.perf_counter()
+        k = retriever.search_kwargs.get("k", 4)
+        for keyword in keywords:
+            lexical_results[keyword] = lexical_search(
+                lexical_index, keyword, k, fallback_filters
+            )
+        timings["lexical"] = time.perf_counter() - start
+
+    # 영문/숫자 코드 키워드는 BM25 결과가 있으면 임베딩 생략
+    embed_keywords = [
+        keyword
+        for keyword in keywords
+        if not (lexical_results.get(keyword) and is_exact_term(keyword))
+    ]
+
+    # 나머지 키워드를 한 번의 임베딩 호출로 처리
+    vectors = []
+    if embed_keywords:
+        start = time.perf_counter()
+        vectors = await run_blocking(
+            vectordb.embeddings.embed_documents, embed_keywords
+        )
+        timings["embed"] = time.perf_counter() - start
+
+    async def search(keyword, vector):
+        search_start = time.perf_counter()
+        try:
+            return await run_blocking(
+                search_by_vector,
+                vectordb,
+                vector,
+                retriever.search_type,
+                retriever.search_kwargs,
+                fallback_filters,
+            )
+        except Exception as e:
+            print(f"벡터 검색 오류: {e}")
+            return []
+        finally:
+            timings[f"vector:{keyword}"] = time.perf_counter() - search_start
+
+    async def search_mmr():
+        # 키워드별 MMR 대신 합친 후보 풀에서 한 번에 선택
+        search_start = time.perf_counter()
+        try:
+            return await run_blocking(
+                mmr_search_many,
+                vectordb,
+                vectors,
+                retriever.search_kwargs,
+                fallback_filters,
+            )
+        except Exception as e:
+            print(f"벡터 검색 오류: {e}")
+            return [[] for _ in embed_keywords]
+        finally:
+            timings["vector:mmr"] = time.perf_counter() - search_start
+
+    if retriever.search_type == "mmr" and embed_keywords:
+        vector_results = await search_mmr()
+    else:
+        vector_results = await asyncio.gather(
+            *(
+                search(keyword, vector)
+                for keyword, vector in zip(embed_keywords, vectors)
+            )
+        )
+    vector_results = dict(zip(embed_keywords, vector_results))
+
+    if lexical_index is None:
+        return [vector_results[keyword] for keyword in keywords]
+
+    # 키워드별로 벡터/BM25 순위를 RRF로 합침
+    rrf_k = getattr(retriever, "rrf_k", RRF_K)
+    rankings = []
+    for keyword in keywords:
+        fused = reciprocal_rank_fusion(
+            [vector_results.get(keyword, []), lexical_results[keyword]], rrf_k
+        )
+        rankings.append(fused[:k])
+    return rankings
+
+
+async def _with_deadline(
+    name: str, coro, timeout: float, timings: Dict[str, float]
+) -> List[Document]:
+    """마감 시간 안에 끝나지 않거나 실패한 소스는 빈 결과로 처리"""
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError:
+        print(f"{name} 검색 시간 초과 ({timeout}초)")
+        return []
+    except Exception as e:
+        print(f"{name} 검색 오류: {e}")
+        return []
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+async def fan_out_retrieve(
+    query: str,
+    keywords: List[str],
+    retriever,
+    tavily_tool,
+    web_timeout: float = WEB_SEARCH_TIMEOUT,
+    vector_timeout: float = VECTOR_SEARCH_TIMEOUT,
+) -> Tuple[List[List[Document]], Dict[str, float]]:
+    """웹 검색과 키워드별 벡터 검색을 동시에 실행
+
+    반환값은 (검색 결과 순위 목록 [웹 결과, 키워드 순서대로의 벡터 결과...],
+    소스별 소요 시간(초)). 중복 제거와 토큰 예산 적용은 pack_context에서 한다.
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    web_docs, vector_rankings = await asyncio.gather(
+        _with_deadline("web", _web_search(query, tavily_tool), web_timeout, timings),
+        _with_deadline(
+            "vector",
+            _vector_search(keywords, retriever, timings),
+            vector_timeout,
+            timings,
+        ),
+    )
+
+    timings["total"] = time.perf_counter() - start
+    return [web_docs] + vector_rankings, timings
+
+
+async def speculative_retrieve(
+    query: str,
+    analyze_fn: Callable[[str], Tuple[str, List[str]]],
+    retriever,
+    tavily_tool,
+    web_timeout: float = WEB_SEARCH_TIMEOUT,
+    vector_timeout: float = VECTOR_SEARCH_TIMEOUT,
+) -> Tuple[List[List[Document]], str, Dict[str, float]]:
+    """질문 분석 LLM 호출과 원문 질문 검색을 겹쳐서 실행
+
+    analyze_fn(query)는 (분석 결과 문자열, 키워드 목록)을 반환한다.
+    원문 질문으로 웹/벡터 검색을 바로 시작하고, 분석이 끝나면 키워드 검색 결과
+    순위를 뒤에 붙인다 (중복 문서는 pack_context에서 합침).
+    반환값은 (검색 결과 순위 목록, 분석 결과, 소스별 소요 시간(초))
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    async def analyze():
+        analysis_start = time.perf_counter()
+        try:
+            return await run_blocking(analyze_fn, query, source="analysis")
+        finally:
+            timings["analysis"] = time.perf_counter() - analysis_start
+
+    analysis_task = asyncio.ensure_future(analyze())
+
+    # 분석을 기다리지 않고 원문 질문으로 먼저 검색
+    raw_rankings, raw_timings = await fan_out_retrieve(
+        query, [query], retriever, tavily_tool, web_timeout, vector_timeout
+    )
+    timings.update({f"raw_{name}": value for name, value in raw_timings.items()})
+
+    analysis_result, keywords = await analysis_task
+    keywords = [keyword for keyword in keywords if keyword != query]
+
+    keyword_rankings = await _with_deadline(
+        "keywords",
+        _vector_search(keywords, retriever, timings),
+        vector_timeout,
+        timings,
+    )
+
+    timings["total"] = time.perf_counter() - start
+    return raw_rankings + keyword_rankings, analysis_result, timings
+
+
+def retrieve(query: str, keywords: List[str], retriever, tavily_tool, **kwargs):
+    """fan_out_retrieve의 동기 버전"""
+    return asyncio.run(
+        fan_out_retrieve(query, keywords, retriever, tavily_tool, **kwargs)
+    )
+
+
+def retrieve_speculative(query: str, analyze_fn, retriever, tavily_tool, **kwargs):
+    """speculative_retrieve의 동기 버전"""
+    return asyncio.run(
+        speculative_retrieve(query, analyze_fn, retriever, tavily_tool, **kwargs)
+    )
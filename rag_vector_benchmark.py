@@ -0,0 +1,224 @@
+import argparse
+import os
+import time
+import numpy as np
+from langchain_chroma import Chroma
+from utils.quantization import QUANTIZERS
+from utils.vector_store import (
+    NORMS_FILE,
+    RECORDS_FILE,
+    VECTORS_FILE,
+    MemmapVectorStore,
+    QuantizedVectorStore,
+    SUPPORTED_DTYPES,
+)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def time_queries(search, queries):
+    """질의마다 search(vector)를 실행하고 (소요 시간 목록, 결과 ID 목록) 반환"""
+    timings, results = [], []
+    for vector in queries:
+        start = time.perf_counter()
+        docs = search(vector)
+        timings.append(time.perf_counter() - start)
+        results.append([doc.id for doc in docs])
+    return timings, results
+
+
+def file_bytes(directory, names):
+    """directory 안 파일들의 크기 합 (없는 파일은 0)"""
+    paths = [os.path.join(directory, name) for name in names]
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def tree_bytes(directory, skip=lambda name: False):
+    """directory 아래 모든 파일의 크기 합 (skip(이름)이 참인 최상위 항목 제외)"""
+    total = 0
+    for name in os.listdir(directory):
+        if skip(name):
+            continue
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            total += tree_bytes(path)
+        else:
+            total += os.path.getsize(path)
+    return total
+
+
+def overlap(results, reference):
+    """두 검색 결과의 평균 겹침 비율 (reference 기준)"""
+    ratios = [
+        len(set(found) & set(expected)) / len(expected)
+        for found, expected in zip(results, reference)
+        if expected
+    ]
+    return float(np.mean(ratios)) if ratios else 0.0
+
+
+def main():
+    """Chroma와 memmap 백엔드의 검색 지연시간 비교 (임베딩 API 호출 없음)"""
+    parser = argparse.ArgumentParser(description="벡터 검색 백엔드 벤치마크")
+    parser.add_argument("--persist-dir", default="./chroma")
+    parser.add_argument("--collection", default="manuals")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    parser.add_argument(
+        "--filter-key",
+        default="",
+        help="필터 검색도 측정할 boolean 메타데이터 키 (예: model:WA30DG2120EE)",
+    )
+    parser.add_argument(
+        "--noise", type=float, default=0.01, help="질의 벡터에 더할 잡음 크기"
+    )
+    parser.add_argument(
+        "--quantization",
+        nargs="*",
+        choices=sorted(QUANTIZERS),
+        default=[],
+        help="recall@k를 측정할 양자화 방식 (예: --quantization int8 pq)",
+    )
+    parser.add_argument(
+        "--rerank",
+        type=int,
+        nargs="+",
+        default=[1, 4],
+        help="양자화 검색에서 k * rerank개 후보를 원본 벡터로 재정렬",
+    )
+    args = parser.parse_args()
+
+    vectordb = Chroma(
+        collection_name=args.collection, persist_directory=args.persist_dir
+    )
+    snapshot_dir = os.path.join(
+        args.persist_dir, f"{args.collection}_vectors_benchmark_{args.dtype}"
+    )
+    start = time.perf_counter()
+    meta = MemmapVectorStore.build(
+        vectordb._collection, snapshot_dir, args.dtype, quantize=args.quantization
+    )
+    print(f"스냅샷 생성: {meta} ({time.perf_counter() - start:.2f}초)")
+    store = MemmapVectorStore(snapshot_dir)
+
+    # 저장된 벡터에 잡음을 더해 질의로 사용 (실제 질의 임베딩과 비슷한 분포)
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(store), size=min(args.queries, len(store)), replace=False)
+    base = np.asarray(store.vectors[rows], dtype=np.float32)
+    queries = base + rng.normal(scale=args.noise, size=base.shape).astype(np.float32)
+    queries = [vector.tolist() for vector in queries]
+
+    cases = {
+        "chroma similarity": lambda v: vectordb.similarity_search_by_vector(
+            v, k=args.k
+        ),
+        "memmap similarity": lambda v: store.similarity_search_by_vector(v, k=args.k),
+        "chroma mmr": lambda v: vectordb.max_marginal_relevance_search_by_vector(
+            v, k=args.k, fetch_k=args.fetch_k
+        ),
+        "memmap mmr": lambda v: store.max_marginal_relevance_search_by_vector(
+            v, k=args.k, fetch_k=args.fetch_k
+        ),
+    }
+
+    if args.filter_key:
+        where = {args.filter_key: True}
+        cases["chroma filtered"] = lambda v: vectordb.similarity_search_by_vector(
+            v, k=args.k, filter=where
+        )
+        cases["memmap filtered"] = lambda v: store.similarity_search_by_vector(
+            v, k=args.k, filter=where
+        )
+
+    results = {}
+    print(f"\n{len(store)}개 벡터, {len(queries)}개 질의, k={args.k}")
+    print(f"{'backend':<20}{'p50(ms)':>10}{'p99(ms)':>10}")
+    for name, search in cases.items():
+        # 첫 질의는 캐시/페이지 로딩 영향이 있으므로 한 번 실행 후 측정
+        search(queries[0])
+        timings, results[name] = time_queries(search, queries)
+        print(
+            f"{name:<20}{percentile_ms(timings, 50):>10.2f}"
+            f"{percentile_ms(timings, 99):>10.2f}"
+        )
+
+    # memmap은 전체 탐색(정확한 결과), Chroma는 HNSW 근사 검색
+    print("\n상위 k개 겹침 (memmap vs chroma)")
+    for name in cases:
+        if name.startswith("memmap"):
+            reference = results[name.replace("memmap", "chroma")]
+            print(f"{name.split()[1]:<20}{overlap(reference, results[name]):>10.3f}")
+
+    if args.quantization:
+        report_quantization(args, snapshot_dir, queries, results)
+    report_storage(args, store)
+
+
+def report_quantization(args, snapshot_dir, queries, results):
+    """양자화 검색의 recall@k (memmap 전체 탐색 기준)와 지연시간"""
+    print(f"\n양자화 recall@{args.k} (memmap 전체 탐색 기준)")
+    print(f"{'backend':<20}{'recall':>10}{'p50(ms)':>10}{'p99(ms)':>10}")
+    print(f"{'memmap':<20}{1.0:>10.3f}")
+
+    references = {"similarity": results["memmap similarity"]}
+    if args.filter_key:
+        references["filtered"] = results["memmap filtered"]
+    for method in args.quantization:
+        for rerank in args.rerank:
+            quantized = QuantizedVectorStore(snapshot_dir, method, rerank=rerank)
+            for case, reference in references.items():
+                where = {args.filter_key: True} if case == "filtered" else None
+                search = lambda v: quantized.similarity_search_by_vector(
+                    v, k=args.k, filter=where
+                )
+                search(queries[0])
+                timings, found = time_queries(search, queries)
+                name = f"{method} x{rerank} {case}"
+                print(
+                    f"{name:<20}{overlap(found, reference):>10.3f}"
+                    f"{percentile_ms(timings, 50):>10.2f}"
+                    f"{percentile_ms(timings, 99):>10.2f}"
+                )
+
+
+def report_storage(args, store):
+    """백엔드별 실제 디스크 사용량과 프로세스 메모리에 올리는 크기
+
+    Chroma는 HNSW 인덱스 파일(sqlite 외 파일)을 통째로 메모리에 올린다.
+    memmap은 노름만 올리고 벡터는 페이지 캐시로 필요한 만큼 읽는다.
+    양자화 백엔드는 재정렬용 원본 벡터 스냅샷을 그대로 두고 코드/양자화기를
+    더 저장하므로 디스크는 늘고, 메모리에는 코드와 노름만 올린다.
+    """
+    # 벤치마크/검색용 스냅샷 디렉토리는 Chroma 사용량에서 제외
+    is_snapshot = lambda name: name.startswith(f"{args.collection}_vectors")
+    chroma_disk = tree_bytes(args.persist_dir, is_snapshot)
+    sqlite_bytes = file_bytes(args.persist_dir, ["chroma.sqlite3"])
+    snapshot_bytes = file_bytes(
+        store.data_directory, [VECTORS_FILE, NORMS_FILE, RECORDS_FILE]
+    )
+    rows = [
+        ("chroma", chroma_disk, chroma_disk - sqlite_bytes),
+        ("memmap", snapshot_bytes, store.norms.nbytes),
+    ]
+    for method in args.quantization:
+        quantizer_file = f"{method}_quantizer.npz"
+        extra = file_bytes(
+            store.data_directory, [f"{method}_codes.npy", quantizer_file]
+        )
+        quantizer_bytes = file_bytes(store.data_directory, [quantizer_file])
+        quantized = QuantizedVectorStore(store.directory, method)
+        memory = quantized.codes.nbytes + quantized.norms.nbytes + quantizer_bytes
+        rows.append((method, snapshot_bytes + extra, memory))
+
+    print("\n저장 공간 (양자화는 원본 벡터 스냅샷 포함)")
+    print(f"{'backend':<20}{'disk(MB)':>12}{'memory(MB)':>12}")
+    for name, disk, memory in rows:
+        print(f"{name:<20}{disk / 2**20:>12.1f}{memory / 2**20:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+
+class InMemoryCollection:
+    """BM25Index.from_collection과 MemmapVectorStore.build에 필요한 Chroma collection 메서드만 구현"""
+
+    def __init__(self, vectors, metadatas=None, documents=None):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(self.vectors)
+        self.ids = [f"doc-{i}" for i in range(n)]
+        self.metadatas = metadatas or [{} for _ in range(n)]
+        self.documents = documents or [f"문서 {i}" for i in range(n)]
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, include=(), limit=None, offset=0):
+        rows = slice(offset, None if limit is None else offset + limit)
+        return {
+            "ids": self.ids[rows],
+            "embeddings": self.vectors[rows],
+            "documents": self.documents[rows],
+            "metadatas": self.metadatas[rows],
+        }
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    """벡터/메타데이터로 스냅샷을 만들고 MemmapVectorStore로 열기"""
+    from utils.vector_store import MemmapVectorStore
+
+    def make(vectors, metadatas=None, documents=None, **build_kwargs):
+        directory = str(tmp_path / "vectors")
+        collection = InMemoryCollection(vectors, metadatas, documents)
+        MemmapVectorStore.build(collection, directory, **build_kwargs)
+        return MemmapVectorStore(directory)
+
+    return make
@@ -0,0 +1,59 @@
+from tests.conftest import InMemoryCollection
+from utils.bm25 import BM25Index, is_exact_term, matches_filter, tokenize
+
+TEXTS = [
+    "dE 에러는 문이 열려 있을 때 표시됩니다.",
+    "배수 필터를 청소하세요. 배수 호스를 확인하세요.",
+    "WF24CB8650BW 세탁기 설치 방법",
+]
+METADATAS = [{"brand": "samsung"}, {"brand": "lg"}, {"brand": "samsung"}]
+
+
+def test_tokenize_uppercases_codes_and_splits_hangul_into_bigrams():
+    assert tokenize("dE 에러 배수필터, WF24CB8650BW 문") == [
+        "DE",
+        "에러",
+        "배수",
+        "수필",
+        "필터",
+        "WF24CB8650BW",
+        "문",
+    ]
+
+
+def test_is_exact_term_and_matches_filter():
+    assert is_exact_term("dE") and is_exact_term(" WF24CB8650BW ")
+    assert not is_exact_term("배수 필터")
+
+    metadata = {"brand": "samsung", "model:WF24CB8650BW": True}
+    assert matches_filter(metadata, None)
+    assert matches_filter(
+        metadata,
+        {
+            "$and": [
+                {"brand": "samsung"},
+                {"$or": [{"brand": "lg"}, {"model:WF24CB8650BW": True}]},
+            ]
+        },
+    )
+    assert not matches_filter(metadata, {"brand": "lg"})
+
+
+def test_search_ranks_matching_chunks_and_applies_filter():
+    index = BM25Index([f"doc-{i}" for i in range(3)], TEXTS, METADATAS)
+    assert [doc for doc, _ in index.search("DE 에러")] == [0]
+    assert [doc for doc, _ in index.search("배수 필터 설치")][0] == 1
+    assert index.search("배수", where={"brand": "samsung"}) == []
+    assert index.search("없는말") == []
+
+
+def test_save_load_and_from_collection_give_the_same_results(tmp_path):
+    collection = InMemoryCollection([[0.0]] * len(TEXTS), METADATAS, TEXTS)
+    index = BM25Index.from_collection(collection, batch_size=2)
+    assert index.ids == ["doc-0", "doc-1", "doc-2"]
+
+    path = str(tmp_path / "index" / "bm25.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    for query in ("배수 필터", "WF24CB8650BW 설치", "de"):
+        assert loaded.search(query) == index.search(query)
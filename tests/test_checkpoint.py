@@ -0,0 +1,30 @@
+from utils.checkpoint import BatchJournal
+
+
+def test_resume_skips_recorded_chunks_with_the_same_text(tmp_path):
+    path = str(tmp_path / "index" / "journal.jsonl")
+    journal = BatchJournal(path)
+    journal.record(["a#0", "a#1"], ["h0", "h1"])
+    journal.record(["b#0"], ["h2"])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"ids": ["c#0"], "has')  # 기록 도중 끊긴 줄
+
+    resumed = BatchJournal(path, resume=True)
+    assert len(resumed) == 3
+    assert resumed.is_committed("a#1", "h1")
+    assert not resumed.is_committed("a#1", "changed")
+    assert not resumed.is_committed("c#0", "h3")
+
+
+def test_without_resume_starts_over(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    BatchJournal(path).record(["a#0"], ["h0"])
+
+    assert len(BatchJournal(path)) == 0
+    assert len(BatchJournal(path, resume=True)) == 0
+
+    journal = BatchJournal(path)
+    journal.record(["a#0"], ["h0"])
+    journal.clear()
+    assert len(journal) == 0
+    assert len(BatchJournal(path, resume=True)) == 0
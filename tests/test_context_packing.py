@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.documents import Document
+import rag_retrieval
+from rag_retrieval import format_context, pack_context, reciprocal_rank_fusion
+
+
+@pytest.fixture(autouse=True)
+def fake_token_counts(monkeypatch):
+    # tiktoken encoding 다운로드 없이 글자 수로 토큰 수 대신 사용
+    monkeypatch.setattr(
+        rag_retrieval, "count_tokens", lambda texts: [len(t) for t in texts]
+    )
+
+
+def doc(doc_id, text, **metadata):
+    return Document(id=doc_id, page_content=text, metadata=metadata)
+
+
+def test_reciprocal_rank_fusion_boosts_documents_found_by_several_rankings():
+    a, b, c = doc("a", "a"), doc("b", "b"), doc("c", "c")
+    fused = reciprocal_rank_fusion([[a, b], [c, b]])
+    assert [d.id for d in fused] == ["b", "a", "c"]
+
+
+def test_pack_context_dedups_and_reports_saved_tokens():
+    shared = doc("shared", "공유 청크", token_count=10, model_names="A,B")
+    only_a = doc("a", "A 전용", token_count=10, model_name="A")
+    web = doc(None, "웹   결과", source="http://example.com")
+    web_copy = doc("web-2", "웹 결과")
+
+    docs, stats = pack_context(
+        [[web, web_copy], [only_a, shared], [shared], [shared]], token_budget=100
+    )
+    assert docs[0].id == "shared"
+    assert [d.id for d in docs].count("shared") == 1
+    assert len(docs) == 3
+    assert stats["retrieved_docs"] == 6
+    assert stats["unique_docs"] == 3
+    assert stats["retrieved_tokens"] == 10 * 4 + len("웹   결과") * 2
+    assert stats["saved_tokens"] == stats["retrieved_tokens"] - stats["packed_tokens"]
+
+
+def test_pack_context_fills_budget_with_smaller_documents():
+    big = doc("big", "x", token_count=80)
+    small = doc("small", "y", token_count=15)
+    first = doc("first", "z", token_count=10)
+    docs, stats = pack_context([[first, big, small]], token_budget=30)
+    assert [d.id for d in docs] == ["first", "small"]
+    assert stats["packed_tokens"] == 25
+
+
+def test_format_context_cites_all_owners_of_shared_chunks():
+    text = format_context(
+        [
+            doc("a", "본문", model_names="A,B", model_name="A"),
+            doc(None, "웹", source="http://example.com"),
+        ]
+    )
+    assert text == "[1] A,B\n본문\n\n[2] http://example.com\n웹"
@@ -0,0 +1,94 @@
+from rag_manuals_input import update_shared_metadata
+from utils.dedup import ChunkDeduplicator, MinHasher
+
+TEXT = (
+    "세탁기를 처음 사용할 때는 수도꼭지를 열고 배수 호스가 꺾이지 않았는지 확인하세요. "
+    * 3
+)
+
+
+class FakeCollection:
+    def __init__(self, records):
+        self.records = records
+
+    def get(self, ids, include):
+        return {"ids": ids, "metadatas": [dict(self.records[i]) for i in ids]}
+
+    def update(self, ids, metadatas):
+        self.records.update(zip(ids, metadatas))
+
+
+class FakeVectorDB:
+    def __init__(self, records):
+        self._collection = FakeCollection(records)
+
+
+def test_minhash_signature_is_deterministic_and_similar_for_near_duplicates():
+    hasher = MinHasher()
+    a = hasher.signature(TEXT)
+    assert (a == hasher.signature(TEXT)).all()
+    assert (a == hasher.signature(TEXT + "!")).mean() > 0.8
+
+
+def test_assign_shares_canonical_vector_and_release(tmp_path):
+    dedup = ChunkDeduplicator(str(tmp_path / "dedup.json"))
+    vector_id, is_new = dedup.assign("A_WA30DG2120EE:1", TEXT)
+    shared_id, shared_new = dedup.assign("B_F21VDSK:1", TEXT)
+    assert is_new and not shared_new and shared_id == vector_id
+    assert dedup.model_names(vector_id) == ["A_WA30DG2120EE", "B_F21VDSK"]
+
+    assert dedup.release("A_WA30DG2120EE:1") == (vector_id, ["B_F21VDSK:1"])
+    assert dedup.release("B_F21VDSK:1") == (vector_id, [])
+    assert vector_id not in dedup.members
+
+
+def test_save_keeps_only_committed_vectors(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    dedup = ChunkDeduplicator(path)
+    committed, _ = dedup.assign("A:1", TEXT)
+    dedup.assign("A:2", "저장되지 않은 다른 청크 내용입니다. " * 5)
+    dedup.mark_committed([committed])
+    dedup.save()
+
+    loaded = ChunkDeduplicator(path)
+    assert list(loaded.members) == [committed]
+    assert loaded.owner == {"A:1": committed}
+
+
+def test_update_shared_metadata_follows_remaining_owner(tmp_path):
+    dedup = ChunkDeduplicator(str(tmp_path / "dedup.json"))
+    vector_id, _ = dedup.assign("삼성_WA30DG2120EE:1", TEXT)
+    dedup.mark_committed([vector_id])
+    dedup.assign("트롬_F21VDSK:1", TEXT)
+    vectordb = FakeVectorDB(
+        {
+            vector_id: {
+                "model_name": "삼성_WA30DG2120EE",
+                "model_code": "WA30DG2120EE",
+                "brand": "samsung",
+                "model:WA30DG2120EE": True,
+            }
+        }
+    )
+    models = {
+        "삼성_WA30DG2120EE": ("삼성_WA30DG2120EE", "WA30DG2120EE", "samsung"),
+        "트롬_F21VDSK": ("트롬_F21VDSK", "F21VDSK", "lg"),
+    }
+
+    update_shared_metadata(vectordb, dedup, models)
+    metadata = vectordb._collection.records[vector_id]
+    assert metadata["model_names"] == "삼성_WA30DG2120EE,트롬_F21VDSK"
+    assert metadata["model_name"] == "삼성_WA30DG2120EE"
+    assert metadata["model:F21VDSK"] is True
+    assert metadata["brand:samsung"] is True and metadata["brand:lg"] is True
+
+    # 대표 모델의 PDF가 삭제되면 남은 모델 기준으로 다시 채움
+    dedup.release("삼성_WA30DG2120EE:1")
+    update_shared_metadata(vectordb, dedup, models)
+    metadata = vectordb._collection.records[vector_id]
+    assert metadata["model_names"] == "트롬_F21VDSK"
+    assert metadata["model_name"] == "트롬_F21VDSK"
+    assert metadata["model_code"] == "F21VDSK"
+    assert metadata["brand"] == "lg"
+    assert metadata["model:WA30DG2120EE"] is None
+    assert metadata["brand:samsung"] is None and metadata["brand:lg"] is True
@@ -0,0 +1,82 @@
+import itertools
+
+from langchain_core.embeddings import Embeddings
+
+from utils import embedding_cache
+from utils.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """텍스트 길이로 2차원 벡터를 만들고 호출 내역을 기록"""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_only_missing_unique_texts_are_embedded(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, "model-a", str(tmp_path / "cache.sqlite"))
+
+    assert cache.embed_documents(["가", "나다", "가"]) == [
+        [1.0, 1.0],
+        [2.0, 1.0],
+        [1.0, 1.0],
+    ]
+    assert cache.embed_query("나다") == [2.0, 1.0]
+    assert cache.embed_documents(["가", "라마바"])[1] == [3.0, 1.0]
+
+    assert inner.calls == [["가", "나다"], ["라마바"]]
+    assert cache.stats() == {"entries": 3, "hits": 3, "misses": 3, "api_calls": 2}
+
+
+def test_cache_persists_per_model(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), "model-a", db_path).embed_documents(["가"])
+
+    inner = CountingEmbeddings()
+    CachedEmbeddings(inner, "model-a", db_path).embed_documents(["가"])
+    assert inner.calls == []
+    CachedEmbeddings(inner, "model-b", db_path).embed_documents(["가"])
+    assert inner.calls == [["가"]]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    # 사용 시각이 같아지지 않도록 호출마다 1초씩 증가
+    clock = itertools.count()
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(clock)))
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(
+        inner, "model-a", str(tmp_path / "cache.sqlite"), max_entries=2
+    )
+    cache.embed_documents(["a"])
+    cache.embed_documents(["bb"])
+    cache.embed_documents(["a"])  # a를 최근 사용으로 갱신
+    cache.embed_documents(["ccc"])  # 가장 오래 안 쓴 bb 삭제
+
+    assert cache.stats()["entries"] == 2
+    inner.calls.clear()
+    cache.embed_documents(["a", "bb", "ccc"])
+    assert inner.calls == [["bb"]]
+
+
+def test_store_does_not_count_the_table(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), "model-a", db_path).embed_documents(["가"])
+    cache = CachedEmbeddings(CountingEmbeddings(), "model-a", db_path, max_entries=2)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    cache.embed_documents(["가", "나다"])
+    cache.embed_documents(["라마바"])
+
+    assert not any("COUNT(*)" in statement for statement in statements)
+    # 열 때 센 1개 + 새로 저장한 2개 - 크기 제한으로 삭제한 1개
+    assert cache.stats()["entries"] == 2
+    assert cache._count == 2
@@ -0,0 +1,92 @@
+import pytest
+from utils import embedding_writer
+from utils.embedding_writer import EmbeddingWriter, RateLimiter, request_chunk_size
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(embedding_writer.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(embedding_writer.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_rate_limiter_counts_requests_per_call(clock):
+    limiter = RateLimiter(tokens_per_minute=1_000_000, requests_per_minute=3)
+    limiter.acquire(10, requests=2)
+    limiter.acquire(10, requests=1)
+    assert clock.now == 0
+    # 창이 지나야 다음 요청 가능
+    limiter.acquire(10, requests=1)
+    assert clock.now >= 60
+
+
+def test_rate_limiter_token_budget(clock):
+    limiter = RateLimiter(tokens_per_minute=100, requests_per_minute=100)
+    limiter.acquire(60)
+    limiter.acquire(40)
+    assert clock.now == 0
+    limiter.acquire(1)
+    assert clock.now >= 60
+
+
+class FakeOpenAIEmbeddings:
+    chunk_size = 2
+
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+class FakeCachedEmbeddings:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.upserts.append(ids)
+
+
+class FakeVectorDB:
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self._collection = FakeCollection()
+
+
+def test_request_chunk_size_looks_inside_cache_wrapper():
+    assert request_chunk_size(FakeCachedEmbeddings(FakeOpenAIEmbeddings())) == 2
+    assert request_chunk_size(object()) == embedding_writer.DEFAULT_CHUNK_SIZE
+
+
+def test_writer_counts_http_requests_and_keeps_order(clock):
+    vectordb = FakeVectorDB(FakeCachedEmbeddings(FakeOpenAIEmbeddings()))
+    writer = EmbeddingWriter(vectordb, concurrency=2)
+    acquired = []
+    writer.rate_limiter.acquire = lambda tokens, requests: acquired.append(requests)
+
+    batches = [
+        (["a", "b", "c"], [{}] * 3, ["1", "2", "3"], [], 3),
+        ([], [], [], [("x.pdf", [])], 0),
+        (["d"], [{}], ["4"], [], 1),
+    ]
+    written = list(writer.write(batches))
+    assert written == batches
+    assert vectordb._collection.upserts == [["1", "2", "3"], ["4"]]
+    assert acquired == [2, 1]
@@ -0,0 +1,128 @@
+import time
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+from rag_retrieval import _executors, retrieve, retrieve_speculative
+
+
+class SlowEmbeddings:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def embed_documents(self, texts):
+        time.sleep(self.delay)
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class KeywordVectorDB:
+    """임베딩 값(키워드 길이)을 문서 ID에 담아 돌려주는 벡터DB"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        return [Document(id=f"len-{embedding[0]:.0f}", page_content="본문")]
+
+
+class SlowWebSearch:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def invoke(self, params):
+        time.sleep(self.delay)
+        return {"results": [{"url": "https://example.com", "content": "웹 결과"}]}
+
+
+def make_retriever(embeddings):
+    return SimpleNamespace(
+        vectorstore=KeywordVectorDB(embeddings),
+        search_type="similarity",
+        search_kwargs={"k": 2},
+    )
+
+
+def test_keywords_are_embedded_in_one_call_and_keep_their_order():
+    embeddings = SlowEmbeddings()
+    rankings, timings = retrieve(
+        "질문", ["배수", "필터 청소"], make_retriever(embeddings), SlowWebSearch(0)
+    )
+    assert embeddings.calls == [["배수", "필터 청소"]]
+    assert [[doc.id for doc in ranking] for ranking in rankings[1:]] == [
+        ["len-2"],
+        ["len-5"],
+    ]
+    assert rankings[0][0].page_content == "웹 결과"
+    assert {"web", "vector", "embed", "total"} <= set(timings)
+
+
+def test_slow_source_is_dropped_at_its_deadline():
+    start = time.perf_counter()
+    rankings, timings = retrieve(
+        "질문",
+        ["배수"],
+        make_retriever(SlowEmbeddings()),
+        SlowWebSearch(2.0),
+        web_timeout=0.2,
+    )
+    assert time.perf_counter() - start < 1.5
+    assert rankings[0] == []
+    assert [doc.id for doc in rankings[1]] == ["len-2"]
+
+    rankings, _ = retrieve(
+        "질문",
+        ["배수"],
+        make_retriever(SlowEmbeddings(2.0)),
+        SlowWebSearch(0),
+        vector_timeout=0.2,
+    )
+    assert len(rankings) == 1 and rankings[0][0].page_content == "웹 결과"
+
+
+def test_speculative_retrieval_overlaps_analysis_with_raw_query_search():
+    embeddings = SlowEmbeddings(0.3)
+
+    def analyze(query):
+        time.sleep(0.3)
+        return "분석 결과", [query, "배수"]
+
+    start = time.perf_counter()
+    rankings, analysis, timings = retrieve_speculative(
+        "질문", analyze, make_retriever(embeddings), SlowWebSearch(0.3)
+    )
+    elapsed = time.perf_counter() - start
+
+    assert analysis == "분석 결과"
+    # 원문 질문 검색 결과 뒤에 (원문과 같은 키워드를 뺀) 키워드 검색 결과가 붙음
+    assert [[doc.id for doc in ranking] for ranking in rankings[1:]] == [
+        ["len-2"],
+        ["len-2"],
+    ]
+    assert embeddings.calls == [["질문"], ["배수"]]
+    # 분석(0.3초)과 원문 검색(0.3초)이 겹치므로 순서대로 실행한 0.9초보다 짧음
+    assert elapsed < 0.8
+    assert {"analysis", "raw_web", "raw_vector", "keywords"} <= set(timings)
+
+
+def test_timed_out_web_calls_do_not_starve_vector_search():
+    # 마감 시간을 넘긴 웹 호출이 웹 풀의 작업자를 모두 차지해도 벡터 검색은 제때 끝남
+    for _ in range(_executors["web"]._max_workers):
+        retrieve(
+            "질문",
+            [],
+            make_retriever(SlowEmbeddings()),
+            SlowWebSearch(1.0),
+            web_timeout=0.01,
+        )
+
+    rankings, _ = retrieve(
+        "질문",
+        ["배수"],
+        make_retriever(SlowEmbeddings()),
+        SlowWebSearch(0),
+        web_timeout=0.01,
+        vector_timeout=0.3,
+    )
+    assert rankings[0] == []
+    assert [doc.id for doc in rankings[1]] == ["len-2"]
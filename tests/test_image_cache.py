@@ -0,0 +1,57 @@
+from utils.image_cache import ImageLookupCache
+
+
+def _write(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_get_or_compute_many_computes_only_missing(tmp_path):
+    first = _write(tmp_path / "a.jpg", b"a")
+    second = _write(tmp_path / "b.jpg", b"b")
+    same_as_first = _write(tmp_path / "c.jpg", b"a")
+    calls = []
+
+    def compute_many(paths):
+        calls.append(paths)
+        return [f"model-{len(path)}" for path in paths]
+
+    cache = ImageLookupCache(persist_path=str(tmp_path / "cache.json"))
+    cache.get_or_compute_many([first], compute_many)
+    results = cache.get_or_compute_many([same_as_first, second], compute_many)
+
+    assert calls == [[first], [second]]
+    assert results == [f"model-{len(first)}", f"model-{len(second)}"]
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 2}
+
+
+def test_persisted_entries_survive_reload_and_respect_namespace(tmp_path):
+    image = _write(tmp_path / "a.jpg", b"a")
+    persist_path = str(tmp_path / "cache.json")
+    ImageLookupCache(persist_path=persist_path, namespace="v1").get_or_compute_many(
+        [image], lambda paths: ["cached"] * len(paths)
+    )
+
+    reloaded = ImageLookupCache(persist_path=persist_path, namespace="v1")
+    assert reloaded.get_or_compute_many([image], lambda paths: ["new"]) == ["cached"]
+    other = ImageLookupCache(persist_path=persist_path, namespace="v2")
+    assert other.get_or_compute_many([image], lambda paths: ["new"]) == ["new"]
+
+
+def test_lru_eviction(tmp_path):
+    paths = [_write(tmp_path / f"{i}.jpg", bytes([i])) for i in range(3)]
+    cache = ImageLookupCache(max_entries=2)
+    cache.get_or_compute_many(paths, lambda batch: list(batch))
+    assert cache.stats()["entries"] == 2
+    cache.get_or_compute_many(paths[:1], lambda batch: ["recomputed"])
+    assert cache.stats()["misses"] == 4
+
+
+def test_index_version_is_part_of_the_key(tmp_path):
+    image = _write(tmp_path / "a.jpg", b"a")
+    cache = ImageLookupCache(persist_path=str(tmp_path / "cache.json"))
+    cache.get_or_compute_many([image], lambda paths: ["old"], version="1")
+
+    assert cache.get_or_compute_many([image], lambda p: ["new"], version="1") == ["old"]
+    # 다시 인덱싱한 뒤에는 이전 후보 목록을 쓰지 않음
+    assert cache.get_or_compute_many([image], lambda p: ["new"], version="2") == ["new"]
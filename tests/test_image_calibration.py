@@ -0,0 +1,52 @@
+import numpy as np
+
+from utils.image_calibration import ImageMatchCalibration, model_key, vote_candidates
+
+
+def test_model_key_groups_slides_of_one_model():
+    assert model_key("그랑데_WF24CB8650BW_화이트_0001") == "WF24CB8650BW"
+    assert model_key("그랑데_WF24CB8650BW_블랙_0003") == "WF24CB8650BW"
+    assert model_key("이름만") == "이름만"
+
+
+def test_vote_candidates_sums_slides_of_the_same_model():
+    candidates = vote_candidates(
+        [
+            ("트롬_F21VDSK_화이트_0001", 0.10),
+            ("그랑데_WF24CB8650BW_화이트_0001", 0.09),
+            ("트롬_F21VDSK_블랙_0002", 0.12),
+        ],
+        temperature=0.1,
+    )
+    assert [c["model_code"] for c in candidates] == ["F21VDSK", "WF24CB8650BW"]
+    assert candidates[0]["votes"] == 2
+    assert candidates[0]["model_name"] == "트롬_F21VDSK_화이트_0001"
+    assert np.isclose(sum(c["score"] for c in candidates), 1.0)
+
+
+def test_default_calibration_is_half_at_threshold():
+    calibration = ImageMatchCalibration.default(0.3)
+    assert np.isclose(calibration.threshold, 0.3)
+    assert np.isclose(calibration.confidence(0.3), 0.5)
+    assert calibration.confidence(0.05) > 0.9 > 0.1 > calibration.confidence(0.6)
+
+
+def test_fit_separates_same_model_from_other_models(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(6, 16)) * 5
+    names, vectors = [], []
+    for model, center in enumerate(centers):
+        for slide in range(4):
+            names.append(f"모델_AB{model}0000_{slide:04d}")
+            vectors.append(center + rng.normal(scale=0.1, size=16))
+
+    calibration = ImageMatchCalibration.fit(np.array(vectors), names, extractor="test")
+    assert calibration is not None
+    assert calibration.slope < 0
+    assert calibration.accuracy == 1.0
+
+    path = str(tmp_path / "calibration.json")
+    calibration.save(path)
+    loaded = ImageMatchCalibration.load(path)
+    assert loaded.__dict__ == calibration.__dict__
+    assert ImageMatchCalibration.load(str(tmp_path / "missing.json")) is None
@@ -0,0 +1,48 @@
+import numpy as np
+from PIL import Image
+
+from utils.image_features import (
+    HandcraftedFeatureExtractor,
+    bits_to_int,
+    dhash_bits,
+    phash_bits,
+)
+
+
+def _save_image(path, color=(200, 30, 30), box=(16, 16, 48, 48)):
+    image = Image.new("RGB", (64, 64), (255, 255, 255))
+    image.paste(color, box)
+    image.save(path)
+    return str(path)
+
+
+def test_bits_to_int():
+    assert bits_to_int(np.array([True, False, True, True])) == 0b1011
+    assert bits_to_int(np.zeros(64, dtype=bool)) == 0
+
+
+def test_hashes_are_64_bits(tmp_path):
+    image = Image.open(_save_image(tmp_path / "a.png"))
+    assert phash_bits(image).shape == (64,)
+    assert dhash_bits(image).shape == (64,)
+
+
+def test_extract_matches_dimension_and_is_unit_length(tmp_path):
+    extractor = HandcraftedFeatureExtractor()
+    vector = np.array(extractor.extract(_save_image(tmp_path / "a.png")))
+    assert vector.shape == (extractor.dimension,)
+    assert extractor.dimension == 232
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+
+
+def test_same_image_is_closer_than_different_image(tmp_path):
+    extractor = HandcraftedFeatureExtractor()
+    first = np.array(extractor.extract(_save_image(tmp_path / "a.png")))
+    copy = np.array(extractor.extract(_save_image(tmp_path / "b.png")))
+    other = np.array(
+        extractor.extract(
+            _save_image(tmp_path / "c.png", color=(20, 20, 220), box=(0, 40, 64, 64))
+        )
+    )
+    assert np.allclose(first, copy)
+    assert np.linalg.norm(first - other) > np.linalg.norm(first - copy)
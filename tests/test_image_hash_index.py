@@ -0,0 +1,57 @@
+import random
+from utils.image_hash_index import BKTree, ImageHashIndex, hamming
+
+
+def test_bktree_search_matches_brute_force():
+    rng = random.Random(0)
+    keys = [rng.getrandbits(64) for _ in range(300)]
+    tree = BKTree()
+    for i, key in enumerate(keys):
+        tree.add(key, i)
+    assert len(tree) == len(keys)
+
+    query = keys[7] ^ 0b1011
+    expected = sorted(
+        (hamming(query, key), i)
+        for i, key in enumerate(keys)
+        if hamming(query, key) <= 20
+    )
+    assert sorted(tree.search(query, 20)) == expected
+
+
+def test_lookup_exact_and_near_duplicate(tmp_path):
+    index = ImageHashIndex(str(tmp_path / "hashes.json"))
+    index.add(0b1111, 0b0000, "그랑데_WF24CB8650BW_화이트_0001")
+    assert index.lookup_hashes(0b1111, 0b0000) == "그랑데_WF24CB8650BW_화이트_0001"
+    assert index.lookup_hashes(0b0111, 0b0001) == "그랑데_WF24CB8650BW_화이트_0001"
+    assert index.lookup_hashes(1 << 40 | 0xFFFF, 0) is None
+
+
+def test_same_model_other_slides_still_match(tmp_path):
+    index = ImageHashIndex(str(tmp_path / "hashes.json"))
+    index.add(5, 5, "그랑데_WF24CB8650BW_화이트_0001")
+    index.add(5, 5, "그랑데_WF24CB8650BW_블랙_0002")
+    assert index.lookup_hashes(5, 5) == "그랑데_WF24CB8650BW_화이트_0001"
+
+
+def test_collision_between_models_falls_through(tmp_path):
+    index = ImageHashIndex(str(tmp_path / "hashes.json"))
+    index.add(5, 5, "그랑데_WF24CB8650BW_0001")
+    index.add(5, 5, "트롬_F21VDSK_0001")
+    assert index.lookup_hashes(5, 5) is None
+
+    # 거의 같은 이미지 후보에 서로 다른 모델이 있어도 판단하지 않음
+    index = ImageHashIndex(str(tmp_path / "near.json"))
+    index.add(0b1000, 0, "그랑데_WF24CB8650BW_0001")
+    index.add(0b0100, 0, "트롬_F21VDSK_0001")
+    assert index.lookup_hashes(0, 0) is None
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "hashes.json")
+    index = ImageHashIndex(path)
+    index.add(1, 2, "트롬_F21VDSK_0001")
+    index.save()
+    loaded = ImageHashIndex(path)
+    assert len(loaded) == 1
+    assert loaded.lookup_hashes(1, 2) == "트롬_F21VDSK_0001"
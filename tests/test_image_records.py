@@ -0,0 +1,32 @@
+from PIL import Image
+
+from rag_indexer_class import _build_image_record_in_worker, build_image_record
+from utils.image_features import HandcraftedFeatureExtractor
+from utils.image_hash_index import image_hashes
+
+
+def test_build_image_record(tmp_path):
+    path = str(tmp_path / "그랑데_WF24CB8650BW_화이트_0001.png")
+    Image.new("RGB", (32, 32), (10, 120, 200)).save(path)
+    extractor = HandcraftedFeatureExtractor()
+
+    record = build_image_record(path, extractor)
+    assert record["id"] == path
+    assert record["hashes"] == image_hashes(path)
+    assert record["text"] == "그랑데_WF24CB8650BW_화이트_0001"
+    assert record["embedding"] == extractor.extract(path)
+    assert record["metadata"] == {
+        "model_name": "그랑데_WF24CB8650BW_화이트_0001",
+        "model_code": "WF24CB8650BW",
+        "feature_extractor": extractor.name,
+    }
+
+
+def test_worker_returns_errors_instead_of_raising(tmp_path):
+    path = str(tmp_path / "broken.png")
+    with open(path, "wb") as f:
+        f.write(b"not an image")
+
+    record, error = _build_image_record_in_worker(path, "handcrafted", "")
+    assert record is None
+    assert error.startswith(f"Failed to process image {path}")
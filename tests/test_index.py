@@ -0,0 +1,82 @@
+import glob
+import os
+import pytest
+from utils.index import (
+    brand_flag_key,
+    detect_brand,
+    extract_model_code,
+    image_to_base64,
+    model_flag_key,
+)
+
+MANUALS_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "manuals")
+
+# 매뉴얼 다운로더가 받은 삼성 매뉴얼 원본 파일명 (webscraping/YooYonghwan/pdf_downloader)
+SAMSUNG_ORIGINAL_FILENAMES = {
+    "OID63540_IB_WF8000CK-AD_BEST_SimpleUX_WF25CB8895_KO_250313": "WF8000CKAD",
+    "OID64570_IB_DV8000CK_SimpleUX_KO_250313": "DV8000CK",
+    "OID65051_IB_AI-ONE_WASHER-AD_BEST_BETTER_SimpleUX_KO_250313": "",
+    "OID69914_IB_WA6000C_BETTER_KO_250313": "WA6000C",
+    "OID71048_IB_WA5000C_GOOD_KO_250624": "WA5000C",
+    "OID76616_IB_T-PJT_WD8000D-AD_7LCD_KO_250616": "WD8000DAD",
+    "OID83345_IB_DV8000DK_SimpleUX_KO_241212": "DV8000DK",
+    "OID84043_IB_WA6000F_BestBetter_KO_250714": "WA6000F",
+    "OID85590_IB_T-PJT_WD90F-AD_7LCD_KO_250616": "WD90FAD",
+}
+
+# 다운로더가 제품명_모델코드 형식으로 저장한 파일명
+SAVED_FILENAMES = {
+    "AI_건조기_21kg_DV21DG8200BV": "DV21DG8200BV",
+    "AI_통버블_세탁기_19kg_WA80F19E8L": "WA80F19E8L",
+    "Bespoke_AI_원바디_2522kg_1778mm_LCD_WH90F2522AAHS": "WH90F2522AAHS",
+    "Bespoke_AI_세탁기건조기_슬림_1310kg_WW13BB844DGB1S": "WW13BB844DGB1S",
+    "BABY_WA30DG2120_250205": "WA30DG2120",
+    "아가사랑_3kg_WA30DG2120EE_그레이지_0001": "WA30DG2120EE",
+    "트롬_F21VDSK": "F21VDSK",
+}
+
+
+@pytest.mark.parametrize(
+    "name, expected", {**SAMSUNG_ORIGINAL_FILENAMES, **SAVED_FILENAMES}.items()
+)
+def test_extract_model_code(name, expected):
+    assert extract_model_code(name) == expected
+
+
+def test_extract_model_code_skips_document_ids():
+    for name in SAMSUNG_ORIGINAL_FILENAMES:
+        assert not extract_model_code(name).startswith("OID")
+
+
+@pytest.mark.skipif(not os.path.isdir(MANUALS_DIR), reason="data/manuals 없음")
+def test_manuals_directory_model_codes():
+    pdf_paths = glob.glob(os.path.join(MANUALS_DIR, "**", "*.pdf"), recursive=True)
+    for pdf_path in pdf_paths:
+        model_name = os.path.basename(pdf_path).replace(".pdf", "")
+        code = extract_model_code(model_name)
+        assert not code.startswith("OID"), pdf_path
+        if code:
+            # 모델코드는 파일명에 있는 토큰이어야 함
+            assert code in model_name.upper().replace("-", ""), pdf_path
+
+
+def test_detect_brand():
+    assert detect_brand("./data/manuals/lg/트롬_F21VDSK.pdf") == "lg"
+    assert detect_brand("./data/manuals/삼성/AI_건조기.pdf") == "samsung"
+    assert detect_brand("./data/manuals/기타/모델.pdf") == ""
+
+
+def test_model_flag_key():
+    assert model_flag_key("F21VDSK") == "model:F21VDSK"
+
+
+def test_brand_flag_key():
+    assert brand_flag_key("lg") == "brand:lg"
+
+
+@pytest.mark.parametrize("max_chars", [1, 3, 4, 5, 8, 799, 800, 5000])
+def test_image_to_base64_prefix_matches_full_encoding(tmp_path, max_chars):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(bytes(range(256)) * 4)
+    full = image_to_base64(str(path))
+    assert image_to_base64(str(path), max_chars) == full[:max_chars]
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from rag_indexer_class import IndexConfig, RAGIndexer
+from utils.image_calibration import ImageMatchCalibration
+from utils.image_hash_index import ImageHashIndex
+
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch):
+    """임베딩 API를 호출하지 않는 범위에서 쓰는 로컬 RAGIndexer"""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return RAGIndexer(
+        IndexConfig(
+            persistent_directory=str(tmp_path / "db"),
+            collection_name="images",
+            embedding_model="text-embedding-3-small",
+            embedding_cache_path="",
+        )
+    )
+
+
+def _touch_later(path, seconds):
+    mtime = os.path.getmtime(path) + seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_hash_index_reloads_when_file_changes(indexer):
+    assert len(indexer.hash_index) == 0
+    path = indexer.hash_index.path
+
+    # 다른 프로세스(rag_img_input.py)가 다시 인덱싱한 경우
+    rebuilt = ImageHashIndex(path)
+    rebuilt.add(0b1111, 0b0000, "그랑데_WF24CB8650BW_화이트_0001")
+    rebuilt.save()
+    loaded = indexer.hash_index
+    assert loaded.lookup_hashes(0b1111, 0) == "그랑데_WF24CB8650BW_화이트_0001"
+    assert indexer.hash_index is loaded
+
+    rebuilt.clear()
+    rebuilt.add(0b1111, 0b0000, "트롬_F21VDSK_블랙_0001")
+    rebuilt.save()
+    _touch_later(path, 10)
+    assert indexer.hash_index.lookup_hashes(0b1111, 0) == "트롬_F21VDSK_블랙_0001"
+
+
+def test_calibration_reloads_when_file_changes(indexer):
+    threshold = indexer.config.image_match_threshold
+    assert indexer.calibration.threshold == pytest.approx(threshold)
+
+    path = indexer._index_path("calibration.json")
+    calibration = ImageMatchCalibration.default(0.5)
+    calibration.extractor = indexer.image_features.name
+    calibration.save(path)
+    assert indexer.calibration.threshold == pytest.approx(0.5)
+
+    calibration = ImageMatchCalibration.default(0.2)
+    calibration.extractor = indexer.image_features.name
+    calibration.save(path)
+    _touch_later(path, 10)
+    assert indexer.calibration.threshold == pytest.approx(0.2)
+
+    # 다른 특징 추출기로 만든 보정값은 쓰지 않음
+    calibration.extractor = "other"
+    calibration.save(path)
+    _touch_later(path, 20)
+    assert indexer.calibration.threshold == pytest.approx(threshold)
+
+
+def test_index_version_changes_after_reindexing(indexer):
+    before = indexer.index_version()
+    rebuilt = ImageHashIndex(indexer.hash_index.path)
+    rebuilt.add(0b1111, 0b0000, "그랑데_WF24CB8650BW_화이트_0001")
+    rebuilt.save()
+    after = indexer.index_version()
+    assert after != before
+    assert indexer.index_version() == after
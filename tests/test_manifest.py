@@ -0,0 +1,49 @@
+import os
+
+from utils.manifest import IndexManifest
+
+
+def _write(path, content, mtime):
+    path.write_bytes(content)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_diff_reports_new_changed_and_removed_files(tmp_path):
+    keep = _write(tmp_path / "keep.pdf", b"keep", 1000)
+    touched = _write(tmp_path / "touched.pdf", b"touched", 1000)
+    edited = _write(tmp_path / "edited.pdf", b"edited", 1000)
+    gone = _write(tmp_path / "gone.pdf", b"gone", 1000)
+
+    manifest_path = str(tmp_path / "index" / "manifest.json")
+    manifest = IndexManifest(manifest_path)
+    changed, removed = manifest.diff([keep, touched, edited, gone])
+    assert [path for path, _ in changed] == [keep, touched, edited, gone]
+    assert removed == []
+    for path, fingerprint in changed:
+        manifest.record(path, fingerprint, [f"{path}#0"])
+    manifest.save()
+
+    os.utime(touched, (2000, 2000))  # 수정 시각만 변경
+    _write(tmp_path / "edited.pdf", b"edited!", 2000)
+    new = _write(tmp_path / "new.pdf", b"new", 1000)
+
+    manifest = IndexManifest(manifest_path)
+    assert manifest.chunk_ids(gone) == [f"{gone}#0"]
+    changed, removed = manifest.diff([keep, touched, edited, new])
+    assert [path for path, _ in changed] == [edited, new]
+    assert removed == [gone]
+    # 내용이 같은 파일은 다음 실행 때 해시를 다시 계산하지 않도록 시각만 갱신
+    assert manifest.entries[touched]["mtime"] == 2000
+
+    manifest.forget(gone)
+    assert manifest.chunk_ids(gone) == []
+
+
+def test_full_diff_reprocesses_everything(tmp_path):
+    path = _write(tmp_path / "a.pdf", b"a", 1000)
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    manifest.record(path, manifest.diff([path])[0][0][1], ["a#0"])
+
+    assert manifest.diff([path]) == ([], [])
+    assert [changed for changed, _ in manifest.diff([path], full=True)[0]] == [path]
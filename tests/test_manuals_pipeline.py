@@ -0,0 +1,86 @@
+import threading
+import time
+import rag_manuals_input
+from rag_manuals_input import iter_processed_pdfs, process_pdf_with_timeout
+
+
+def slow_process_pdf_text(pdf_path):
+    if "slow" in pdf_path:
+        time.sleep(30)
+    return [{"id": pdf_path, "text": "본문", "metadata": {}}]
+
+
+def test_timeout_is_enforced_with_one_worker_in_a_thread(monkeypatch):
+    # 프로세스 풀 worker(fork)에 바뀐 함수가 그대로 전달됨
+    monkeypatch.setattr(rag_manuals_input, "process_pdf_text", slow_process_pdf_text)
+    results = {}
+
+    def run():
+        for pdf_path, chunks in iter_processed_pdfs(
+            ["ok.pdf", "slow.pdf"], workers=1, timeout=0.5
+        ):
+            results[pdf_path] = chunks
+
+    # prefetch처럼 메인 스레드가 아닌 곳에서 실행
+    start = time.perf_counter()
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join(timeout=20)
+    assert not thread.is_alive()
+    assert time.perf_counter() - start < 20
+    assert results["ok.pdf"][0]["id"] == "ok.pdf"
+    assert results["slow.pdf"] is None
+
+
+def _chunk(chunk_id, text, **extra):
+    return {"id": chunk_id, "text": text, "metadata": {}, **extra}
+
+
+def test_iter_token_batches_respects_budget_and_reports_completed_files(monkeypatch):
+    monkeypatch.setattr(
+        rag_manuals_input, "count_tokens", lambda texts: [len(t) for t in texts]
+    )
+    file_results = [
+        ("a.pdf", [_chunk("a0", "xxxx"), _chunk("a1", "xxxx")]),
+        (
+            "b.pdf",
+            [
+                _chunk("b0", "xxx"),
+                _chunk("b1", "xxx", duplicate=True),
+                _chunk("b2", "x" * 20),
+                _chunk("b3", "xx", vector_id="canonical"),
+            ],
+        ),
+        ("c.pdf", [_chunk("c0", "x")]),
+    ]
+    batches = list(
+        rag_manuals_input.iter_token_batches(
+            file_results, max_tokens=10, skip=lambda chunk: chunk["id"] == "c0"
+        )
+    )
+
+    assert [ids for _, _, ids, _, _ in batches] == [["a0", "a1"], ["b0", "canonical"]]
+    assert [tokens for *_, tokens in batches] == [8, 5]
+    # a.pdf는 첫 배치가 저장되면 끝나고, b.pdf/c.pdf는 마지막 배치와 함께 끝남
+    assert [[path for path, _ in done] for _, _, _, done, _ in batches] == [
+        ["a.pdf"],
+        ["b.pdf", "c.pdf"],
+    ]
+    assert batches[1][3][0] == ("b.pdf", ["b0", "b1", "b2", "b3"])
+
+
+def test_process_pdf_with_timeout_in_main_thread(monkeypatch):
+    monkeypatch.setattr(rag_manuals_input, "process_pdf_text", slow_process_pdf_text)
+    start = time.perf_counter()
+    assert process_pdf_with_timeout("slow.pdf", timeout=0.2) == ("slow.pdf", None)
+    assert time.perf_counter() - start < 5
+    path, chunks = process_pdf_with_timeout("ok.pdf", timeout=0.2)
+    assert chunks[0]["text"] == "본문"
+
+
+def test_iter_processed_pdfs_returns_every_file(monkeypatch):
+    monkeypatch.setattr(rag_manuals_input, "process_pdf_text", slow_process_pdf_text)
+    paths = [f"{i}.pdf" for i in range(7)]
+    results = dict(iter_processed_pdfs(paths, workers=2))
+    assert sorted(results) == sorted(paths)
+    assert all(chunks[0]["id"] == path for path, chunks in results.items())
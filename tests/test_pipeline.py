@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from utils.pipeline import prefetch
+
+
+def test_prefetch_keeps_order_and_stays_bounded():
+    produced = []
+
+    def produce():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    items = prefetch(produce(), maxsize=2)
+    assert next(items) == 0
+    time.sleep(0.1)
+    # 소비하지 않는 동안 큐(2개) + 넣으려고 기다리는 1개 이상 진행하지 않음
+    assert len(produced) <= 4
+    assert list(items) == list(range(1, 10))
+
+
+def test_prefetch_reraises_producer_errors():
+    def produce():
+        yield 1
+        raise ValueError("손상된 PDF")
+
+    items = prefetch(produce())
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="손상된 PDF"):
+        next(items)
+
+
+def test_prefetch_runs_producer_in_background():
+    threads = []
+
+    def produce():
+        threads.append(threading.current_thread())
+        yield "chunk"
+
+    assert list(prefetch(produce())) == ["chunk"]
+    assert threads[0] is not threading.current_thread()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from utils.quantization import ProductQuantizer, ScalarQuantizer
+from utils.vector_store import QuantizedVectorStore
+
+
+def _data(n=400, dim=20, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def test_int8_distances_approximate_exact_distances():
+    vectors = _data()
+    quantizer = ScalarQuantizer.fit(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.dtype == np.int8
+
+    query = vectors[3] + 0.1
+    norms = (vectors**2).sum(axis=1)
+    exact = ((vectors - query) ** 2).sum(axis=1)
+    approx = quantizer.distances(query, codes, norms)
+    assert np.abs(approx - exact).max() < 0.05 * exact.mean()
+
+
+def test_pq_handles_dimensions_not_divisible_by_sub_dim(tmp_path):
+    vectors = _data(dim=20)
+    quantizer = ProductQuantizer.fit(vectors, sub_dim=8, iterations=5)
+    codes = quantizer.encode(vectors)
+    assert codes.shape == (len(vectors), 3) and codes.dtype == np.uint8
+
+    quantizer.save(str(tmp_path))
+    loaded = ProductQuantizer.load(str(tmp_path))
+    assert np.array_equal(loaded.encode(vectors), codes)
+
+    exact = ((vectors - vectors[0]) ** 2).sum(axis=1)
+    approx = loaded.distances(vectors[0], codes)
+    assert np.corrcoef(exact, approx)[0, 1] > 0.7
+
+
+@pytest.mark.parametrize("method", ["int8", "pq"])
+def test_quantized_store_recall_with_rerank(make_store, method):
+    vectors = _data(n=600, dim=16, seed=1)
+    metadatas = [{"even": i % 2 == 0} for i in range(len(vectors))]
+    exact_store = make_store(vectors, metadatas, quantize=[method])
+    store = QuantizedVectorStore(exact_store.directory, method=method, rerank=8)
+
+    queries = _data(n=20, dim=16, seed=2)
+    k = 5
+    expected = exact_store.query(queries, n_results=k)["ids"]
+    found = store.query(queries, n_results=k)["ids"]
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(expected, found)])
+    assert recall >= (0.99 if method == "int8" else 0.8)
+
+    filtered = store.query(queries[:1], n_results=k, where={"even": True})
+    assert all(int(i.split("-")[1]) % 2 == 0 for i in filtered["ids"][0])
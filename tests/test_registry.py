@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+import pytest
+from rag_registry import ResourceRegistry
+from utils.bm25 import BM25Index
+
+
+def save_index(path, texts, mtime):
+    BM25Index([f"doc-{i}" for i in range(len(texts))], texts, [{}] * len(texts)).save(
+        path
+    )
+    os.utime(path, (mtime, mtime))
+
+
+def test_lexical_index_is_replaced_when_file_changes(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    registry = ResourceRegistry()
+    assert registry.get_lexical_index(path) is None
+
+    save_index(path, ["배수 필터 청소"], mtime=1_000)
+    first = registry.get_lexical_index(path)
+    assert registry.get_lexical_index(path) is first
+    assert len(first) == 1
+
+    save_index(path, ["배수 필터 청소", "에러코드 dE"], mtime=2_000)
+    second = registry.get_lexical_index(path)
+    assert second is not first and len(second) == 2
+    # 경로마다 인덱스 하나만 보관
+    assert registry.stats()["resources"] == 1
+
+
+def test_resources_are_created_once_across_threads():
+    registry = ResourceRegistry()
+    created = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        created.append(object())
+        time.sleep(0.05)
+        return created[-1]
+
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(registry._get_or_create(("llm", "gpt", 0.3), factory))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(result is created[0] for result in results)
+    assert registry._get_or_create(("llm", "gpt", 0.5), object) is not created[0]
+    assert registry.stats()["resources"] == 2
+
+
+def test_setup_time_stats():
+    registry = ResourceRegistry()
+    registry.record_setup(0.002)
+    registry.record_setup(0.004)
+    stats = registry.stats()
+    assert stats["requests"] == 2
+    assert stats["last_setup_ms"] == pytest.approx(4.0)
+    assert stats["avg_setup_ms"] == pytest.approx(3.0)
@@ -0,0 +1,87 @@
+from langchain_core.documents import Document
+from rag_retrieval import model_fallback_filters, search_by_vector
+from utils.bm25 import matches_filter
+
+
+class FakeVectorDB:
+    """메타데이터 필터만 지원하는 테스트용 벡터DB (검색 순서는 저장 순서)"""
+
+    def __init__(self, records):
+        self.records = records
+
+    def get(self, where=None, limit=None, include=()):
+        metadatas = [m for _, m in self.records if matches_filter(m, where)]
+        return {"metadatas": metadatas[:limit]}
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        docs = [
+            Document(id=doc_id, page_content=doc_id, metadata=metadata)
+            for doc_id, metadata in self.records
+            if matches_filter(metadata, filter)
+        ]
+        return docs[:k]
+
+
+# 삼성 매뉴얼이 먼저 저장한 공유 청크에 LG 모델 필터 키가 붙은 경우
+RECORDS = [
+    (
+        "shared",
+        {
+            "model_code": "WA30DG2120EE",
+            "brand": "samsung",
+            "model:WA30DG2120EE": True,
+            "model:F21VDSK": True,
+            "brand:samsung": True,
+            "brand:lg": True,
+        },
+    ),
+    (
+        "lg-1",
+        {
+            "model_code": "F21VDSK",
+            "brand": "lg",
+            "model:F21VDSK": True,
+            "brand:lg": True,
+        },
+    ),
+    ("lg-2", {"model_code": "F24WDWP", "brand": "lg", "brand:lg": True}),
+    (
+        "samsung-1",
+        {"model_code": "WA30DG2120EE", "brand": "samsung", "brand:samsung": True},
+    ),
+]
+
+
+def test_model_fallback_filters_reads_brand_from_model_own_chunks():
+    filters = model_fallback_filters(FakeVectorDB(RECORDS), "F21VDSK")
+    assert filters == [{"model:F21VDSK": True}, {"brand:lg": True}, None]
+
+
+def test_model_fallback_filters_with_several_brands():
+    filters = model_fallback_filters(
+        FakeVectorDB(RECORDS), ["F21VDSK", "WA30DG2120EE", "UNKNOWN1"]
+    )
+    assert filters[0] == {
+        "$or": [
+            {"model:F21VDSK": True},
+            {"model:WA30DG2120EE": True},
+            {"model:UNKNOWN1": True},
+        ]
+    }
+    assert filters[1] == {"$or": [{"brand:lg": True}, {"brand:samsung": True}]}
+    assert filters[2] is None
+
+
+def test_search_by_vector_widens_filters_until_k():
+    vectordb = FakeVectorDB(RECORDS)
+    filters = model_fallback_filters(vectordb, "F21VDSK")
+    docs = search_by_vector(vectordb, [0.0], "similarity", {"k": 3}, filters)
+    assert [doc.id for doc in docs] == ["shared", "lg-1", "lg-2"]
+
+
+def test_brand_fallback_includes_chunks_shared_with_other_brand():
+    # 대표 모델이 삼성인 공유 청크도 LG 브랜드 단계에서 찾음
+    vectordb = FakeVectorDB(RECORDS[2:3] + RECORDS[:1])
+    filters = model_fallback_filters(vectordb, "F24WDWP")
+    docs = search_by_vector(vectordb, [0.0], "similarity", {"k": 2}, filters)
+    assert [doc.id for doc in docs] == ["lg-2", "shared"]
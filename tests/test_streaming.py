@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+import app_llm_cli
+
+
+class FakeStreamingLLM:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.received = None
+
+    def stream(self, messages):
+        self.received = messages
+        for piece in self.pieces:
+            yield SimpleNamespace(content=piece)
+
+
+def test_stream_enhanced_chain_yields_non_empty_tokens(monkeypatch):
+    messages = [{"role": "user", "content": "프롬프트"}]
+    monkeypatch.setattr(app_llm_cli, "build_messages", lambda *a, **kw: messages)
+    llm = FakeStreamingLLM(["배수 ", "", "필터를 ", "청소하세요."])
+
+    tokens = app_llm_cli.stream_enhanced_chain("질문", None, llm, "prompt")
+    assert llm.received is None  # generator라 소비하기 전에는 호출하지 않음
+    assert list(tokens) == ["배수 ", "필터를 ", "청소하세요."]
+    assert llm.received == messages
@@ -0,0 +1,92 @@
+import gzip
+import os
+import signal
+import time
+
+import pytest
+from utils.text_cache import ExtractedTextCache
+
+
+def test_extracts_once_per_content_and_version(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF a")
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(b"%PDF a")
+    calls = []
+
+    def extract(path):
+        calls.append(path)
+        return "추출한 본문"
+
+    cache_dir = str(tmp_path / "cache")
+    cache = ExtractedTextCache(cache_dir, version="v1")
+    assert cache.get_or_extract(str(pdf), extract) == "추출한 본문"
+    # 이름이 달라도 내용이 같으면 캐시 사용
+    assert cache.get_or_extract(str(copy), extract) == "추출한 본문"
+    assert calls == [str(pdf)]
+
+    ExtractedTextCache(cache_dir, version="v2").get_or_extract(str(pdf), extract)
+    pdf.write_bytes(b"%PDF b")
+    cache.get_or_extract(str(pdf), extract)
+    assert calls == [str(pdf)] * 3
+
+
+class Interrupted(BaseException):
+    pass
+
+
+def _write_slowly(monkeypatch, delay):
+    real_open = gzip.open
+
+    def slow_open(*args, **kwargs):
+        f = real_open(*args, **kwargs)
+        real_write = f.write
+        f.write = lambda text: (time.sleep(delay), real_write(text))[1]
+        return f
+
+    monkeypatch.setattr(gzip, "open", slow_open)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGALRM"), reason="SIGALRM 필요")
+def test_alarm_during_write_is_delivered_after_cache_is_complete(tmp_path, monkeypatch):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF a")
+    cache_dir = tmp_path / "cache"
+    cache = ExtractedTextCache(str(cache_dir), version="v1")
+
+    def extract(path):
+        # PDF 처리 제한 시간이 캐시 쓰기 도중에 끝나도록 설정
+        signal.setitimer(signal.ITIMER_REAL, 0.05)
+        return "추출한 본문"
+
+    def interrupt(signum, frame):
+        raise Interrupted()
+
+    _write_slowly(monkeypatch, 0.2)
+    previous = signal.signal(signal.SIGALRM, interrupt)
+    try:
+        with pytest.raises(Interrupted):
+            cache.get_or_extract(str(pdf), extract)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+    # 시간 초과는 쓰기가 끝난 뒤 전달되므로 캐시는 온전하고 임시 파일은 없음
+    assert [p.name.endswith(".txt.gz") for p in cache_dir.iterdir()] == [True]
+    monkeypatch.undo()
+    assert cache.get_or_extract(str(pdf), None) == "추출한 본문"
+
+
+def test_failed_write_removes_temp_file(tmp_path, monkeypatch):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF a")
+    cache_dir = tmp_path / "cache"
+    cache = ExtractedTextCache(str(cache_dir), version="v1")
+
+    def fail_replace(src, dst):
+        raise Interrupted()
+
+    monkeypatch.setattr(os, "replace", fail_replace)
+    with pytest.raises(Interrupted):
+        cache.get_or_extract(str(pdf), lambda path: "추출한 본문")
+    assert list(cache_dir.iterdir()) == []
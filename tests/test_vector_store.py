@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+import pytest
+from rag_retrieval import mmr_search_many, search_by_vector
+from utils.vector_store import mmr_select, multi_query_mmr_select, normalize_rows
+
+
+def _similarities(rng, n=30, m=3, dim=8):
+    candidates = normalize_rows(rng.normal(size=(n, dim)).astype(np.float32))
+    queries = normalize_rows(rng.normal(size=(m, dim)).astype(np.float32))
+    return candidates @ queries.T, candidates @ candidates.T
+
+
+def test_multi_query_mmr_matches_single_query_mmr():
+    query_similarity, candidate_similarity = _similarities(np.random.default_rng(0))
+    selected = multi_query_mmr_select(query_similarity, candidate_similarity, 5)
+    for j in range(query_similarity.shape[1]):
+        assert selected[j] == mmr_select(
+            query_similarity[:, j], candidate_similarity, 5
+        )
+
+
+def test_multi_query_mmr_lets_queries_share_documents():
+    # 두 질의가 같은 후보를 가장 가깝게 보면 둘 다 그 후보를 고름
+    query_similarity = np.array([[0.9, 0.9], [0.5, 0.1], [0.1, 0.5]])
+    candidate_similarity = np.eye(3)
+    selected = multi_query_mmr_select(query_similarity, candidate_similarity, 2)
+    assert selected == [[0, 1], [0, 2]]
+
+
+def test_multi_query_mmr_uses_lower_tiers_first():
+    query_similarity = np.array([[0.1], [0.9], [0.2]])
+    selected = multi_query_mmr_select(
+        query_similarity, np.eye(3), 2, tiers=np.array([0, 1, 0])
+    )
+    assert selected == [[2, 0]]
+
+
+def test_mmr_search_many_broadens_per_keyword(make_store):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(40, 8)).astype(np.float32)
+    metadatas = [{"model:A": True} if i < 3 else {} for i in range(40)]
+    store = make_store(vectors, metadatas)
+    embeddings = [vectors[5].tolist(), vectors[20].tolist()]
+    search_kwargs = {"k": 4, "fetch_k": 10}
+
+    results = mmr_search_many(
+        store, embeddings, search_kwargs, [{"model:A": True}, None]
+    )
+    for docs in results:
+        assert len(docs) == 4
+        # 모델 필터 문서 3개를 먼저 쓰고 나머지는 전체에서 채움
+        assert {doc.id for doc in docs[:3]} == {"doc-0", "doc-1", "doc-2"}
+
+    # 필터 없이도 키워드별 MMR 검색과 같은 개수를 반환
+    results = mmr_search_many(store, embeddings, search_kwargs)
+    for embedding, docs in zip(embeddings, results):
+        single = search_by_vector(store, embedding, "mmr", search_kwargs)
+        assert len(docs) == len(single) == 4
+        assert docs[0].id == single[0].id
+
+
+def _brute_force(vectors, query, k):
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return list(np.argsort(distances)[:k])
+
+
+def test_memmap_query_matches_brute_force_with_filters(make_store):
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    metadatas = [{"brand": "lg" if i % 2 else "samsung", "page": i} for i in range(50)]
+    store = make_store(vectors, metadatas)
+    query = rng.normal(size=8).astype(np.float32)
+
+    found = store.query([query], n_results=5, include=["distances"])
+    assert found["ids"][0] == [f"doc-{i}" for i in _brute_force(vectors, query, 5)]
+
+    lg_rows = np.arange(1, 50, 2)
+    found = store.query([query], n_results=3, where={"brand": "lg"})
+    expected = lg_rows[_brute_force(vectors[lg_rows], query, 3)]
+    assert found["ids"][0] == [f"doc-{i}" for i in expected]
+
+    where = {"$or": [{"page": 0}, {"page": {"$in": [3, 4]}}]}
+    assert store.get(where=where, include=[])["ids"] == ["doc-0", "doc-3", "doc-4"]
+    where = {"$and": [{"brand": "lg"}, {"page": {"$in": [3, 4]}}]}
+    assert store.get(where=where, include=[])["ids"] == ["doc-3"]
+
+
+def test_store_is_read_only(make_store):
+    from utils.vector_store import MemmapVectorStore
+
+    store = make_store(np.eye(3, dtype=np.float32))
+    with pytest.raises(TypeError, match="읽기 전용"):
+        store.add_texts(["새 문서"])
+    with pytest.raises(TypeError, match="읽기 전용"):
+        MemmapVectorStore.from_texts(["새 문서"], embedding=None)
+
+
+def test_rebuild_switches_snapshot_through_meta(tmp_path):
+    from tests.conftest import InMemoryCollection
+    from utils.vector_store import META_FILE, MemmapVectorStore
+
+    directory = str(tmp_path / "vectors")
+    first = np.eye(4, dtype=np.float32)
+    MemmapVectorStore.build(InMemoryCollection(first), directory)
+    old = MemmapVectorStore(directory)
+
+    for size in (6, 8):
+        second = np.eye(size, dtype=np.float32)[:, :4] + 1
+        meta = MemmapVectorStore.build(InMemoryCollection(second), directory)
+
+    # 이미 열린 저장소는 자기 스냅샷을 그대로 사용하고, 새로 열면 새 스냅샷을 읽음
+    assert len(old) == 4 and old.vectors.shape == (4, 4)
+    new = MemmapVectorStore(directory)
+    assert new.meta == meta and len(new) == 8
+    assert np.allclose(new.vectors, second)
+    snapshots = sorted(os.listdir(directory))
+    assert META_FILE in snapshots and len(snapshots) == 3  # meta + 현재 + 직전
+
+
+def test_interrupted_build_keeps_previous_snapshot(tmp_path, monkeypatch):
+    from tests.conftest import InMemoryCollection
+    from utils import vector_store
+    from utils.vector_store import MemmapVectorStore
+
+    directory = str(tmp_path / "vectors")
+    MemmapVectorStore.build(InMemoryCollection(np.eye(4)), directory)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(vector_store, "build_codes", fail)
+    with pytest.raises(OSError):
+        MemmapVectorStore.build(
+            InMemoryCollection(np.ones((6, 4))), directory, quantize=["int8"]
+        )
+    store = MemmapVectorStore(directory)
+    assert len(store) == 4 and np.allclose(store.vectors, np.eye(4))
@@ -0,0 +1,162 @@
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+# 영문/숫자 토큰(에러코드, 모델코드)과 한글 토큰
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+|[가-힣]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """BM25용 토큰 분리
+
+    영문/숫자는 대문자로 정규화한 단어 단위(IE, DE, WA30DG2120EE),
+    한글은 띄어쓰기와 조사에 영향을 덜 받도록 글자 bigram 단위로 나눈다.
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        word = match.group()
+        if "가" <= word[0] <= "힣":
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.upper())
+    return tokens
+
+
+def is_exact_term(keyword: str) -> bool:
+    """에러코드/모델코드처럼 영문·숫자로만 된 키워드인지 확인"""
+    return bool(re.fullmatch(r"[A-Za-z0-9\-_\s]+", keyword.strip()))
+
+
+def matches_filter(metadata: Dict[str, Any], where: Optional[Dict]) -> bool:
+    """Chroma where 필터 중 등호/$and/$or 조건만 메타데이터에 적용"""
+    if not where:
+        return True
+    for key, value in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in value):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in value):
+                return False
+        elif metadata.get(key) != value:
+            return False
+    return True
+
+
+class BM25Index:
+    """매뉴얼 청크용 로컬 BM25 역색인
+
+    임베딩 호출 없이 에러코드, 모델코드, 부품명처럼 정확히 일치해야 하는
+    키워드를 찾기 위해 사용한다. 청크 본문과 메타데이터도 함께 저장해서
+    검색 결과를 벡터DB 조회 없이 바로 반환한다.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        k1: float = 1.5,
+        b: float = 0.75,
+        postings: Optional[Dict[str, List[List[int]]]] = None,
+        doc_lengths: Optional[List[int]] = None,
+    ):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+
+        if postings is None:
+            postings = defaultdict(list)
+            doc_lengths = []
+            for doc_index, text in enumerate(texts):
+                counts = Counter(tokenize(text))
+                doc_lengths.append(sum(counts.values()))
+                for term, tf in counts.items():
+                    postings[term].append([doc_index, tf])
+        self.postings = dict(postings)
+        self.doc_lengths = doc_lengths
+
+        total = len(ids)
+        self.avg_length = sum(doc_lengths) / total if total else 0.0
+        self.idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_collection(cls, collection, batch_size: int = 5000) -> "BM25Index":
+        """Chroma 컬렉션에 저장된 모든 청크로 인덱스 생성"""
+        ids, texts, metadatas = [], [], []
+        offset = 0
+        while True:
+            page = collection.get(
+                include=["documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            texts.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            offset += len(page["ids"])
+        return cls(ids, texts, metadatas)
+
+    def search(
+        self, query: str, k: int = 8, where: Optional[Dict] = None
+    ) -> List[Tuple[int, float]]:
+        """(청크 번호, 점수) 목록을 점수 높은 순으로 반환"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term, query_tf in Counter(tokenize(query)).items():
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc_index, tf in docs:
+                norm = 1 - self.b + self.b * self.doc_lengths[doc_index] / self.avg_length
+                scores[doc_index] += (
+                    query_tf * idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                )
+
+        if where:
+            scores = {
+                doc_index: score
+                for doc_index, score in scores.items()
+                if matches_filter(self.metadatas[doc_index], where)
+            }
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str) -> None:
+        """인덱스 저장 (임시 파일에 쓴 뒤 교체)"""
+        state = {
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "texts": self.texts,
+            "metadatas": self.metadatas,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths,
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return cls(**state)
@@ -0,0 +1,52 @@
+import json
+import os
+from typing import Dict, List
+
+
+class BatchJournal:
+    """저장이 끝난 배치를 기록하는 체크포인트 저널 (JSON Lines)
+
+    배치 하나가 벡터DB에 저장될 때마다 (청크 ID, 텍스트 해시) 목록을 한 줄씩 추가한다.
+    실행이 중간에 끊기면 다음 실행에서 이미 저장된 청크를 건너뛸 수 있다.
+    배치 구성은 PDF 처리 순서에 따라 달라지므로 배치 단위가 아닌 청크 단위로 비교한다.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.committed: Dict[str, str] = {}
+
+        if resume and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 기록 도중 끊긴 마지막 줄은 무시
+                        continue
+                    self.committed.update(zip(entry["ids"], entry["hashes"]))
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def __len__(self) -> int:
+        return len(self.committed)
+
+    def is_committed(self, chunk_id: str, text_hash: str) -> bool:
+        """같은 내용의 청크가 이미 저장되었는지 확인"""
+        return self.committed.get(chunk_id) == text_hash
+
+    def record(self, ids: List[str], hashes: List[str]) -> None:
+        """저장이 끝난 배치 기록 (바로 디스크에 반영)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ids": ids, "hashes": hashes}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.committed.update(zip(ids, hashes))
+
+    def clear(self) -> None:
+        """전체 작업이 끝나면 저널 삭제"""
+        self.committed.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
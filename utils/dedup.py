@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+
+# MinHash 해시 함수 계산용 메르센 소수
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """문자 n-gram shingle 기반 MinHash 서명 계산기
+
+    한국어 매뉴얼은 띄어쓰기가 일정하지 않으므로 공백을 정규화한 뒤
+    문자 단위 shingle을 사용한다.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def _shingles(self, text: str) -> Set[str]:
+        normalized = re.sub(r"\s+", " ", text).strip()
+        if len(normalized) <= self.shingle_size:
+            return {normalized}
+        return {
+            normalized[i : i + self.shingle_size]
+            for i in range(len(normalized) - self.shingle_size + 1)
+        }
+
+    def signature(self, text: str) -> np.ndarray:
+        """텍스트의 MinHash 서명"""
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in self._shingles(text)),
+            dtype=np.uint64,
+        )
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % (
+            _MERSENNE_PRIME
+        )
+        return permuted.min(axis=1)
+
+
+class ChunkDeduplicator:
+    """청크 완전 중복(해시) + 유사 중복(MinHash LSH) 제거 인덱스
+
+    내용이 같거나 거의 같은 청크들은 하나의 대표 벡터(canonical)를 공유한다.
+    대표 벡터 ID는 내용 해시로 만들고, 각 청크의 논리 ID(모델명:청크 번호)는
+    멤버로 기록해서 어떤 모델들의 매뉴얼에 해당하는지 알 수 있게 한다.
+    벡터DB에 아직 저장되지 않은 대표 벡터는 다시 불러올 때 버린다.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 8,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm)
+        self._lock = threading.RLock()
+
+        self.members: Dict[str, List[str]] = {}
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.owner: Dict[str, str] = {}
+        self.committed: Set[str] = set()
+        self._buckets: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self._dirty: Set[str] = set()
+        self._load()
+
+    @staticmethod
+    def vector_id(text: str) -> str:
+        """내용 해시 기반 대표 벡터 ID"""
+        return "chunk:" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            rows = signature[band * self.rows : (band + 1) * self.rows]
+            yield band, hash(tuple(rows.tolist()))
+
+    def _add_canonical(self, vector_id: str, signature: np.ndarray) -> None:
+        self.members[vector_id] = []
+        self.signatures[vector_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets[key].add(vector_id)
+
+    def _remove_canonical(self, vector_id: str) -> None:
+        signature = self.signatures.pop(vector_id)
+        for key in self._band_keys(signature):
+            self._buckets[key].discard(vector_id)
+        self.members.pop(vector_id, None)
+        self.committed.discard(vector_id)
+        self._dirty.discard(vector_id)
+
+    def _find_similar(self, signature: np.ndarray) -> Optional[str]:
+        """LSH 버킷 후보 중 추정 Jaccard 유사도가 가장 높은 대표 벡터"""
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+
+        best_id, best_score = None, self.threshold
+        for candidate in candidates:
+            score = float(np.mean(self.signatures[candidate] == signature))
+            if score >= best_score:
+                best_id, best_score = candidate, score
+        return best_id
+
+    def assign(self, logical_id: str, text: str) -> Tuple[str, bool]:
+        """청크를 대표 벡터에 배정하고 (대표 벡터 ID, 새로 임베딩해야 하는지) 반환"""
+        with self._lock:
+            # 이전 실행에서 배정된 적이 있으면 새 내용 기준으로 다시 배정
+            if logical_id in self.owner:
+                self._release(logical_id)
+
+            vector_id = self.vector_id(text)
+            is_new = False
+            if vector_id not in self.members:
+                signature = self.hasher.signature(text)
+                similar = self._find_similar(signature)
+                if similar is not None:
+                    vector_id = similar
+                else:
+                    self._add_canonical(vector_id, signature)
+                    is_new = True
+
+            self.members[vector_id].append(logical_id)
+            self.owner[logical_id] = vector_id
+            if not is_new:
+                self._dirty.add(vector_id)
+            return vector_id, is_new
+
+    def _release(self, logical_id: str) -> Optional[Tuple[str, List[str]]]:
+        vector_id = self.owner.pop(logical_id, None)
+        if vector_id is None:
+            return None
+        members = self.members[vector_id]
+        members.remove(logical_id)
+        if not members:
+            self._remove_canonical(vector_id)
+        else:
+            self._dirty.add(vector_id)
+        return vector_id, list(members)
+
+    def release(self, logical_id: str) -> Optional[Tuple[str, List[str]]]:
+        """청크를 인덱스에서 제거하고 (대표 벡터 ID, 남은 멤버) 반환
+
+        인덱스에 없는 청크(중복 제거 이전에 저장된 청크)는 None을 반환한다.
+        """
+        with self._lock:
+            return self._release(logical_id)
+
+    def mark_committed(self, vector_ids: List[str]) -> None:
+        """벡터DB에 저장된 대표 벡터 표시"""
+        with self._lock:
+            self.committed.update(v for v in vector_ids if v in self.members)
+
+    def model_names(self, vector_id: str) -> List[str]:
+        """대표 벡터가 해당하는 모델명 목록"""
+        with self._lock:
+            return sorted(
+                {member.rsplit(":", 1)[0] for member in self.members[vector_id]}
+            )
+
+    def pop_dirty_committed(self) -> List[str]:
+        """멤버가 바뀌었고 이미 저장된 대표 벡터 ID 목록 (메타데이터 갱신 대상)"""
+        with self._lock:
+            ready = [v for v in self._dirty if v in self.committed]
+            self._dirty.difference_update(ready)
+            return ready
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        committed = set(state["committed"])
+        for vector_id, members in state["members"].items():
+            if vector_id not in committed:
+                continue
+            self._add_canonical(
+                vector_id, np.array(state["signatures"][vector_id], dtype=np.uint64)
+            )
+            self.members[vector_id] = members
+            for member in members:
+                self.owner[member] = vector_id
+        self.committed = committed & set(self.members)
+
+    def save(self) -> None:
+        """인덱스 저장 (임시 파일에 쓴 뒤 교체)"""
+        with self._lock:
+            state = {
+                "members": self.members,
+                "signatures": {k: v.tolist() for k, v in self.signatures.items()},
+                "committed": sorted(self.committed),
+            }
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List
+from langchain_core.embeddings import Embeddings
+
+
+def text_sha256(text: str) -> str:
+    """텍스트의 sha256 해시"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """(임베딩 모델, sha256(텍스트)) 키로 임베딩을 SQLite에 저장하는 캐시 래퍼
+
+    인덱싱/검색 모두 이 래퍼를 거치면 같은 텍스트는 다시 API를 호출하지 않는다.
+    max_entries를 넘으면 가장 오래 사용하지 않은 항목부터 삭제한다.
+    행 수는 열 때 한 번 세고 이후에는 메모리에서 더하고 빼므로, 다른 프로세스가
+    같은 파일에 쓴 만큼은 다음에 열 때 반영된다.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        db_path: str = "./cache/embeddings.sqlite",
+        max_entries: int = 500_000,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        count_query = "SELECT COUNT(*) FROM embeddings"
+        self._count = self._conn.execute(count_query).fetchone()[0]
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """캐시에 있는 해시의 벡터 조회 (조회한 항목은 사용 시각 갱신)"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        # SQLite 변수 개수 제한을 넘지 않도록 나눠서 조회
+        for i in range(0, len(unique), 500):
+            part = unique[i : i + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model, *part],
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = array("f", blob).tolist()
+
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, self.model, text_hash) for text_hash in found],
+            )
+            self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        """새 벡터 저장 후 크기 제한 초과분 삭제
+
+        다른 스레드가 먼저 저장한 텍스트는 같은 벡터이므로 무시한다.
+        """
+        now = time.time()
+        inserted = self._conn.executemany(
+            "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?)",
+            [
+                (self.model, text_hash, array("f", vector).tobytes(), now)
+                for text_hash, vector in items.items()
+            ],
+        ).rowcount
+        self._count += inserted
+        if self._count > self.max_entries:
+            deleted = self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN ("
+                "SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (self._count - self.max_entries,),
+            ).rowcount
+            self._count -= deleted
+        self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """캐시에 없는 텍스트만 한 번의 API 호출로 임베딩"""
+        hashes = [text_sha256(text) for text in texts]
+
+        with self._lock:
+            cached = self._lookup(hashes)
+
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            with self._lock:
+                self.api_calls += 1
+                self._store(computed)
+            cached.update(computed)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """검색 쿼리 임베딩 (캐시 사용)"""
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 적중/미스/API 호출 통계"""
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model,)
+            ).fetchone()[0]
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "api_calls": self.api_calls,
+            }
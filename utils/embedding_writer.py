@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Iterable, Iterator, List, Tuple
+import openai
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# OpenAIEmbeddings 기본값: embed_documents가 HTTP 요청 하나에 보내는 텍스트 수
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class RateLimiter:
+    """1분 슬라이딩 윈도우 기준 토큰/요청 수 제한"""
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._lock = threading.Lock()
+        self._events: "deque[Tuple[float, int, int]]" = deque()
+
+    def acquire(self, tokens: int, requests: int = 1) -> None:
+        """예산이 생길 때까지 기다린 뒤 tokens, requests만큼 사용"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= 60:
+                    self._events.popleft()
+
+                used_tokens = sum(event[1] for event in self._events)
+                used_requests = sum(event[2] for event in self._events)
+                # 한 번에 쓰는 양이 분당 한도보다 커도 창이 비어 있으면 보낸다
+                if not self._events or (
+                    used_requests + requests <= self.requests_per_minute
+                    and used_tokens + tokens <= self.tokens_per_minute
+                ):
+                    self._events.append((now, tokens, requests))
+                    return
+                wait = self._events[0][0] + 60 - now
+            time.sleep(max(wait, 0.05))
+
+
+def is_retryable(error: Exception) -> bool:
+    """429/5xx/연결 오류처럼 다시 시도할 만한 오류인지 확인"""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def request_chunk_size(embeddings) -> int:
+    """embed_documents 한 번이 HTTP 요청 하나에 보내는 텍스트 수
+
+    CachedEmbeddings처럼 감싼 경우 안쪽 임베딩 객체의 chunk_size를 찾는다.
+    """
+    while embeddings is not None:
+        chunk_size = getattr(embeddings, "chunk_size", None)
+        if chunk_size:
+            return chunk_size
+        embeddings = getattr(embeddings, "embeddings", None)
+    return DEFAULT_CHUNK_SIZE
+
+
+class EmbeddingWriter:
+    """토큰 배치를 여러 개 동시에 임베딩하고 순서대로 Chroma에 저장
+
+    배치는 (texts, metadatas, ids, completed_files, tokens) 형태이며,
+    write()는 저장이 끝난 배치를 입력 순서대로 반환한다.
+    """
+
+    def __init__(
+        self,
+        vectordb,
+        concurrency: int = 4,
+        tokens_per_minute: int = 1_000_000,
+        requests_per_minute: int = 3_000,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+    ):
+        self.vectordb = vectordb
+        self.embeddings = vectordb.embeddings
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(tokens_per_minute, requests_per_minute)
+        self.chunk_size = request_chunk_size(self.embeddings)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+    def _embed_with_retry(self, texts: List[str], tokens: int) -> List[List[float]]:
+        """재시도 가능한 오류는 지수 백오프로 다시 시도"""
+        # OpenAIEmbeddings는 chunk_size개씩 나눠서 요청하므로 실제 요청 수로 계산
+        requests = -(-len(texts) // self.chunk_size)
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(tokens, requests)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.base_delay * (2**attempt) + random.uniform(0, 1)
+                print(f"임베딩 재시도 {attempt + 1}/{self.max_retries} ({delay:.1f}초 후): {e}")
+                time.sleep(delay)
+
+    def _commit(self, batch: Tuple, future: Future) -> Tuple:
+        texts, metadatas, ids = batch[0], batch[1], batch[2]
+        vectors = future.result()
+        if texts:
+            self.vectordb._collection.upsert(
+                ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts
+            )
+        return batch
+
+    def write(self, batches: Iterable[Tuple]) -> Iterator[Tuple]:
+        """배치를 최대 concurrency개까지 동시에 임베딩하고 입력 순서대로 저장"""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = deque()
+            for batch in batches:
+                texts, tokens = batch[0], batch[4]
+                if texts:
+                    future = executor.submit(self._embed_with_retry, texts, tokens)
+                else:
+                    future = Future()
+                    future.set_result([])
+                in_flight.append((batch, future))
+
+                if len(in_flight) >= self.concurrency:
+                    yield self._commit(*in_flight.popleft())
+
+            while in_flight:
+                yield self._commit(*in_flight.popleft())
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from utils.index import file_sha256
+
+
+class ImageLookupCache:
+    """이미지 내용 해시 → 조회 결과(후보 모델 목록) LRU 캐시
+
+    같은 이미지를 Streamlit 재실행마다, 답변 생성 때마다 다시 검색하지 않도록
+    결과를 메모리에 보관하고, persist_path가 주어지면 JSON 파일로도 저장한다.
+    키에 인덱스 버전을 넣으므로 다시 인덱싱/보정하면 이전 결과는 쓰지 않고
+    LRU 순서대로 밀려난다.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        persist_path: Optional[str] = None,
+        namespace: str = "",
+    ):
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._load()
+
+    def _key(self, image_path: str, version: str = "") -> str:
+        return f"{self.namespace}:{version}:{file_sha256(image_path)}"
+
+    def _load(self) -> None:
+        """디스크에 저장된 캐시 불러오기"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"이미지 캐시 읽기 실패 {self.persist_path}: {e}")
+            return
+        for key, value in list(entries.items())[-self.max_entries :]:
+            self._entries[key] = value
+
+    def _save(self) -> None:
+        """캐시를 디스크에 저장 (임시 파일에 쓴 뒤 교체)"""
+        if not self.persist_path:
+            return
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.persist_path)
+
+    def get_or_compute_many(
+        self,
+        image_paths: List[str],
+        compute_many: Callable[[List[str]], List[Any]],
+        version: str = "",
+    ) -> List[Any]:
+        """여러 이미지 중 캐시에 없는 것만 compute_many(경로 목록)로 한 번에 계산
+
+        version은 검색 대상 인덱스의 버전 (RAGIndexer.index_version)
+        """
+        keys = [self._key(image_path, version) for image_path in image_paths]
+        results: List[Any] = [None] * len(image_paths)
+        missing = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._entries:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    results[i] = self._entries[key]
+                else:
+                    self.misses += 1
+                    missing.append(i)
+
+        if missing:
+            computed = compute_many([image_paths[i] for i in missing])
+            with self._lock:
+                for i, result in zip(missing, computed):
+                    results[i] = result
+                    self._entries[keys[i]] = result
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._save()
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """캐시 적중/미스 통계"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
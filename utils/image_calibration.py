@@ -0,0 +1,176 @@
+import json
+import math
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from utils.index import extract_model_code
+
+
+def model_key(model_name: str) -> str:
+    """슬라이드 이름(모델명_색상_번호)을 모델 단위 키로 변환 (모델코드가 없으면 그대로)"""
+    return extract_model_code(model_name) or model_name
+
+
+def vote_candidates(
+    neighbors: Sequence[Tuple[str, float]], temperature: float
+) -> List[Dict[str, Any]]:
+    """이웃 슬라이드 (모델명, 거리) 목록을 모델별로 합쳐 후보 목록 생성
+
+    같은 모델의 여러 슬라이드/색상이 exp(-거리 / temperature) 가중치로 투표하고,
+    score는 전체 가중치 중 해당 모델이 차지하는 비율이다.
+    """
+    weights: Dict[str, float] = defaultdict(float)
+    votes: Dict[str, int] = defaultdict(int)
+    best: Dict[str, Tuple[float, str]] = {}
+    for model_name, distance in neighbors:
+        key = model_key(model_name)
+        weights[key] += math.exp(-distance / temperature)
+        votes[key] += 1
+        if key not in best or distance < best[key][0]:
+            best[key] = (distance, model_name)
+
+    total = sum(weights.values()) or 1.0
+    candidates = [
+        {
+            "model_code": key,
+            "model_name": best[key][1],
+            "distance": best[key][0],
+            "votes": votes[key],
+            "score": weights[key] / total,
+        }
+        for key in weights
+    ]
+    candidates.sort(key=lambda c: c["score"], reverse=True)
+    return candidates
+
+
+class ImageMatchCalibration:
+    """최근접 모델 거리 → 정답일 확률 변환 (1차원 로지스틱 회귀)
+
+    인덱싱한 이미지로 두 종류의 예시를 만들어 학습한다.
+    - 이미지 하나만 빼고 검색: 같은 모델의 다른 슬라이드가 있으므로 대부분 정답
+    - 같은 모델 이미지를 모두 빼고 검색: 항상 오답 (인덱스에 없는 제품 사진)
+    """
+
+    def __init__(
+        self,
+        slope: float,
+        intercept: float,
+        temperature: float,
+        extractor: str = "",
+        samples: int = 0,
+        accuracy: float = 0.0,
+    ):
+        self.slope = slope
+        self.intercept = intercept
+        self.temperature = temperature
+        self.extractor = extractor
+        self.samples = samples
+        self.accuracy = accuracy
+
+    @property
+    def threshold(self) -> float:
+        """확률이 0.5가 되는 거리"""
+        return -self.intercept / self.slope
+
+    def confidence(self, distance: float) -> float:
+        z = self.slope * distance + self.intercept
+        return 1.0 / (1.0 + math.exp(-max(min(z, 50.0), -50.0)))
+
+    @classmethod
+    def default(cls, threshold: float) -> "ImageMatchCalibration":
+        """보정 전 기본값: 고정 거리 기준 근처에서 확률이 0.5가 되도록 설정"""
+        slope = -10.0 / max(threshold, 1e-6)
+        return cls(slope=slope, intercept=-slope * threshold, temperature=threshold / 3)
+
+    @classmethod
+    def fit(
+        cls,
+        embeddings: np.ndarray,
+        model_names: List[str],
+        extractor: str = "",
+        fetch_k: int = 20,
+        max_samples: int = 2000,
+        seed: int = 0,
+    ) -> Optional["ImageMatchCalibration"]:
+        """인덱싱한 이미지 특징 벡터로 보정값 학습 (예시가 한쪽뿐이면 None)"""
+        n = len(model_names)
+        if n < 3:
+            return None
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = (vectors**2).sum(axis=1)
+        keys = np.array([model_key(name) for name in model_names])
+
+        rng = np.random.default_rng(seed)
+        sample = rng.permutation(n)[:max_samples]
+
+        # 거리 척도에 맞는 투표 temperature: 가장 가까운 이웃 거리의 중앙값
+        nearest = []
+        raw_pairs = []
+        for start in range(0, len(sample), 256):
+            rows = sample[start : start + 256]
+            distances = (
+                norms[rows, None] + norms[None, :] - 2 * vectors[rows] @ vectors.T
+            )
+            distances = np.maximum(distances, 0)
+            distances[np.arange(len(rows)), rows] = np.inf
+            for row, index in zip(distances, rows):
+                nearest.append(float(row.min()))
+                raw_pairs.append((index, row))
+        temperature = max(float(np.median(nearest)), 1e-4)
+
+        features, labels = [], []
+        for index, row in raw_pairs:
+            for exclude_model in (False, True):
+                if exclude_model:
+                    row = np.where(keys == keys[index], np.inf, row)
+                top = np.argsort(row)[:fetch_k]
+                top = top[np.isfinite(row[top])]
+                if not len(top):
+                    continue
+                candidates = vote_candidates(
+                    [(model_names[i], float(row[i])) for i in top], temperature
+                )
+                features.append(candidates[0]["distance"])
+                labels.append(float(candidates[0]["model_code"] == keys[index]))
+
+        features = np.array(features)
+        labels = np.array(labels)
+        if labels.min() == labels.max():
+            return None
+
+        # 표준화한 거리로 로지스틱 회귀 (경사 하강법)
+        mean, std = features.mean(), features.std() or 1.0
+        z = (features - mean) / std
+        w, b = 0.0, 0.0
+        for _ in range(2000):
+            p = 1.0 / (1.0 + np.exp(-(w * z + b)))
+            w -= 0.5 * float(np.mean((p - labels) * z))
+            b -= 0.5 * float(np.mean(p - labels))
+
+        slope = float(w / std)
+        calibration = cls(
+            slope=slope,
+            intercept=float(b - slope * mean),
+            temperature=temperature,
+            extractor=extractor,
+            samples=len(labels),
+        )
+        predictions = np.array([calibration.confidence(d) >= 0.5 for d in features])
+        calibration.accuracy = float(np.mean(predictions == labels.astype(bool)))
+        return calibration
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.__dict__, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ImageMatchCalibration"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
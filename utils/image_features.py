@@ -0,0 +1,188 @@
+import os
+from typing import List
+import numpy as np
+from PIL import Image
+
+# 이미지를 읽을 때 사용할 최대 크기 (JPEG는 draft 모드로 축소 디코딩)
+_DECODE_SIZE = (256, 256)
+
+# 특징 성분별 크기 (HandcraftedFeatureExtractor.dimension은 이 값들의 합)
+_HASH_BITS = 64  # pHash, dHash 각각
+_COLOR_BINS = 8 * 3 * 3  # 색상 x 채도 x 명도
+_EDGE_BINS = 2 * 2 * 8  # 2x2 영역 x 8방향
+
+
+def load_image(image_path: str) -> Image.Image:
+    """이미지를 RGB로 로드 (큰 JPEG는 축소 디코딩)"""
+    image = Image.open(image_path)
+    image.draft("RGB", _DECODE_SIZE)
+    if image.mode in ("RGBA", "LA", "P"):
+        # 투명 배경은 흰색으로 채움 (제품 사진 배경과 맞춤)
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    return image.convert("RGB")
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    return np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def phash_bits(image: Image.Image) -> np.ndarray:
+    """perceptual hash 64비트 (32x32 흑백 DCT의 저주파 8x8 성분을 중앙값과 비교)"""
+    gray = np.asarray(
+        image.convert("L").resize((32, 32), Image.Resampling.LANCZOS),
+        dtype=np.float64,
+    )
+    low = (_DCT_32 @ gray @ _DCT_32.T)[:8, :8].ravel()
+    # DC 성분은 밝기 전체 평균이므로 중앙값 계산에서 제외
+    return low > np.median(low[1:])
+
+
+def dhash_bits(image: Image.Image) -> np.ndarray:
+    """difference hash 64비트 (9x8 흑백 이미지의 가로 방향 밝기 변화)"""
+    gray = np.asarray(
+        image.convert("L").resize((9, 8), Image.Resampling.LANCZOS),
+        dtype=np.int16,
+    )
+    return (gray[:, 1:] > gray[:, :-1]).ravel()
+
+
+def bits_to_int(bits: np.ndarray) -> int:
+    """비트 배열을 정수 해시로 변환"""
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def _color_histogram(image: Image.Image) -> np.ndarray:
+    """HSV 색상 히스토그램 (색상 8 x 채도 3 x 명도 3)"""
+    hsv = np.asarray(image.resize((64, 64)).convert("HSV"), dtype=np.int32)
+    h = hsv[..., 0] * 8 // 256
+    s = hsv[..., 1] * 3 // 256
+    v = hsv[..., 2] * 3 // 256
+    bins = (h * 9 + s * 3 + v).ravel()
+    return np.bincount(bins, minlength=_COLOR_BINS).astype(np.float64)
+
+
+def _edge_histogram(image: Image.Image) -> np.ndarray:
+    """2x2 영역별 기울기 방향 히스토그램 (8방향, 기울기 크기로 가중)"""
+    gray = np.asarray(image.convert("L").resize((128, 128)), dtype=np.float64)
+    gx = np.zeros_like(gray)
+    gy = np.zeros_like(gray)
+    gx[:, 1:-1] = gray[:, 2:] - gray[:, :-2]
+    gy[1:-1, :] = gray[2:, :] - gray[:-2, :]
+    magnitude = np.hypot(gx, gy)
+    orientation = ((np.arctan2(gy, gx) + np.pi) / (2 * np.pi) * 8).astype(int) % 8
+
+    histograms = []
+    for rows in (slice(0, 64), slice(64, 128)):
+        for cols in (slice(0, 64), slice(64, 128)):
+            histograms.append(
+                np.bincount(
+                    orientation[rows, cols].ravel(),
+                    weights=magnitude[rows, cols].ravel(),
+                    minlength=8,
+                )
+            )
+    return np.concatenate(histograms)
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class HandcraftedFeatureExtractor:
+    """NumPy/Pillow만으로 계산하는 이미지 특징 벡터 (CPU, 오프라인)
+
+    pHash/dHash 비트(±1), HSV 색상 히스토그램, 영역별 기울기 방향 히스토그램을
+    각각 정규화해서 이어 붙인 단위 벡터 (64 + 64 + 72 + 32 = 232차원). 같은 제품 사진은 거리가 0에 가깝고,
+    색상만 다른 같은 모델은 해시/윤곽 성분이 가까워진다.
+    """
+
+    name = "handcrafted-v1"
+    dimension = 2 * _HASH_BITS + _COLOR_BINS + _EDGE_BINS
+
+    # 성분별 가중치 (합쳐진 벡터에서 각 성분이 차지하는 비중)
+    weights = {"phash": 1.0, "dhash": 1.0, "color": 1.0, "edge": 1.0}
+
+    def extract(self, image_path: str) -> List[float]:
+        image = load_image(image_path)
+        parts = [
+            self.weights["phash"] * _normalize(phash_bits(image) * 2.0 - 1.0),
+            self.weights["dhash"] * _normalize(dhash_bits(image) * 2.0 - 1.0),
+            # 히스토그램은 제곱근(Hellinger)을 취해 큰 값의 영향을 줄임
+            self.weights["color"] * _normalize(np.sqrt(_color_histogram(image))),
+            self.weights["edge"] * _normalize(np.sqrt(_edge_histogram(image))),
+        ]
+        return _normalize(np.concatenate(parts)).tolist()
+
+
+class OnnxFeatureExtractor:
+    """CPU ONNX 이미지 모델(예: MobileNet/ResNet 특징 추출기)의 출력 벡터
+
+    입력은 (1, 3, input_size, input_size) ImageNet 정규화 텐서로 가정한다.
+    """
+
+    def __init__(self, model_path: str, input_size: int = 224):
+        import onnxruntime
+
+        self.session = onnxruntime.InferenceSession(
+            model_path, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_size = input_size
+        self.name = f"onnx:{os.path.basename(model_path)}"
+
+    def extract(self, image_path: str) -> List[float]:
+        image = load_image(image_path).resize((self.input_size, self.input_size))
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+        pixels = (pixels - [0.485, 0.456, 0.406]) / [0.229, 0.224, 0.225]
+        tensor = pixels.transpose(2, 0, 1)[None].astype(np.float32)
+        output = self.session.run(None, {self.input_name: tensor})[0]
+        return _normalize(np.asarray(output, dtype=np.float64).ravel()).tolist()
+
+
+class Base64PrefixExtractor:
+    """기존 방식: base64 앞부분 문자열을 텍스트 임베딩 (API 호출 필요)
+
+    이전에 만든 imgs 컬렉션과 호환하기 위해서만 남겨둔다.
+    """
+
+    name = "base64-prefix"
+
+    def __init__(self, embeddings, max_chars: int = 800):
+        self.embeddings = embeddings
+        self.max_chars = max_chars
+
+    def extract(self, image_path: str) -> List[float]:
+        from utils.index import image_to_base64
+
+        prefix = image_to_base64(image_path, max_chars=self.max_chars)
+        return self.embeddings.embed_query(prefix)
+
+
+def create_feature_extractor(name: str, embeddings=None, onnx_model_path: str = ""):
+    """설정 이름으로 이미지 특징 추출기 생성
+
+    name: "handcrafted" | "onnx" | "base64"
+    onnx는 onnxruntime이나 모델 파일이 없으면 handcrafted로 대신한다.
+    """
+    if name == "onnx":
+        if onnx_model_path and os.path.exists(onnx_model_path):
+            try:
+                return OnnxFeatureExtractor(onnx_model_path)
+            except ImportError:
+                print("onnxruntime이 없어 handcrafted 특징을 사용합니다.")
+        else:
+            print(f"ONNX 모델을 찾을 수 없어 handcrafted 특징을 사용합니다: {onnx_model_path}")
+        return HandcraftedFeatureExtractor()
+    if name == "base64":
+        return Base64PrefixExtractor(embeddings)
+    if name == "handcrafted":
+        return HandcraftedFeatureExtractor()
+    raise ValueError(f"지원하지 않는 이미지 특징 추출기: {name}")
@@ -0,0 +1,135 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+from utils.image_calibration import model_key
+from utils.image_features import bits_to_int, dhash_bits, load_image, phash_bits
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def image_hashes(image_path: str) -> Tuple[int, int]:
+    """이미지의 (pHash, dHash) 64비트 정수"""
+    image = load_image(image_path)
+    return bits_to_int(phash_bits(image)), bits_to_int(dhash_bits(image))
+
+
+class BKTree:
+    """해밍 거리 기준 BK-tree (거리 d 이내 검색 시 삼각 부등식으로 가지치기)"""
+
+    def __init__(self):
+        # 노드: [해시, 값 목록, {거리: 자식 노드}]
+        self._root = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: int, value) -> None:
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key: int, max_distance: int) -> List[Tuple[int, object]]:
+        """거리 max_distance 이내의 (거리, 값) 목록"""
+        if self._root is None:
+            return []
+        results = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance:
+                results.extend((distance, value) for value in node[1])
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(
+                child for d, child in node[2].items() if low <= d <= high
+            )
+        return results
+
+
+class ImageHashIndex:
+    """인덱싱한 이미지의 pHash/dHash 색인
+
+    업로드된 사진이 이미 인덱싱한 제품 사진과 같거나 거의 같으면
+    벡터DB 검색 없이 바로 모델명을 찾는다. pHash는 BK-tree로 후보를 찾고,
+    dHash 거리로 한 번 더 확인한다. 서로 다른 모델의 사진이 걸리면 판단하지 않고
+    벡터 검색에 맡긴다.
+    """
+
+    def __init__(self, path: str, max_phash_distance: int = 6, max_dhash_distance: int = 10):
+        self.path = path
+        self.max_phash_distance = max_phash_distance
+        self.max_dhash_distance = max_dhash_distance
+        self.entries: List[Dict] = []
+        self._exact: Dict[Tuple[int, int], List[str]] = {}
+        self._tree = BKTree()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    self.add(entry["phash"], entry["dhash"], entry["model_name"])
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, phash: int, dhash: int, model_name: str) -> None:
+        entry = {"phash": phash, "dhash": dhash, "model_name": model_name}
+        self.entries.append(entry)
+        self._exact.setdefault((phash, dhash), []).append(model_name)
+        self._tree.add(phash, entry)
+
+    def clear(self) -> None:
+        self.entries = []
+        self._exact = {}
+        self._tree = BKTree()
+
+    @staticmethod
+    def _single_model(matches: List[Tuple[int, str]]) -> Optional[str]:
+        """(거리, 모델명) 목록이 모두 같은 모델이면 가장 가까운 모델명, 아니면 None"""
+        if not matches or len({model_key(name) for _, name in matches}) > 1:
+            return None
+        return min(matches, key=lambda match: match[0])[1]
+
+    def lookup_hashes(self, phash: int, dhash: int) -> Optional[str]:
+        """같거나 거의 같은 이미지의 모델명
+
+        일치하는 이미지가 없거나, 기준 거리 안에 서로 다른 모델이 있으면 None
+        """
+        exact = self._exact.get((phash, dhash))
+        if exact:
+            return self._single_model([(0, name) for name in exact])
+
+        matches = []
+        for distance, entry in self._tree.search(phash, self.max_phash_distance):
+            dhash_distance = hamming(dhash, entry["dhash"])
+            if dhash_distance <= self.max_dhash_distance:
+                matches.append((distance + dhash_distance, entry["model_name"]))
+        return self._single_model(matches)
+
+    def lookup(self, image_path: str) -> Optional[str]:
+        if not self.entries:
+            return None
+        return self.lookup_hashes(*image_hashes(image_path))
+
+    def save(self) -> None:
+        """색인 저장 (임시 파일에 쓴 뒤 교체)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
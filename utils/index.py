@@ -1,11 +1,21 @@
 import base64
+import hashlib
 import os
+import re
 
 
-def image_to_base64(image_path):
-    """이미지 파일을 base64 문자열로 변환"""
+def image_to_base64(image_path, max_chars=None):
+    """이미지 파일을 base64 문자열로 변환
+
+    max_chars가 있으면 앞부분 max_chars글자에 필요한 바이트만 읽는다.
+    base64는 3바이트마다 4글자이므로 3바이트 단위로 자른 앞부분을 인코딩하면
+    전체 인코딩 결과의 앞부분과 같다 (800글자 → 600바이트).
+    """
     with open(image_path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
+        if max_chars is None:
+            return base64.b64encode(f.read()).decode("utf-8")
+        data = f.read(-(-max_chars // 4) * 3)
+    return base64.b64encode(data).decode("utf-8")[:max_chars]
 
 
 def summarize_image(image_path: str, base_dir: str = "") -> str:
@@ -14,3 +24,64 @@ def summarize_image(image_path: str, base_dir: str = "") -> str:
         rel_path = os.path.relpath(image_path, base_dir)
         return os.path.splitext(rel_path)[0]  # 확장자 제거
     return os.path.splitext(os.path.basename(image_path))[0]  # 확장자 제거
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """파일 내용의 sha256 해시"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# 모델코드 형태: 영문으로 시작하고 숫자가 포함된 5자 이상 토큰 (예: WA30DG2120EE)
+MODEL_CODE_PATTERN = re.compile(r"^[A-Za-z]+[0-9][A-Za-z0-9.\-]*$")
+# 모델코드가 아닌 문서 ID (삼성 매뉴얼 원본 파일명 앞의 OID84043 등)
+DOCUMENT_ID_PATTERN = re.compile(r"^OID[0-9]+$", re.IGNORECASE)
+BRAND_ALIASES = {
+    "samsung": "samsung",
+    "삼성": "samsung",
+    "lg": "lg",
+    "엘지": "lg",
+}
+
+
+def extract_model_code(name: str) -> str:
+    """파일명/모델명에서 정규화된 모델코드 추출 (없으면 빈 문자열)
+
+    예: 아가사랑_3kg_WA30DG2120EE_그레이지_0001 → WA30DG2120EE
+        OID84043_IB_WA6000F_BestBetter_KO_250714 → WA6000F
+    """
+    for token in re.split(r"[_\s/]+", str(name)):
+        if DOCUMENT_ID_PATTERN.match(token):
+            continue
+        if len(token) >= 5 and MODEL_CODE_PATTERN.match(token):
+            return re.sub(r"[^A-Z0-9]", "", token.upper())
+    return ""
+
+
+def detect_brand(path: str) -> str:
+    """경로의 디렉토리/파일명에서 브랜드 추출 (없으면 빈 문자열)"""
+    for part in re.split(r"[\\/_\s]+", path.lower()):
+        if part in BRAND_ALIASES:
+            return BRAND_ALIASES[part]
+    return ""
+
+
+def model_flag_key(model_code: str) -> str:
+    """청크가 해당 모델에 속하는지 표시하는 메타데이터 키
+
+    중복 제거로 여러 모델이 하나의 청크를 공유할 수 있으므로
+    모델마다 별도 키를 두어 Chroma where 필터로 찾을 수 있게 한다.
+    """
+    return f"model:{model_code}"
+
+
+def brand_flag_key(brand: str) -> str:
+    """청크가 해당 브랜드 모델에 속하는지 표시하는 메타데이터 키
+
+    공유 청크의 brand는 대표 모델 하나의 브랜드이므로, 공유하는 모델들의
+    브랜드마다 model_flag_key처럼 별도 키를 둔다.
+    """
+    return f"brand:{brand}"
@@ -0,0 +1,76 @@
+import json
+import os
+from typing import Dict, List, Tuple, Any
+from utils.index import file_sha256
+
+
+class IndexManifest:
+    """인덱싱한 파일의 (크기, 수정 시각, 내용 해시) → 청크 ID 목록 기록
+
+    다음 실행 때 새로 추가되거나 바뀐 파일만 다시 처리하고,
+    삭제된 파일의 청크를 벡터DB에서 지울 수 있도록 JSON 파일로 저장한다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def diff(
+        self, paths: List[str], full: bool = False
+    ) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[str]]:
+        """(새로 추가/변경된 파일과 그 지문 목록, 삭제된 파일 목록) 반환
+
+        크기와 수정 시각이 같으면 해시 계산 없이 변경 없음으로 본다.
+        full이면 모든 파일을 변경된 것으로 처리한다.
+        """
+        changed = []
+        for path in paths:
+            stat = os.stat(path)
+            entry = self.entries.get(path)
+            if (
+                not full
+                and entry
+                and entry["size"] == stat.st_size
+                and entry["mtime"] == stat.st_mtime
+            ):
+                continue
+
+            fingerprint = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": file_sha256(path),
+            }
+            if not full and entry and entry["sha256"] == fingerprint["sha256"]:
+                # 내용은 그대로이고 수정 시각만 바뀐 경우
+                entry.update(size=fingerprint["size"], mtime=fingerprint["mtime"])
+                continue
+            changed.append((path, fingerprint))
+
+        current = set(paths)
+        removed = [path for path in self.entries if path not in current]
+        return changed, removed
+
+    def chunk_ids(self, path: str) -> List[str]:
+        """파일에 대해 기록된 청크 ID 목록"""
+        return self.entries.get(path, {}).get("chunk_ids", [])
+
+    def record(self, path: str, fingerprint: Dict[str, Any], chunk_ids: List[str]):
+        """파일 처리 결과 기록"""
+        self.entries[path] = {**fingerprint, "chunk_ids": chunk_ids}
+
+    def forget(self, path: str) -> None:
+        """삭제된 파일 기록 제거"""
+        self.entries.pop(path, None)
+
+    def save(self) -> None:
+        """매니페스트 저장 (임시 파일에 쓴 뒤 교체)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
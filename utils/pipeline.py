@@ -0,0 +1,42 @@
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(iterable: Iterable[T], maxsize: int = 2) -> Iterator[T]:
+    """iterable을 백그라운드 스레드에서 소비하며 최대 maxsize개까지 미리 준비
+
+    파이프라인 단계 사이의 bounded queue 역할을 한다. 앞 단계는 뒤 단계가
+    처리하는 동안 계속 진행하지만, 큐가 가득 차면 멈추므로 메모리 사용량이 일정하다.
+    앞 단계에서 발생한 예외는 소비하는 쪽에서 다시 발생한다.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=maxsize)
+
+    def produce():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        except BaseException as e:
+            buffer.put(_Failure(e))
+        else:
+            buffer.put(_DONE)
+
+    # 소비하는 쪽이 중간에 멈춰도 프로세스 종료를 막지 않도록 데몬 스레드 사용
+    threading.Thread(target=produce, daemon=True).start()
+
+    while True:
+        item = buffer.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
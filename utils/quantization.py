@@ -0,0 +1,202 @@
+import os
+from typing import Optional
+import numpy as np
+
+# 근사 거리를 나눠서 계산할 행 수
+_BLOCK_ROWS = 16384
+
+
+class ScalarQuantizer:
+    """차원별 int8 스칼라 양자화 (x ≈ offset + scale * code, code ∈ [-127, 127])
+
+    float32 대비 메모리 1/4. 근사 거리는 저장해 둔 정확한 노름과
+    q·offset + (q * scale)·code 내적으로 계산한다.
+    """
+
+    method = "int8"
+
+    def __init__(self, offset: np.ndarray, scale: np.ndarray):
+        self.offset = offset.astype(np.float32)
+        self.scale = scale.astype(np.float32)
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray) -> "ScalarQuantizer":
+        low = np.zeros(vectors.shape[1], dtype=np.float32)
+        high = np.zeros(vectors.shape[1], dtype=np.float32)
+        low[:] = np.inf
+        high[:] = -np.inf
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            block = np.asarray(vectors[start : start + _BLOCK_ROWS], dtype=np.float32)
+            np.minimum(low, block.min(axis=0), out=low)
+            np.maximum(high, block.max(axis=0), out=high)
+        offset = (high + low) / 2
+        scale = np.maximum((high - low) / 254, 1e-12)
+        return cls(offset, scale)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty(vectors.shape, dtype=np.int8)
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            block = np.asarray(vectors[start : start + _BLOCK_ROWS], dtype=np.float32)
+            codes[start : start + len(block)] = np.clip(
+                np.rint((block - self.offset) / self.scale), -127, 127
+            )
+        return codes
+
+    def distances(
+        self, query: np.ndarray, codes: np.ndarray, norms: np.ndarray
+    ) -> np.ndarray:
+        """질의 하나와 코드들의 근사 제곱 L2 거리"""
+        scaled = query * self.scale
+        base = float(query @ self.offset)
+        products = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            block = codes[start : start + _BLOCK_ROWS].astype(np.float32)
+            products[start : start + len(block)] = block @ scaled
+        return float(query @ query) + norms - 2 * (products + base)
+
+    def save(self, directory: str) -> None:
+        np.savez(
+            os.path.join(directory, "int8_quantizer.npz"),
+            offset=self.offset,
+            scale=self.scale,
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> "ScalarQuantizer":
+        state = np.load(os.path.join(directory, "int8_quantizer.npz"))
+        return cls(state["offset"], state["scale"])
+
+
+def _kmeans(
+    data: np.ndarray, clusters: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    """간단한 Lloyd k-means (빈 클러스터는 임의의 점으로 다시 초기화)"""
+    centroids = data[rng.choice(len(data), size=clusters, replace=False)].copy()
+    data_norms = (data**2).sum(axis=1)
+    for _ in range(iterations):
+        distances = (
+            data_norms[:, None]
+            - 2 * data @ centroids.T
+            + (centroids**2).sum(axis=1)[None, :]
+        )
+        assignment = distances.argmin(axis=1)
+        counts = np.bincount(assignment, minlength=clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+    return centroids
+
+
+class ProductQuantizer:
+    """Product Quantization (차원을 sub_dim씩 나눠 부분공간마다 256개 중심점)
+
+    벡터 하나를 (차원 / sub_dim) 바이트로 저장한다 (1536차원, sub_dim=8 → 192바이트).
+    근사 거리는 질의마다 부분공간별 거리표를 만든 뒤 코드로 찾아 더한다(ADC).
+    """
+
+    method = "pq"
+
+    def __init__(self, codebooks: np.ndarray, dimension: int):
+        # codebooks: (부분공간 수, 중심점 수, sub_dim)
+        self.codebooks = codebooks.astype(np.float32)
+        self.dimension = dimension
+
+    @property
+    def sub_dim(self) -> int:
+        return self.codebooks.shape[2]
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, 차원) → (n, 부분공간 수, sub_dim), 나누어떨어지지 않으면 0으로 채움"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        padded = self.codebooks.shape[0] * self.sub_dim
+        if padded != vectors.shape[1]:
+            vectors = np.pad(vectors, ((0, 0), (0, padded - vectors.shape[1])))
+        return vectors.reshape(len(vectors), self.codebooks.shape[0], self.sub_dim)
+
+    @classmethod
+    def fit(
+        cls,
+        vectors: np.ndarray,
+        sub_dim: int = 8,
+        max_train: int = 20000,
+        iterations: int = 15,
+        seed: int = 0,
+    ) -> "ProductQuantizer":
+        rng = np.random.default_rng(seed)
+        n, dimension = vectors.shape
+        sample = np.sort(rng.choice(n, size=min(n, max_train), replace=False))
+        train = np.asarray(vectors[sample], dtype=np.float32)
+
+        subspaces = -(-dimension // sub_dim)
+        clusters = min(256, len(train))
+        splitter = cls(np.zeros((subspaces, clusters, sub_dim)), dimension)
+        parts = splitter._split(train)
+        codebooks = np.stack(
+            [_kmeans(parts[:, m], clusters, iterations, rng) for m in range(subspaces)]
+        )
+        return cls(codebooks, dimension)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        subspaces = self.codebooks.shape[0]
+        codes = np.empty((len(vectors), subspaces), dtype=np.uint8)
+        centroid_norms = (self.codebooks**2).sum(axis=2)
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            parts = self._split(vectors[start : start + _BLOCK_ROWS])
+            for m in range(subspaces):
+                distances = centroid_norms[m][None, :] - 2 * parts[:, m] @ (
+                    self.codebooks[m].T
+                )
+                codes[start : start + len(parts), m] = distances.argmin(axis=1)
+        return codes
+
+    def distances(
+        self, query: np.ndarray, codes: np.ndarray, norms: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """질의 하나와 코드들의 근사 제곱 L2 거리 (부분공간별 거리표 합)"""
+        parts = self._split(query[None, :])[0]
+        tables = ((self.codebooks - parts[:, None, :]) ** 2).sum(axis=2)
+        subspaces = np.arange(tables.shape[0])
+        result = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            block = codes[start : start + _BLOCK_ROWS]
+            result[start : start + len(block)] = tables[subspaces, block].sum(axis=1)
+        return result
+
+    def save(self, directory: str) -> None:
+        np.savez(
+            os.path.join(directory, "pq_quantizer.npz"),
+            codebooks=self.codebooks,
+            dimension=self.dimension,
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> "ProductQuantizer":
+        state = np.load(os.path.join(directory, "pq_quantizer.npz"))
+        return cls(state["codebooks"], int(state["dimension"]))
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+def build_codes(directory: str, method: str) -> np.ndarray:
+    """스냅샷 벡터로 양자화기를 학습하고 코드를 저장"""
+    vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+    quantizer = QUANTIZERS[method].fit(vectors)
+    codes = quantizer.encode(vectors)
+    quantizer.save(directory)
+    path = os.path.join(directory, f"{method}_codes.npy")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, codes)
+    os.replace(tmp_path, path)
+    return codes
+
+
+def load_quantizer(directory: str, method: str):
+    """저장된 (양자화기, 코드) 불러오기 (코드는 메모리에 올림)"""
+    quantizer = QUANTIZERS[method].load(directory)
+    codes = np.load(os.path.join(directory, f"{method}_codes.npy"))
+    return quantizer, codes
@@ -0,0 +1,76 @@
+import contextlib
+import gzip
+import os
+import signal
+import threading
+from typing import Callable
+import pdfminer
+from utils.index import file_sha256
+
+# 추출 방식이 바뀌면 캐시가 무효화되도록 키에 포함
+EXTRACTOR_VERSION = f"pdfminer-{pdfminer.__version__}"
+
+
+@contextlib.contextmanager
+def _alarm_deferred():
+    """블록 안에서 온 SIGALRM을 기록해 두었다가 블록이 끝난 뒤 원래 핸들러로 전달
+
+    시그널 마스크는 다른 스레드로 전달되는 것을 막지 못하므로 핸들러를 바꾼다.
+    핸들러는 메인 스레드에서만 바꿀 수 있어 그 밖에서는 그대로 실행한다.
+    """
+    if (
+        not hasattr(signal, "SIGALRM")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+    frames = []
+    previous = signal.signal(signal.SIGALRM, lambda signum, frame: frames.append(frame))
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGALRM, previous)
+        if frames and callable(previous):
+            previous(signal.SIGALRM, frames[0])
+
+
+class ExtractedTextCache:
+    """PDF 내용 해시 + 추출기 버전 → 추출 텍스트(gzip 압축) 디스크 캐시
+
+    청크 크기/겹침을 바꿔 다시 분할할 때 pdfminer 추출을 반복하지 않도록 한다.
+    """
+
+    def __init__(
+        self, cache_dir: str = "./cache/pdf_text", version: str = EXTRACTOR_VERSION
+    ):
+        self.cache_dir = cache_dir
+        self.version = version
+
+    def _cache_path(self, pdf_path: str) -> str:
+        return os.path.join(
+            self.cache_dir, f"{file_sha256(pdf_path)}_{self.version}.txt.gz"
+        )
+
+    def get_or_extract(self, pdf_path: str, extract: Callable[[str], str]) -> str:
+        """캐시에 있으면 읽어서 반환하고, 없으면 extract(pdf_path)로 추출해서 저장"""
+        cache_path = self._cache_path(pdf_path)
+        if os.path.exists(cache_path):
+            with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+                return f.read()
+
+        text = extract(pdf_path)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 프로세스 여러 개가 동시에 써도 깨지지 않도록 임시 파일에 쓴 뒤 교체.
+        # PDF 처리 제한 시간(SIGALRM)이 쓰는 도중에 끊지 않도록 쓰는 동안은 미루고,
+        # 그래도 실패하면 임시 파일을 지운다.
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with _alarm_deferred():
+                with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return text
@@ -0,0 +1,21 @@
+from functools import lru_cache
+from typing import List
+
+# text-embedding-3-small / gpt-4o 계열에 맞는 encoding
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = DEFAULT_ENCODING):
+    """tiktoken encoding을 처음 사용할 때 한 번만 로드"""
+    import tiktoken
+
+    return tiktoken.get_encoding(name)
+
+
+def count_tokens(texts: List[str], num_threads: int = 8) -> List[int]:
+    """여러 텍스트의 토큰 수를 한 번에 계산 (tiktoken 배치 인코딩 사용)"""
+    if not texts:
+        return []
+    encoded = get_encoding().encode_ordinary_batch(texts, num_threads=num_threads)
+    return [len(tokens) for tokens in encoded]
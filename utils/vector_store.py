@@ -0,0 +1,559 @@
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from utils.quantization import QUANTIZERS, build_codes, load_quantizer
+
+# 스냅샷 파일 이름 (데이터 파일은 빌드마다 새 하위 디렉토리에 쓰고,
+# 그 디렉토리 이름을 담은 meta.json을 마지막에 교체해서 한 번에 전환)
+SNAPSHOT_PREFIX = "snapshot-"
+VECTORS_FILE = "vectors.npy"
+NORMS_FILE = "norms.npy"
+RECORDS_FILE = "records.json"
+META_FILE = "meta.json"
+
+# float16은 파일/메모리가 절반이지만 검색할 때마다 float32로 변환하므로 더 느리다
+SUPPORTED_DTYPES = ("float32", "float16")
+
+# 메모리 맵 스냅샷을 쓰는 검색 백엔드 (int8/pq는 양자화 코드로 후보를 고른 뒤
+# 원본 벡터로 다시 정렬)
+MEMMAP_BACKENDS = ("memmap", "int8", "pq")
+
+# 검색 백엔드 설정 (chroma | memmap | int8 | pq), 인덱싱 스크립트와 서비스가 같은 값을 사용
+DEFAULT_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+DEFAULT_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+
+# 행렬-벡터 곱을 나눠서 계산할 행 수 (float16은 이 단위로 float32 변환)
+_BLOCK_ROWS = 16384
+
+
+def mmr_select(
+    query_similarity: np.ndarray,
+    candidate_similarity: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """Maximal Marginal Relevance 선택 (벡터화 버전)
+
+    query_similarity: (n,) 질의와 후보의 유사도
+    candidate_similarity: (n, n) 후보 간 유사도
+    선택된 후보와의 최대 유사도를 배열로 유지해서 단계마다 O(n)으로 계산한다.
+    """
+    n = len(query_similarity)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    selected = [int(np.argmax(query_similarity))]
+    max_similarity = candidate_similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * query_similarity - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, candidate_similarity[best], out=max_similarity)
+    return selected
+
+
+def multi_query_mmr_select(
+    query_similarity: np.ndarray,
+    candidate_similarity: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    tiers: Optional[np.ndarray] = None,
+) -> List[List[int]]:
+    """하나의 후보 풀에서 여러 질의의 MMR 선택을 동시에 수행 (벡터화 버전)
+
+    query_similarity: (n, m) 후보와 m개 질의의 유사도
+    candidate_similarity: (n, n) 후보 간 유사도
+    tiers: (n,) 후보 우선순위 (작을수록 먼저, 질의마다 같은 단계 후보를 모두 쓴 뒤
+    다음 단계 선택)
+    질의마다 따로 최대 k개를 고르므로 여러 질의가 같은 후보를 고를 수 있다.
+    단계마다 m개 질의의 점수를 (n, m) 배열 하나로 계산한다.
+    """
+    n, m = query_similarity.shape
+    k = min(k, n)
+    selected = np.empty((m, k), dtype=np.int64)
+    available = np.ones((n, m), dtype=bool)
+    max_similarity = np.zeros((n, m), dtype=np.float32)
+    columns = np.arange(m)
+    for step in range(k):
+        if step == 0:
+            scores = query_similarity.copy()
+        else:
+            scores = lambda_mult * query_similarity - (1 - lambda_mult) * max_similarity
+        eligible = available
+        if tiers is not None:
+            lowest = np.where(available, tiers[:, None], np.inf).min(axis=0)
+            eligible = available & (tiers[:, None] == lowest[None, :])
+        scores[~eligible] = -np.inf
+        best = scores.argmax(axis=0)
+        selected[:, step] = best
+        available[best, columns] = False
+        if step == 0:
+            max_similarity = candidate_similarity[:, best].copy()
+        else:
+            np.maximum(
+                max_similarity, candidate_similarity[:, best], out=max_similarity
+            )
+    return selected.tolist()
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _remove_old_snapshots(directory: str, keep: set) -> None:
+    """현재/직전 스냅샷을 뺀 나머지 삭제 (직전 것은 막 열고 있는 프로세스를 위해 남김)
+
+    중단된 빌드가 남긴 디렉토리와, keep에 ""가 없으면 version이 없던 예전
+    스냅샷 파일도 함께 지운다.
+    """
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(SNAPSHOT_PREFIX) and name not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif "" not in keep and (
+            name in (VECTORS_FILE, NORMS_FILE, RECORDS_FILE)
+            or name.endswith(("_codes.npy", "_quantizer.npz"))
+        ):
+            os.remove(path)
+
+
+class MemmapVectorStore(VectorStore):
+    """Chroma 컬렉션을 내보낸 읽기 전용 메모리 맵 벡터 저장소
+
+    모든 벡터를 하나의 연속된 float32(또는 float16) 행렬로 저장하고
+    np.load(mmap_mode="r")로 열어서 질의마다 BLAS 행렬-벡터 곱으로 검색한다.
+    거리는 Chroma 기본값과 같은 제곱 L2 거리이며, 메타데이터 where 필터는
+    (키, 값) → 행 번호 배열을 미리 만들어 두고 집합 연산으로 처리한다.
+    쓰기는 Chroma에서 하고, 인덱싱이 끝난 뒤 build()로 스냅샷을 다시 만든다.
+    """
+
+    def __init__(self, directory: str, embedding_function=None):
+        self.directory = directory
+        self._embedding_function = embedding_function
+
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        # meta.json이 가리키는 스냅샷만 읽으므로 빌드 중에 열어도 파일이 섞이지 않음
+        # (version이 없는 예전 스냅샷은 directory에 바로 저장되어 있음)
+        self.data_directory = os.path.join(directory, self.meta.get("version", ""))
+        records_path = os.path.join(self.data_directory, RECORDS_FILE)
+        with open(records_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self.ids: List[str] = records["ids"]
+        self.documents: List[str] = records["documents"]
+        self.metadatas: List[Dict[str, Any]] = records["metadatas"]
+        if len(self.ids) != self.meta["count"]:
+            raise ValueError(f"스냅샷 파일이 meta.json과 맞지 않습니다: {directory}")
+
+        self.vectors = np.load(
+            os.path.join(self.data_directory, VECTORS_FILE), mmap_mode="r"
+        )
+        self.norms = np.load(os.path.join(self.data_directory, NORMS_FILE))
+        self._filter_index: Dict[str, Dict[Any, np.ndarray]] = {}
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        collection,
+        directory: str,
+        dtype: str = "float32",
+        batch_size: int = 5000,
+        quantize: Sequence[str] = (),
+    ) -> Dict[str, Any]:
+        """Chroma 컬렉션의 모든 벡터/문서/메타데이터를 스냅샷으로 저장하고 meta 반환
+
+        quantize에 int8/pq를 주면 QuantizedVectorStore용 코드도 함께 만든다.
+        모든 파일을 새 하위 디렉토리에 쓴 뒤 meta.json을 교체해서 전환하므로,
+        읽는 쪽은 이전 스냅샷이나 새 스냅샷 중 하나만 보게 된다.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"지원하지 않는 dtype: {dtype}")
+        os.makedirs(directory, exist_ok=True)
+        version = f"{SNAPSHOT_PREFIX}{time.time_ns()}"
+        data_directory = os.path.join(directory, version)
+        os.makedirs(data_directory)
+
+        count = collection.count()
+        ids, documents, metadatas = [], [], []
+        vectors_path = os.path.join(data_directory, VECTORS_FILE)
+        matrix = None
+        norms = np.zeros(count, dtype=np.float32)
+
+        offset = 0
+        while offset < count:
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset,
+            )
+            if not page["ids"]:
+                break
+            block = np.asarray(page["embeddings"], dtype=np.float32)
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    vectors_path,
+                    mode="w+",
+                    dtype=dtype,
+                    shape=(count, block.shape[1]),
+                )
+            rows = slice(offset, offset + len(block))
+            matrix[rows] = block
+            # float16으로 저장하면 저장된 값 기준으로 노름 계산
+            norms[rows] = (matrix[rows].astype(np.float32) ** 2).sum(axis=1)
+            ids.extend(page["ids"])
+            documents.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            offset += len(block)
+
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(
+                vectors_path, mode="w+", dtype=dtype, shape=(0, 0)
+            )
+        matrix.flush()
+        del matrix
+
+        np.save(os.path.join(data_directory, NORMS_FILE), norms[: len(ids)])
+        records_path = os.path.join(data_directory, RECORDS_FILE)
+        with open(records_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"ids": ids, "documents": documents, "metadatas": metadatas},
+                f,
+                ensure_ascii=False,
+            )
+        quantize = [method for method in quantize if method in QUANTIZERS]
+        if ids:
+            for method in quantize:
+                build_codes(data_directory, method)
+
+        meta_path = os.path.join(directory, META_FILE)
+        previous = None
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("version", "")
+
+        meta = {
+            "count": len(ids),
+            "dtype": dtype,
+            "quantization": quantize,
+            "version": version,
+        }
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+        _remove_old_snapshots(directory, keep={version, previous})
+        return meta
+
+    # ---- 필터 ----
+
+    def _rows_for(self, key: str, value: Any) -> np.ndarray:
+        """(키, 값)에 해당하는 행 번호 배열 (키별로 처음 사용할 때 생성)"""
+        index = self._filter_index.get(key)
+        if index is None:
+            groups: Dict[Any, List[int]] = {}
+            for row, metadata in enumerate(self.metadatas):
+                if key in metadata:
+                    groups.setdefault(metadata[key], []).append(row)
+            index = {v: np.array(rows, dtype=np.int64) for v, rows in groups.items()}
+            self._filter_index[key] = index
+        return index.get(value, np.empty(0, dtype=np.int64))
+
+    def filter_rows(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """where 필터(등호/$eq/$in/$and/$or)에 맞는 행 번호 배열 (필터가 없으면 None)"""
+        if not where:
+            return None
+        result = None
+        for key, value in where.items():
+            if key in ("$and", "$or"):
+                parts = [self.filter_rows(sub) for sub in value]
+                parts = [
+                    np.arange(len(self.ids)) if part is None else part for part in parts
+                ]
+                combine = np.intersect1d if key == "$and" else np.union1d
+                rows = parts[0]
+                for part in parts[1:]:
+                    rows = combine(rows, part)
+            elif isinstance(value, dict) and "$eq" in value:
+                rows = self._rows_for(key, value["$eq"])
+            elif isinstance(value, dict) and "$in" in value:
+                rows = np.unique(
+                    np.concatenate(
+                        [self._rows_for(key, v) for v in value["$in"]]
+                        or [np.empty(0, dtype=np.int64)]
+                    )
+                )
+            else:
+                rows = self._rows_for(key, value)
+            result = rows if result is None else np.intersect1d(result, rows)
+        return result
+
+    # ---- 검색 ----
+
+    def _matrix(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        return self.vectors if rows is None else self.vectors[rows]
+
+    def _distances(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """(질의 수, 행 수) 제곱 L2 거리"""
+        matrix = self._matrix(rows)
+        norms = self.norms if rows is None else self.norms[rows]
+        products = np.empty((len(queries), len(matrix)), dtype=np.float32)
+        for start in range(0, len(matrix), _BLOCK_ROWS):
+            block = np.asarray(matrix[start : start + _BLOCK_ROWS], dtype=np.float32)
+            # (행 수, 질의 수) 방향 곱이 질의가 적을 때 더 빠름
+            products[:, start : start + len(block)] = (block @ queries.T).T
+        query_norms = (queries**2).sum(axis=1, keepdims=True)
+        return np.maximum(query_norms + norms[None, :] - 2 * products, 0)
+
+    def _top_k(
+        self, queries: np.ndarray, k: int, where: Optional[Dict]
+    ) -> List[List[Tuple[int, float]]]:
+        rows = self.filter_rows(where)
+        if rows is not None and not len(rows):
+            return [[] for _ in queries]
+        distances = self._distances(queries, rows)
+        k = min(k, distances.shape[1])
+        if k <= 0:
+            return [[] for _ in queries]
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        results = []
+        for query_index, candidates in enumerate(top):
+            order = candidates[np.argsort(distances[query_index, candidates])]
+            found = rows[order] if rows is not None else order
+            results.append(
+                [
+                    (int(row), float(distances[query_index, column]))
+                    for row, column in zip(found, order)
+                ]
+            )
+        return results
+
+    def _document(self, row: int) -> Document:
+        return Document(
+            id=self.ids[row],
+            page_content=self.documents[row] or "",
+            metadata=self.metadatas[row],
+        )
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Iterable[str] = ("metadatas", "distances"),
+    ) -> Dict[str, List[List[Any]]]:
+        """Chroma collection.query와 같은 형태의 결과를 반환하는 일괄 검색"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        results = self._top_k(queries, n_results, where)
+        found: Dict[str, List[List[Any]]] = {
+            "ids": [[self.ids[row] for row, _ in hits] for hits in results]
+        }
+        if "metadatas" in include:
+            found["metadatas"] = [
+                [self.metadatas[row] for row, _ in hits] for hits in results
+            ]
+        if "documents" in include:
+            found["documents"] = [
+                [self.documents[row] for row, _ in hits] for hits in results
+            ]
+        if "distances" in include:
+            found["distances"] = [[d for _, d in hits] for hits in results]
+        if "embeddings" in include:
+            found["embeddings"] = [
+                np.asarray(self.vectors[[row for row, _ in hits]], dtype=np.float32)
+                for hits in results
+            ]
+        return found
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Iterable[str] = ("metadatas", "documents"),
+    ) -> Dict[str, List[Any]]:
+        """Chroma.get과 같은 형태의 조회"""
+        rows = self.filter_rows(where)
+        rows = np.arange(len(self.ids)) if rows is None else rows
+        if ids is not None:
+            wanted = set(ids)
+            rows = [row for row in rows if self.ids[row] in wanted]
+        rows = list(rows)[offset or 0 :]
+        if limit is not None:
+            rows = rows[:limit]
+        found: Dict[str, List[Any]] = {"ids": [self.ids[row] for row in rows]}
+        if "metadatas" in include:
+            found["metadatas"] = [self.metadatas[row] for row in rows]
+        if "documents" in include:
+            found["documents"] = [self.documents[row] for row in rows]
+        if "embeddings" in include:
+            found["embeddings"] = [
+                np.asarray(self.vectors[row], dtype=np.float32) for row in rows
+            ]
+        return found
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """(문서, 제곱 L2 거리) 목록"""
+        query = np.asarray([embedding], dtype=np.float32)
+        hits = self._top_k(query, k, filter)[0]
+        return [(self._document(row), distance) for row, distance in hits]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_relevance_scores(
+                embedding, k, filter
+            )
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k, filter)
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(
+            embedding, k, filter
+        )
+
+    def mmr_candidates(
+        self, embedding: List[float], fetch_k: int, filter: Optional[Dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """MMR 후보 (행 번호, 정규화된 후보 벡터)"""
+        query = np.asarray([embedding], dtype=np.float32)
+        hits = self._top_k(query, fetch_k, filter)[0]
+        rows = np.array([row for row, _ in hits], dtype=np.int64)
+        if not len(rows):
+            return rows, np.empty((0, query.shape[1]), dtype=np.float32)
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        return rows, normalize_rows(vectors)
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """fetch_k개 후보를 가져와 벡터화된 MMR로 k개 선택 (코사인 유사도 기준)"""
+        rows, candidates = self.mmr_candidates(embedding, fetch_k, filter)
+        if not len(rows):
+            return []
+        query = normalize_rows(np.asarray(embedding, dtype=np.float32))
+        selected = mmr_select(
+            candidates @ query, candidates @ candidates.T, k, lambda_mult
+        )
+        return [self._document(int(rows[i])) for i in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(
+            embedding, k, fetch_k, lambda_mult, filter
+        )
+
+    # 스냅샷은 Chroma 컬렉션에서만 만든다 (from_texts는 VectorStore의 추상 메서드라
+    # 남겨 두고 읽기 전용임을 알리는 TypeError를 낸다)
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise TypeError(
+            "MemmapVectorStore는 읽기 전용입니다. Chroma에 저장한 뒤 build()로 다시 만드세요."
+        )
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise TypeError(
+            "MemmapVectorStore는 읽기 전용입니다. build(collection, directory)로 만드세요."
+        )
+
+
+class QuantizedVectorStore(MemmapVectorStore):
+    """양자화 코드로 근사 검색한 뒤 원본 벡터로 다시 정렬하는 저장소
+
+    메모리에는 int8(1/4) 또는 PQ(1536차원 기준 1/32) 코드만 올리고, 상위
+    k * rerank개 후보만 메모리 맵 원본 벡터에서 읽어 정확한 거리로 다시 정렬한다.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        method: str = "int8",
+        rerank: int = 4,
+        embedding_function=None,
+    ):
+        super().__init__(directory, embedding_function)
+        self.method = method
+        self.rerank = rerank
+        self.quantizer, self.codes = load_quantizer(self.data_directory, method)
+
+    def _exact_distances(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        return np.maximum(
+            float(query @ query) + self.norms[rows] - 2 * (vectors @ query), 0
+        )
+
+    def _top_k(
+        self, queries: np.ndarray, k: int, where: Optional[Dict]
+    ) -> List[List[Tuple[int, float]]]:
+        rows = self.filter_rows(where)
+        codes = self.codes if rows is None else self.codes[rows]
+        norms = self.norms if rows is None else self.norms[rows]
+
+        results = []
+        for query in queries:
+            shortlist_size = min(k * max(self.rerank, 1), len(codes))
+            if shortlist_size <= 0:
+                results.append([])
+                continue
+            approx = self.quantizer.distances(query, codes, norms)
+            shortlist = np.argpartition(approx, shortlist_size - 1)[:shortlist_size]
+            found = shortlist if rows is None else rows[shortlist]
+            # 메모리 맵을 앞에서부터 읽도록 행 번호 순으로 정렬 후 정확한 거리 계산
+            found = np.sort(found)
+            exact = self._exact_distances(query, found)
+            order = np.argsort(exact)[:k]
+            results.append([(int(found[i]), float(exact[i])) for i in order])
+        return results